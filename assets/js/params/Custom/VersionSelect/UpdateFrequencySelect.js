@@ -18,7 +18,8 @@ export class UpdateFrequencySelect extends React.PureComponent {
     isOwner: PropTypes.bool.isRequired,
     lastCheckDate: PropTypes.instanceOf(Date), // null if never updated
     isAutofetch: PropTypes.bool.isRequired,
-    fetchInterval: PropTypes.number.isRequired
+    fetchInterval: PropTypes.number.isRequired,
+    nConsecutiveFetchErrors: PropTypes.number.isRequired // we back off while > 0
   }
 
   state = {
@@ -47,6 +48,7 @@ export class UpdateFrequencySelect extends React.PureComponent {
       lastCheckDate,
       isAutofetch,
       fetchInterval,
+      nConsecutiveFetchErrors,
       workflowId,
       isOwner,
       isAnonymous,
@@ -105,6 +107,18 @@ export class UpdateFrequencySelect extends React.PureComponent {
             </div>
             )
           : null}
+        {isAutofetch && nConsecutiveFetchErrors > 0
+          ? (
+            <div className='fetch-backoff'>
+              <Trans
+                id='js.params.Custom.VersionSelect.UpdateFrequencySelect.backoff'
+                comment='The parameter is the number of automatic updates that failed in a row (always at least 1)'
+              >
+                {nConsecutiveFetchErrors} failed in a row. Retrying less often.
+              </Trans>
+            </div>
+            )
+          : null}
         {isModalOpen
           ? (
             <UpdateFrequencySelectModal
@@ -138,7 +152,8 @@ const mapStateToProps = (state, ownProps) => {
     isOwner: selectLoggedInUserRole(state) === 'owner',
     isAnonymous: selectIsAnonymous(state),
     isAutofetch: step.auto_update_data || false,
-    fetchInterval: step.update_interval || 86400
+    fetchInterval: step.update_interval || 86400,
+    nConsecutiveFetchErrors: step.n_consecutive_fetch_errors || 0
   }
 }
 
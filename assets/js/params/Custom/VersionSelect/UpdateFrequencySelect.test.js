@@ -15,7 +15,8 @@ describe('UpdateFrequencySelect', () => {
       isAnonymous: false, // DELETEME
       lastCheckDate: new Date(Date.parse('2018-05-28T19:00:54.154Z')),
       isAutofetch: false, // start in Manual mode
-      fetchInterval: 300
+      fetchInterval: 300,
+      nConsecutiveFetchErrors: 0
     }
 
     let dateSpy
@@ -43,6 +44,18 @@ describe('UpdateFrequencySelect', () => {
       w.find('a[title="change auto-update settings"]').simulate('click')
       expect(w.find('UpdateFrequencySelectModal')).toHaveLength(0)
     })
+
+    it('shows consecutive fetch errors', () => {
+      const w = wrapper({ isAutofetch: true, nConsecutiveFetchErrors: 3 })
+      expect(w.find('.fetch-backoff').text()).toEqual(
+        '3 failed in a row. Retrying less often.'
+      )
+    })
+
+    it('does not show consecutive fetch errors when not auto-updating', () => {
+      const w = wrapper({ isAutofetch: false, nConsecutiveFetchErrors: 3 })
+      expect(w.find('.fetch-backoff')).toHaveLength(0)
+    })
   })
 
   describe('connected to state', () => {
@@ -1,13 +1,13 @@
 from __future__ import annotations
 import contextlib
 from dataclasses import dataclass, field
-import errno
 import os
 import os.path
 from pathlib import Path
 import shutil
 import threading
-from typing import Callable, ContextManager, Iterator, List, Tuple
+from typing import Callable, ContextManager
+import pyspawner
 from cjwkernel.util import tempdir_context, tempfile_context
 from cjwkernel.errors import ModuleExitedError
 
@@ -17,60 +17,62 @@ assert (
 ), "chroot is unusable: a child's symlinks can make a parent delete files"
 
 
-def _walk_and_delete_upper_files(
-    chroot: Chroot, should_delete: Callable[[Path, Path], bool] = lambda root_path: True
+MODULE_WRITABLE_DIRS = (Path("tmp"), Path("var") / "tmp")
+"""
+Directories (relative to the chroot root) where module code may create files.
+
+The base layer's /tmp and /var/tmp are world-writable. Every other directory
+is read-only to modules. (Modules may also overwrite the output file the kernel
+passes them; `ChrootContext.writable_file()` handles that.)
+"""
+
+
+CALLER_CACHE_DIR = Path("var") / "tmp" / "cjwkernel-cache"
+"""
+Directory (relative to the chroot root) where callers may keep caches.
+
+`ChrootContext.__exit__()` leaves it alone, so caches outlive one context.
+It's in `MODULE_WRITABLE_DIRS`, on the same filesystem as
+`ChrootContext.tempdir_context()`, so callers can hard-link its files into
+their tempdirs. Callers must make it unreadable to modules. If a module
+creates it first, `clear_unowned_edits()` deletes it.
+"""
+
+
+def _delete_upper_files_in_writable_dirs(
+    chroot: Chroot, should_delete: Callable[[Path], bool] = lambda root_path: True
 ) -> None:
     """
-    Delete files and directories from `root` that are in `upper` but not `base`.
+    Delete files and directories that were written in `MODULE_WRITABLE_DIRS`.
 
     Ignore files and directories for which `should_delete(root_path) == False`.
+
+    This costs O(files written), not O(files in chroot): we only scan the
+    `upper` layer, and only in the directories where modules may write.
     """
-    # lightweight recursion: (dirpath, scandir iterator) at each
-    # level of nesting
-    #
     # We scandir *chroot.upper*. This is where all the _changes_ are
-    # recorded; so we want it to appear empty (except for maybe a few
-    # empty directories that mirror directories in chroot.base).
+    # recorded. Only its writable directories can hold new files: everything
+    # else in the chroot is read-only to modules, and callers only write in
+    # their own tempdirs (which live in /var/tmp).
     #
     # DO NOT edit chroot.upper directly: that gives undefined behavior.
     # Delete from chroot.root.
-    stack: List[Tuple[Path, Iterator[os.DirEntry]]] = [
-        (chroot.upper, os.scandir(str(chroot.upper)))
-    ]
-
-    while stack:
-        cur_dir, cur_scandir = stack[-1]
+    for relative_dir in MODULE_WRITABLE_DIRS:
+        upper_dir = chroot.upper / relative_dir
         try:
-            entry: os.DirEntry = next(cur_scandir)
-        except StopIteration:
-            stack.pop()
-            if cur_dir != chroot.upper:  # we're done
-                # Delete the directory itself, unless it's in base layer or
-                # we didn't delete its children.
-                relative_path = Path(cur_dir).relative_to(chroot.upper)
-                base_path = chroot.base / relative_path
-                root_path = chroot.root / relative_path
-                if not base_path.exists() and should_delete(root_path):
-                    try:
-                        root_path.rmdir()
-                    except OSError as err:
-                        if err.errno == errno.ENOTEMPTY:
-                            pass
-                        else:
-                            raise
-            continue
-
-        relative_path = Path(entry.path).relative_to(chroot.upper)
-        root_path = chroot.root / relative_path
-        if entry.is_dir(follow_symlinks=False):
-            if root_path.is_mount():
-                # Don't follow mountpoints. /root/.local/share/virtualenvs
-                # is a mountpoint in dev mode, to cache installed Python
-                # modules.
+            entries = list(os.scandir(str(upper_dir)))
+        except FileNotFoundError:
+            continue  # nobody wrote anything here
+
+        for entry in entries:
+            root_path = chroot.root / relative_dir / entry.name
+            if not should_delete(root_path):
                 continue
-            stack.append((Path(entry.path), os.scandir(entry.path)))
-        elif should_delete(root_path):
-            root_path.unlink()
+            if entry.is_dir(follow_symlinks=False):
+                # shutil.rmtree() won't follow symlinks. (We asserted that.)
+                shutil.rmtree(root_path)
+            else:
+                root_path.unlink()
 
 
 @dataclass
@@ -101,6 +103,16 @@ class Chroot:
     learn what the upper layer is.
     """
 
+    network_config: pyspawner.NetworkConfig = field(
+        default_factory=pyspawner.NetworkConfig
+    )
+    """
+    Network interfaces and addresses for children in this chroot.
+
+    Children that run at the same time need distinct veth names and IPs.
+    `setup-sandboxes.sh` configures iptables to match.
+    """
+
     lock: threading.Lock = field(default_factory=threading.Lock)
     """
     Sanity check.
@@ -152,7 +164,8 @@ class ChrootContext:
         wrote to `chroot.upper`.)
 
         The `__exit__()` of `ChrootContext` will wipe the chroot filesystem
-        back to its initial state: no data whatsoever.
+        back to its initial state: no data whatsoever, except the caller's
+        `cache_dir`.
     """
 
     def __init__(self, chroot: Chroot):
@@ -182,9 +195,16 @@ class ChrootContext:
 
         ... so instead, we "revert" changes through logic. We assume the caller
         _never_ edits a file provided in the "base" layer; and we trust that
-        module code never runs with enough permission to edit files.
+        module code never runs with enough permission to edit files outside
+        `MODULE_WRITABLE_DIRS`.
+
+        We keep `CALLER_CACHE_DIR`, if we own it.
         """
-        _walk_and_delete_upper_files(self.chroot)
+        cache_dir = self.cache_dir
+        _delete_upper_files_in_writable_dirs(
+            self.chroot,
+            lambda path: path != cache_dir or path.lstat().st_uid > 65535,
+        )
 
     def clear_unowned_edits(self) -> None:
         """
@@ -208,11 +228,20 @@ class ChrootContext:
         privilege-escalation 0day, UID-0 in the module container is different
         from UID-0 in the caller's container. Therefore, any high-UID file is
         an "unowned edit" and must be deleted.
+
+        Modules can only create files in `MODULE_WRITABLE_DIRS`, so we only
+        look there. A high-UID directory holds only module-written files, so we
+        delete it recursively without checking its contents.
         """
-        _walk_and_delete_upper_files(
-            self.chroot, lambda path: path.stat().st_uid > 65535
+        _delete_upper_files_in_writable_dirs(
+            self.chroot, lambda path: path.lstat().st_uid > 65535
         )
 
+    @property
+    def cache_dir(self) -> Path:
+        """`CALLER_CACHE_DIR`, within this chroot. It may not exist yet."""
+        return self.chroot.root / CALLER_CACHE_DIR
+
     def _assert_empty(self, path: Path) -> None:
         garbage = list(path.glob("*"))
         if garbage:
@@ -298,7 +327,37 @@ _chroots = Path("/var/lib/cjwkernel/chroot")
 _base = Path("/var/lib/cjwkernel/chroot-layers/base")
 
 
-EDITABLE_CHROOT = Chroot(
-    _chroots / "editable" / "root", _base, _chroots / "editable" / "upperfs" / "upper"
-)
+def editable_chroot(index: int) -> Chroot:
+    """
+    Return the `index`th editable chroot, as built by `setup-sandboxes.sh`.
+
+    Chroot 0 is `EDITABLE_CHROOT`. The fetcher runs concurrent fetches in
+    chroots 0, 1, 2 ...; each has its own directories and its own network
+    interface (`veth-pyspawnN`, 192.168.(123+N).0/24).
+
+    Raise `ValueError` if `index` is not in `range(100)`: higher indexes
+    would give interface names longer than Linux's 15-character limit.
+    """
+    if not 0 <= index < 100:
+        raise ValueError("index must be between 0 and 99; got %d" % index)
+    if index == 0:
+        name = "editable"
+        network_config = pyspawner.NetworkConfig()
+    else:
+        name = "editable%d" % index
+        network_config = pyspawner.NetworkConfig(
+            kernel_veth_name="veth-pyspawn%d" % index,
+            child_veth_name="veth-pyspawn%dc" % index,
+            kernel_ipv4_address="192.168.%d.1" % (123 + index),
+            child_ipv4_address="192.168.%d.2" % (123 + index),
+        )
+    return Chroot(
+        _chroots / name / "root",
+        _base,
+        _chroots / name / "upperfs" / "upper",
+        network_config,
+    )
+
+
+EDITABLE_CHROOT = editable_chroot(0)
 READONLY_CHROOT_DIR = _chroots / "readonly" / "root"
@@ -30,6 +30,28 @@ class ModuleExitedError(ModuleError):
         self.log = log
 
 
+EXIT_CODE_OUT_OF_MEMORY = 86
+"""Exit code a child uses when it runs out of memory (raises MemoryError).
+
+Arbitrary. CPython itself only exits with 0, 1 and 2.
+"""
+
+
+class ModuleResourceLimitError(ModuleError):
+    """The module used more memory or CPU time than we allow one child.
+
+    `resource` is "memory" (`limit` is in bytes) or "cpu" (`limit` is in
+    seconds).
+    """
+
+    def __init__(self, module_slug: str, resource: str, limit: int):
+        super().__init__(
+            "Module '%s' exceeded its %s limit (%d)" % (module_slug, resource, limit)
+        )
+        self.resource = resource
+        self.limit = limit
+
+
 def format_for_user_debugging(err: ModuleError) -> str:
     """Return a string for showing hapless users.
 
@@ -43,6 +65,11 @@ def format_for_user_debugging(err: ModuleError) -> str:
     """
     if isinstance(err, ModuleTimeoutError):
         return "timed out"
+    elif isinstance(err, ModuleResourceLimitError):
+        if err.resource == "memory":
+            return "out of memory (limit %dMB)" % (err.limit // 1024 // 1024)
+        else:
+            return "out of CPU time (limit %ds)" % err.limit
     elif isinstance(err, ModuleExitedError):
         try:
             # If the exit code is -9, for instance, return 'SIGTERM'
@@ -49,3 +49,32 @@ def read_parquet_as_arrow(
             schema = _rewrite_schema(typeless_schema, columns)
 
             return pa.table(typeless_table.columns, schema=schema)
+
+
+def write_parquet_as_arrow(
+    parquet_path: Path,
+    columns: List[Column],
+    arrow_path: Path,
+    tempdir: Optional[Path] = None,
+) -> None:
+    """Convert Parquet file to an Arrow file with Workbench field metadata.
+
+    Copy one record batch at a time, so RAM usage is bounded by the largest
+    record batch rather than the whole table. The output has as many record
+    batches as the intermediate (typeless) Arrow file.
+
+    Raise pyarrow.ArrowIOError on invalid Parquet file.
+    """
+    with tempfile_context(dir=tempdir) as typeless_arrow_path:
+        cjwparquet.convert_parquet_file_to_arrow_file(parquet_path, typeless_arrow_path)
+
+        with pa.ipc.open_file(typeless_arrow_path) as reader:
+            schema = _rewrite_schema(reader.schema, columns)
+            with pa.ipc.RecordBatchFileWriter(arrow_path, schema) as writer:
+                for i in range(reader.num_record_batches):
+                    typeless_batch = reader.get_batch(i)
+                    writer.write_batch(
+                        pa.RecordBatch.from_arrays(
+                            typeless_batch.columns, schema=schema
+                        )
+                    )
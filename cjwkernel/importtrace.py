@@ -0,0 +1,140 @@
+"""Measure which Python modules kernel children import after they fork.
+
+The pyspawner zygote preloads `PRELOAD_IMPORTS`. Every other module a child
+imports gets executed anew in each child -- costing time on every render,
+fetch and migrate_params. `Kernel(trace_imports=True)` records those imports,
+and `suggest_preload_imports()` ranks them.
+
+This is a profiling aid. Children are untrusted, so their traces are, too.
+"""
+import builtins
+import contextlib
+import json
+import sys
+import time
+from typing import Any, ContextManager, Dict, Iterable, List, NamedTuple, TextIO
+
+__all__ = (
+    "ImportTrace",
+    "PreloadSuggestion",
+    "parse_import_trace",
+    "suggest_preload_imports",
+    "trace_imports",
+)
+
+
+LOG_PREFIX = "cjwkernel.importtrace: "
+"""Prefix of the stderr line on which a child reports its imports."""
+
+
+@contextlib.contextmanager
+def trace_imports(log_file: TextIO) -> ContextManager[Dict[str, float]]:
+    """Time each import that executes a module; log the result on exit.
+
+    Yield `{module_name: seconds}`. Only record outermost imports: if `a`
+    imports `b`, only `a` is recorded, and its time includes `b`'s. Preloading
+    `a` would preload `b`, too.
+
+    On exit (even on error), write the durations as a single JSON line,
+    prefixed by `LOG_PREFIX`, to `log_file`.
+
+    `importlib.import_module()` bypasses `builtins.__import__`, so we miss
+    modules imported that way.
+    """
+    durations: Dict[str, float] = {}
+    real_import = builtins.__import__
+    depth = 0
+
+    def traced_import(name, globals=None, locals=None, fromlist=(), level=0):
+        nonlocal depth
+        if level != 0 or depth > 0 or name in sys.modules:
+            # Relative imports and nested imports count toward their parent
+            depth += 1
+            try:
+                return real_import(name, globals, locals, fromlist, level)
+            finally:
+                depth -= 1
+
+        start = time.perf_counter()
+        depth += 1
+        try:
+            return real_import(name, globals, locals, fromlist, level)
+        finally:
+            depth -= 1
+            if name in sys.modules:
+                durations[name] = durations.get(name, 0.0) + (
+                    time.perf_counter() - start
+                )
+
+    builtins.__import__ = traced_import
+    try:
+        yield durations
+    finally:
+        builtins.__import__ = real_import
+        log_file.write(LOG_PREFIX + json.dumps(durations) + "\n")
+        log_file.flush()
+
+
+def parse_import_trace(log: str) -> Dict[str, float]:
+    """Find the `trace_imports()` output in a child's `log`.
+
+    Return `{}` if the child logged no valid trace.
+    """
+    for line in reversed(log.split("\n")):
+        if line.startswith(LOG_PREFIX):
+            try:
+                value = json.loads(line[len(LOG_PREFIX) :])
+            except ValueError:
+                return {}
+            if not isinstance(value, dict):
+                return {}
+            return {
+                k: float(v)
+                for k, v in value.items()
+                if isinstance(v, (int, float)) and not isinstance(v, bool)
+            }
+    return {}
+
+
+class ImportTrace(NamedTuple):
+    """What one child imported after it forked."""
+
+    module_slug: str
+    function: str
+    """Kernel function, such as "render_thrift"."""
+
+    durations: Dict[str, float]
+    """Seconds spent importing each outermost import."""
+
+
+class PreloadSuggestion(NamedTuple):
+    """A module we ought to add to `PRELOAD_IMPORTS`."""
+
+    name: str
+    n_children: int
+    """Number of traced children that imported this module."""
+
+    total_seconds: float
+    """Time we would have saved, across all traced children."""
+
+    module_slugs: List[str]
+    """Workbench modules whose children imported this module."""
+
+
+def suggest_preload_imports(traces: Iterable[ImportTrace]) -> List[PreloadSuggestion]:
+    """Rank every traced import by how much time preloading it would save."""
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for trace in traces:
+        for name, seconds in trace.durations.items():
+            stats = by_name.setdefault(
+                name, {"n_children": 0, "total_seconds": 0.0, "module_slugs": []}
+            )
+            stats["n_children"] += 1
+            stats["total_seconds"] += seconds
+            if trace.module_slug not in stats["module_slugs"]:
+                stats["module_slugs"].append(trace.module_slug)
+
+    return sorted(
+        (PreloadSuggestion(name, **stats) for name, stats in by_name.items()),
+        key=lambda s: (-s.total_seconds, s.name),
+    )
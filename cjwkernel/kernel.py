@@ -1,31 +1,46 @@
+import ctypes
 import io
 import logging
 import os
 import os.path
+import platform
+import select
 import selectors
+import signal
 import time
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import pyspawner
 import thrift.protocol.TBinaryProtocol
 import thrift.transport.TTransport
 from cjwkernel.chroot import READONLY_CHROOT_DIR, ChrootContext
-from cjwkernel.errors import ModuleExitedError, ModuleTimeoutError
+from cjwkernel.importtrace import ImportTrace, parse_import_trace
+from cjwkernel.errors import (
+    EXIT_CODE_OUT_OF_MEMORY,
+    ModuleExitedError,
+    ModuleResourceLimitError,
+    ModuleTimeoutError,
+)
 from cjwkernel.thrift import ttypes
 from cjwkernel.types import (
+    ChildResourceLimits,
+    ChildResourceUsage,
     CompiledModule,
+    ConditionalFetchResult,
     FetchResult,
+    FetchValidators,
     RenderResult,
     TabOutput,
     UploadedFile,
     arrow_fetch_result_to_thrift,
+    arrow_fetch_validators_to_thrift,
     arrow_tab_output_to_thrift,
     arrow_uploaded_file_to_thrift,
     pydict_to_thrift_json_object,
+    thrift_conditional_fetch_result_to_arrow,
     thrift_json_object_to_pydict,
-    thrift_fetch_result_to_arrow,
     thrift_render_result_to_arrow,
 )
 
@@ -33,8 +48,8 @@ logger = logging.getLogger(__name__)
 
 
 TIMEOUT = 600  # seconds
-DEAD_PROCESS_N_WAITS = 500  # number of waitpid() calls after process exits
-DEAD_PROCESS_WAIT_POLL_INTERVAL = 0.02  # seconds between waitpid() calls
+DEAD_PROCESS_TIMEOUT = 10  # seconds to wait for exit after child closes its fds
+DEAD_PROCESS_WAIT_POLL_INTERVAL = 0.02  # seconds between wait4() calls, sans pidfd
 LOG_BUFFER_MAX_BYTES = 100 * 1024  # waaaay too much log output
 OUTPUT_BUFFER_MAX_BYTES = (
     2 * 1024 * 1024
@@ -48,6 +63,138 @@ ENCODING_IMPORTS = [
 ]
 
 
+# Try to preload all the Python modules that any Workbench module
+# might use.
+#
+# When we preload, we execute the Python code once, during Workbench
+# startup.
+#
+# When we neglect to preload a Python module, every Workbench Step
+# that imports it will execute it every time it is run.
+#
+# The huge win here is pyarrow+numpy+pandas, which takes >1s to run.
+# Other imports only help a little bit.
+#
+# `./manage.py profile-preload-imports` suggests additions to this list.
+PRELOAD_IMPORTS = [
+    # Python
+    "abc",
+    "asyncio",
+    "base64",
+    "collections",
+    "concurrent",
+    "concurrent.futures",
+    "concurrent.futures.thread",
+    "dataclasses",
+    "datetime",
+    "enum",
+    "functools",
+    "inspect",
+    "itertools",
+    "json",
+    "math",
+    "multiprocessing",
+    "multiprocessing.connection",
+    "multiprocessing.popen_fork",
+    "os.path",
+    "pathlib",
+    "re",
+    "sqlite3",
+    "ssl",
+    "string",
+    "_strptime",
+    "tarfile",
+    "typing",
+    "urllib.parse",
+    "warnings",
+    *ENCODING_IMPORTS,
+    # Third-party
+    "bs4",
+    "formulas",
+    "formulas.functions.operators",
+    "formulas.parser",
+    "html5lib",
+    "html5lib.constants",
+    "html5lib.filters",
+    "html5lib.filters.whitespace",
+    "html5lib.treewalkers.etree",
+    "idna.uts46data",
+    "lxml",
+    "lxml.etree",
+    "lxml.html",
+    "lxml.html.html5parser",
+    "lz4",
+    "lz4.frame",
+    "nltk",
+    "nltk.corpus",
+    "nltk.sentiment.vader",
+    "numpy",
+    "oauthlib",
+    "oauthlib.oauth1",
+    "oauthlib.oauth2",
+    "pandas",
+    "pandas.core",
+    "pandas.core.apply",
+    "pandas.core.computation.expressions",
+    "pandas.core.groupby.categorical",
+    "pyarrow",
+    "pyarrow.pandas_compat",
+    "pyarrow.parquet",
+    "pytz",
+    "re2",
+    "schedula.dispatcher",
+    "schedula.utils.blue",
+    "schedula.utils.sol",
+    "thrift.protocol.TBinaryProtocol",
+    "thrift.transport.TTransport",
+    "yaml",
+    # Other Workbench-controlled packages
+    "cjwmodule",
+    "cjwmodule.http.client",
+    "cjwmodule.http.httpfile",
+    "cjwmodule.i18n",
+    "cjwmodule.spec",
+    "cjwmodule.spec.loader",
+    "cjwmodule.spec.paramfield",
+    "cjwmodule.spec.paramschema",
+    "cjwmodule.util",
+    "cjwpandasmodule",
+    "cjwpandasmodule.convert",
+    "cjwpandasmodule.validate",
+    "cjwparquet",
+    "cjwparse.api",
+    # Internal
+    "cjwkernel.importtrace",
+    "cjwkernel.pandas.main",
+    "cjwkernel.pandas.module",
+]
+
+
+_SYS_pidfd_open = 434  # same on every Linux architecture
+
+
+def _pidfd_open(pid: int) -> Optional[int]:
+    """Return a file descriptor that becomes readable when `pid` exits.
+
+    Return None if the running Linux kernel does not support pidfd_open(2)
+    (Linux < 5.3). Python 3.8 has no `os.pidfd_open()`, so we call the syscall
+    through libc.
+    """
+    if hasattr(os, "pidfd_open"):
+        try:
+            return os.pidfd_open(pid)
+        except OSError:
+            return None
+
+    if platform.system() != "Linux":
+        return None
+    libc = ctypes.CDLL(None, use_errno=True)
+    fd = libc.syscall(_SYS_pidfd_open, pid, 0)
+    if fd < 0:
+        return None  # ENOSYS, most likely
+    return fd
+
+
 @dataclass
 class ChildReader:
     fileno: int
@@ -126,6 +273,15 @@ class Kernel:
     Child processes cannot be trusted to return sane values. So we communicate
     via Thrift (which errors on unexpected data) rather than Python pickle
     (which executes code on unexpected data).
+
+    Each child gets `memory_limit_bytes` of address space and
+    `cpu_limit_seconds` of CPU time (None means unlimited). A child that
+    exceeds either raises ModuleResourceLimitError, so one workflow can't hog
+    the resources every other workflow needs.
+
+    With `trace_imports=True`, each child reports the modules it imports that
+    `PRELOAD_IMPORTS` does not include, and we append an `ImportTrace` to
+    `self.import_traces`. That's for profiling, not production.
     """
 
     def __init__(
@@ -134,11 +290,19 @@ class Kernel:
         migrate_params_timeout: float = TIMEOUT,
         fetch_timeout: float = TIMEOUT,
         render_timeout: float = TIMEOUT,
+        memory_limit_bytes: Optional[int] = None,
+        cpu_limit_seconds: Optional[int] = None,
+        trace_imports: bool = False,
     ):
         self.validate_timeout = validate_timeout
         self.migrate_params_timeout = migrate_params_timeout
         self.fetch_timeout = fetch_timeout
         self.render_timeout = render_timeout
+        self.resource_limits = ChildResourceLimits(
+            memory_bytes=memory_limit_bytes, cpu_seconds=cpu_limit_seconds
+        )
+        self.trace_imports = trace_imports
+        self.import_traces: List[ImportTrace] = []
         self._pyspawner = pyspawner.Client(
             child_main="cjwkernel.pandas.main.main",
             executable="/opt/venv/cjwkernel/bin/python",
@@ -157,108 +321,7 @@ class Kernel:
                 # I'm frustrated.
                 "OPENBLAS_NUM_THREADS": "1",
             },
-            # Try to preload all the Python modules that any Workbench module
-            # might use.
-            #
-            # When we preload, we execute the Python code once, during Workbench
-            # startup.
-            #
-            # When we neglect to preload a Python module, every Workbench Step
-            # that imports it will execute it every time it is run.
-            #
-            # The huge win here is pyarrow+numpy+pandas, which takes >1s to run.
-            # Other imports only help a little bit.
-            preload_imports=[
-                # Python
-                "abc",
-                "asyncio",
-                "base64",
-                "collections",
-                "concurrent",
-                "concurrent.futures",
-                "concurrent.futures.thread",
-                "dataclasses",
-                "datetime",
-                "enum",
-                "functools",
-                "inspect",
-                "itertools",
-                "json",
-                "math",
-                "multiprocessing",
-                "multiprocessing.connection",
-                "multiprocessing.popen_fork",
-                "os.path",
-                "pathlib",
-                "re",
-                "sqlite3",
-                "ssl",
-                "string",
-                "_strptime",
-                "tarfile",
-                "typing",
-                "urllib.parse",
-                "warnings",
-                *ENCODING_IMPORTS,
-                # Third-party
-                "bs4",
-                "formulas",
-                "formulas.functions.operators",
-                "formulas.parser",
-                "html5lib",
-                "html5lib.constants",
-                "html5lib.filters",
-                "html5lib.filters.whitespace",
-                "html5lib.treewalkers.etree",
-                "idna.uts46data",
-                "lxml",
-                "lxml.etree",
-                "lxml.html",
-                "lxml.html.html5parser",
-                "lz4",
-                "lz4.frame",
-                "nltk",
-                "nltk.corpus",
-                "nltk.sentiment.vader",
-                "numpy",
-                "oauthlib",
-                "oauthlib.oauth1",
-                "oauthlib.oauth2",
-                "pandas",
-                "pandas.core",
-                "pandas.core.apply",
-                "pandas.core.computation.expressions",
-                "pandas.core.groupby.categorical",
-                "pyarrow",
-                "pyarrow.pandas_compat",
-                "pyarrow.parquet",
-                "pytz",
-                "re2",
-                "schedula.dispatcher",
-                "schedula.utils.blue",
-                "schedula.utils.sol",
-                "thrift.protocol.TBinaryProtocol",
-                "thrift.transport.TTransport",
-                "yaml",
-                # Other Workbench-controlled packages
-                "cjwmodule",
-                "cjwmodule.http.client",
-                "cjwmodule.http.httpfile",
-                "cjwmodule.i18n",
-                "cjwmodule.spec",
-                "cjwmodule.spec.loader",
-                "cjwmodule.spec.paramfield",
-                "cjwmodule.spec.paramschema",
-                "cjwmodule.util",
-                "cjwpandasmodule",
-                "cjwpandasmodule.convert",
-                "cjwpandasmodule.validate",
-                "cjwparquet",
-                "cjwparse.api",
-                # Internal
-                "cjwkernel.pandas.main",
-                "cjwkernel.pandas.module",
-            ],
+            preload_imports=PRELOAD_IMPORTS,
         )
 
     def __del__(self):
@@ -283,7 +346,7 @@ class Kernel:
         self, compiled_module: CompiledModule, params: Dict[str, Any]
     ) -> None:
         """Call a module's migrate_params()."""
-        response = self._run_in_child(
+        response, _ = self._run_in_child(
             chroot_dir=READONLY_CHROOT_DIR,
             network_config=None,
             compiled_module=compiled_module,
@@ -306,9 +369,13 @@ class Kernel:
         tab_outputs: List[TabOutput],
         uploaded_files: Dict[str, UploadedFile],
         output_filename: str,
+        fetch_result_arrow_filename: Optional[str] = None,
     ) -> RenderResult:
         """Run the module's `render_thrift()` function and return its result.
 
+        `fetch_result_arrow_filename`, if set, is an Arrow file in `basedir`
+        with the same data as `fetch_result`'s Parquet file.
+
         Raise ModuleError if the module has a bug.
         """
         chroot_dir = chroot_context.chroot.root
@@ -330,15 +397,16 @@ class Kernel:
             ),
             output_filename=output_filename,
             input_filename=input_filename,
+            fetch_result_arrow_filename=fetch_result_arrow_filename,
         )
         if compiled_module.module_slug in {"pythoncode", "ACS2016"}:
             # TODO disallow networking; make network_config always None
-            network_config = pyspawner.NetworkConfig()
+            network_config = chroot_context.chroot.network_config
         else:
             network_config = None
         try:
             with chroot_context.writable_file(basedir / output_filename):
-                result = self._run_in_child(
+                result, resource_usage = self._run_in_child(
                     chroot_dir=chroot_dir,
                     network_config=network_config,
                     compiled_module=compiled_module,
@@ -350,7 +418,15 @@ class Kernel:
         finally:
             chroot_context.clear_unowned_edits()
 
-        return thrift_render_result_to_arrow(result)
+        try:
+            render_result = thrift_render_result_to_arrow(result)
+        except ValueError as err:
+            raise ModuleExitedError(
+                compiled_module.module_slug,
+                0,
+                "Module wrote invalid JSON: %s" % str(err),
+            ) from None
+        return render_result._replace(resource_usage=resource_usage)
 
     def fetch(
         self,
@@ -362,11 +438,18 @@ class Kernel:
         last_fetch_result: Optional[FetchResult],
         input_parquet_filename: Optional[str],
         output_filename: str,
-    ) -> FetchResult:
+        last_fetch_validators: Optional[FetchValidators] = None,
+    ) -> ConditionalFetchResult:
         """Run the module's `fetch_thrift()` function and return its result.
 
+        Pass `last_fetch_validators` (with `last_fetch_result`) to let the
+        module answer "not modified". Then the return value's `.result` may
+        be `None`, meaning `last_fetch_result` is still current.
+
         Raise ModuleError if the module has a bug.
         """
+        if last_fetch_result is None:
+            last_fetch_validators = None  # "not modified" would be meaningless
         chroot_dir = chroot_context.chroot.root
         basedir_seen_by_module = Path("/") / basedir.relative_to(chroot_dir)
         request = ttypes.FetchRequest(
@@ -380,12 +463,19 @@ class Kernel:
             ),
             input_table_parquet_filename=input_parquet_filename,
             output_filename=output_filename,
+            last_fetch_validators=(
+                None
+                if last_fetch_validators is None
+                else arrow_fetch_validators_to_thrift(last_fetch_validators)
+            ),
         )
         try:
             with chroot_context.writable_file(basedir / output_filename):
-                result = self._run_in_child(
+                # cjwmodule's FetchResult has no room for resource usage;
+                # _run_in_child() logs it.
+                result, _ = self._run_in_child(
                     chroot_dir=chroot_dir,
-                    network_config=pyspawner.NetworkConfig(),
+                    network_config=chroot_context.chroot.network_config,
                     compiled_module=compiled_module,
                     timeout=self.fetch_timeout,
                     result=ttypes.FetchResult(),
@@ -395,6 +485,13 @@ class Kernel:
         finally:
             chroot_context.clear_unowned_edits()
 
+        if result.not_modified and last_fetch_validators is None:
+            raise ModuleExitedError(
+                compiled_module.module_slug,
+                0,
+                "Module returned not_modified without last_fetch_validators",
+            )
+
         if result.filename and result.filename != output_filename:
             raise ModuleExitedError(
                 compiled_module.module_slug, 0, "Module wrote to wrong output file"
@@ -404,7 +501,7 @@ class Kernel:
         # sense to truncate; but fetch results aren't necessarily data frames.
         # It's up to the module to enforce this logic ... but we need to set a
         # maximum file size.
-        return thrift_fetch_result_to_arrow(result, basedir)
+        return thrift_conditional_fetch_result_to_arrow(result, basedir)
 
     def _run_in_child(
         self,
@@ -416,7 +513,7 @@ class Kernel:
         result: Any,
         function: str,
         args: List[Any],
-    ) -> None:
+    ) -> Tuple[Any, ChildResourceUsage]:
         """Fork a child process to run `function` with `args`.
 
         `args` must be Thrift data types. `result` must also be a Thrift type --
@@ -425,18 +522,32 @@ class Kernel:
 
         Raise ModuleExitedError if the child process did not behave as expected.
 
+        Raise ModuleResourceLimitError if it exceeded `self.resource_limits`.
+
         Raise ModuleTimeoutError if it did not exit after a delay -- or if it
         closed its file descriptors long before it exited.
+
+        Return `(result, resource_usage)`. We log `resource_usage`, too.
         """
-        limit_time = time.time() + timeout
+        start_time = time.time()
+        limit_time = start_time + timeout
 
         module_process = self._pyspawner.spawn_child(
-            args=[compiled_module, function, args],
+            args=[
+                compiled_module,
+                function,
+                args,
+                self.resource_limits,
+                self.trace_imports,
+            ],
             process_name=compiled_module.module_slug,
             sandbox_config=pyspawner.SandboxConfig(
                 chroot_dir=chroot_dir, network=network_config
             ),
         )
+        # Open the pidfd before we reap the child: after that, the pid may
+        # belong to another process.
+        pidfd = _pidfd_open(module_process.pid)
 
         # stdout is Thrift package; stderr is logs
         output_reader = ChildReader(
@@ -469,20 +580,31 @@ class Kernel:
 
         # The child closed its fds, so it should die soon. If it doesn't, that's
         # a bug -- so kill -9 it!
-        #
-        # os.wait() has no timeout option, and asyncio messes with signals so
-        # we won't use those. Spin until the process dies, and force-kill if we
-        # spin too long.
-        for _ in range(DEAD_PROCESS_N_WAITS):
-            pid, exit_status = module_process.wait(os.WNOHANG)
-            if pid != 0:  # pid==0 means process is still running
-                break
-            time.sleep(DEAD_PROCESS_WAIT_POLL_INTERVAL)
-        else:
+        exit_status, rusage = self._wait_for_exit(module_process, pidfd)
+        if exit_status is None:
             # we waited and waited. No luck. Dead module. Kill it.
             timed_out = True
             module_process.kill()
-            _, exit_status = module_process.wait(0)
+            _, exit_status, rusage = os.wait4(module_process.pid, 0)
+        resource_usage = ChildResourceUsage.from_rusage(
+            time.time() - start_time, rusage
+        )
+        logger.info(
+            "%s:%s resource usage: %s",
+            compiled_module.module_slug,
+            function,
+            resource_usage,
+        )
+
+        if self.trace_imports:
+            self.import_traces.append(
+                ImportTrace(
+                    compiled_module.module_slug,
+                    function,
+                    parse_import_trace(log_reader.to_str()),
+                )
+            )
+
         if os.WIFEXITED(exit_status):
             exit_code = os.WEXITSTATUS(exit_status)
         elif os.WIFSIGNALED(exit_status):
@@ -493,13 +615,19 @@ class Kernel:
         if timed_out:
             raise ModuleTimeoutError(compiled_module.module_slug, timeout)
 
+        self._raise_if_resource_limit_exceeded(
+            compiled_module.module_slug, exit_code, resource_usage
+        )
+
         if exit_code != 0:
             raise ModuleExitedError(
                 compiled_module.module_slug, exit_code, log_reader.to_str()
             )
 
         transport = thrift.transport.TTransport.TMemoryBuffer(output_reader.buffer)
-        protocol = thrift.protocol.TBinaryProtocol.TBinaryProtocol(transport)
+        # TBinaryProtocolAccelerated decodes in C (when thrift's "fastbinary"
+        # extension is installed), and TMemoryBuffer supports it.
+        protocol = thrift.protocol.TBinaryProtocol.TBinaryProtocolAccelerated(transport)
         try:
             result.read(protocol)
         except EOFError:  # TODO handle other errors Thrift may throw
@@ -517,4 +645,57 @@ class Kernel:
         if log_reader.buffer:
             logger.info("Output from module process: %s", log_reader.to_str())
 
-        return result
+        return result, resource_usage
+
+    def _wait_for_exit(
+        self, module_process: pyspawner.ChildProcess, pidfd: Optional[int]
+    ) -> Tuple[Optional[int], Any]:
+        """Reap `module_process`; return `(exit_status, rusage)`. Close `pidfd`.
+
+        Return `(None, None)` if the process is still running after
+        `DEAD_PROCESS_TIMEOUT` seconds.
+
+        With a pidfd, we sleep until the kernel tells us the child exited.
+        Without one (Linux < 5.3), we poll. (os.wait() has no timeout option,
+        and asyncio messes with signals so we won't use SIGCHLD.)
+        """
+        if pidfd is not None:
+            try:
+                ready, _, _ = select.select([pidfd], [], [], DEAD_PROCESS_TIMEOUT)
+            finally:
+                os.close(pidfd)
+            if not ready:
+                return None, None
+            _, exit_status, rusage = os.wait4(module_process.pid, 0)
+            return exit_status, rusage
+        else:
+            limit_time = time.time() + DEAD_PROCESS_TIMEOUT
+            while True:
+                pid, exit_status, rusage = os.wait4(module_process.pid, os.WNOHANG)
+                if pid != 0:  # pid==0 means process is still running
+                    return exit_status, rusage
+                if time.time() >= limit_time:
+                    return None, None
+                time.sleep(DEAD_PROCESS_WAIT_POLL_INTERVAL)
+
+    def _raise_if_resource_limit_exceeded(
+        self, module_slug: str, exit_code: int, resource_usage: ChildResourceUsage
+    ) -> None:
+        """Raise ModuleResourceLimitError if the child died of a resource limit.
+
+        The child exits with EXIT_CODE_OUT_OF_MEMORY when it hits RLIMIT_AS.
+        The Linux kernel sends SIGXCPU when it hits the RLIMIT_CPU soft limit,
+        and SIGKILL if the child ignores that and hits the hard limit.
+        """
+        limits = self.resource_limits
+        if limits.memory_bytes is not None and exit_code == EXIT_CODE_OUT_OF_MEMORY:
+            raise ModuleResourceLimitError(module_slug, "memory", limits.memory_bytes)
+        if limits.cpu_seconds is not None and (
+            exit_code == -signal.SIGXCPU
+            or (
+                exit_code == -signal.SIGKILL
+                and resource_usage.user_time + resource_usage.system_time
+                >= limits.cpu_seconds
+            )
+        ):
+            raise ModuleResourceLimitError(module_slug, "cpu", limits.cpu_seconds)
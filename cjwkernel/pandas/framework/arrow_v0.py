@@ -1,3 +1,4 @@
+import inspect
 import shutil
 from pathlib import Path
 from typing import Any, Callable, Dict, NamedTuple, Optional
@@ -10,10 +11,13 @@ from cjwkernel import settings
 from cjwkernel.pandas.types import coerce_RenderError_list
 from cjwkernel.thrift import ttypes
 from cjwkernel.types import (
+    ConditionalFetchResult,
     UploadedFile,
+    arrow_conditional_fetch_result_to_thrift,
     arrow_fetch_result_to_thrift,
     arrow_render_error_to_thrift,
     thrift_fetch_result_to_arrow,
+    thrift_fetch_validators_to_arrow,
     thrift_json_object_to_pydict,
     thrift_uploaded_file_to_arrow,
 )
@@ -157,15 +161,30 @@ def call_fetch(fetch: Callable, request: ttypes.FetchRequest) -> ttypes.FetchRes
         )
     output_path = basedir / request.output_filename
 
+    kwargs = {}
+    spec = inspect.getfullargspec(fetch)
+    if spec.varkw or "last_fetch_validators" in spec.args + spec.kwonlyargs:
+        # Only pass the newer kwarg to modules that ask for it
+        if request.last_fetch_validators is None:
+            kwargs["last_fetch_validators"] = None
+        else:
+            kwargs["last_fetch_validators"] = thrift_fetch_validators_to_arrow(
+                request.last_fetch_validators
+            )
+
     result = fetch(
         params=params,
         secrets=secrets,
         last_fetch_result=last_fetch_result,
         input_table_parquet_path=input_table_parquet_path,
         output_path=output_path,
+        **kwargs,
     )
 
-    return arrow_fetch_result_to_thrift(result)
+    if isinstance(result, ConditionalFetchResult):
+        return arrow_conditional_fetch_result_to_thrift(result)
+    else:
+        return arrow_fetch_result_to_thrift(result)
 
 
 def call_render(
@@ -217,5 +236,5 @@ def call_render(
 
     return ttypes.RenderResult(
         errors=[arrow_render_error_to_thrift(e) for e in errors],
-        json={},  # this framework never produces JSON
+        json_encoded="",  # this framework never produces JSON
     )
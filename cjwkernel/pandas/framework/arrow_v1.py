@@ -10,7 +10,7 @@ from cjwkernel import settings
 from cjwkernel.thrift import ttypes
 from cjwkernel.types import (
     arrow_render_error_to_thrift,
-    pydict_to_thrift_json_object,
+    pydict_to_thrift_json_encoded,
     thrift_fetch_result_to_arrow,
     thrift_json_object_to_pydict,
 )
@@ -62,6 +62,7 @@ def call_render(render: Callable, request: ttypes.RenderRequest) -> ttypes.Rende
             "render_arrow_v1() must return a cjwmodule.arrow.types.ArrowRenderResult"
         )
 
+    # One record batch per chunk: modules needn't combine_chunks() their output
     with pa.ipc.RecordBatchFileWriter(
         basedir / request.output_filename, schema=raw_result.table.schema
     ) as writer:
@@ -69,5 +70,5 @@ def call_render(render: Callable, request: ttypes.RenderRequest) -> ttypes.Rende
 
     return ttypes.RenderResult(
         errors=[arrow_render_error_to_thrift(e) for e in raw_result.errors],
-        json=pydict_to_thrift_json_object(raw_result.json),
+        json_encoded=pydict_to_thrift_json_encoded(raw_result.json),
     )
@@ -0,0 +1,164 @@
+import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import pyarrow as pa
+from cjwmodule.types import RenderError, UploadedFile
+from cjwmodule.arrow.types import TabOutput
+
+from cjwkernel import settings
+from cjwkernel.thrift import ttypes
+from cjwkernel.types import (
+    arrow_render_error_to_thrift,
+    pydict_to_thrift_json_encoded,
+    thrift_fetch_result_to_arrow,
+    thrift_json_object_to_pydict,
+)
+from cjwkernel.validate import load_trusted_arrow_file
+
+
+class StreamingRenderResult(NamedTuple):
+    """Value a `render_arrow_v2()` generator may `return` when it's done.
+
+    The table data is whatever the generator yielded.
+    """
+
+    errors: List[RenderError] = []
+    """User-facing errors or warnings reported by the module."""
+
+    json: Dict[str, Any] = {}
+    """JSON to pass to the module's HTML, if it has HTML."""
+
+
+def _empty_array_for_field(field: pa.Field) -> pa.Array:
+    if pa.types.is_dictionary(field.type):
+        return pa.DictionaryArray.from_arrays(
+            pa.array([], type=field.type.index_type),
+            pa.array([], type=field.type.value_type),
+        )
+    else:
+        return pa.array([], type=field.type)
+
+
+def _iter_input_batches(path: Path) -> Iterator[pa.RecordBatch]:
+    """Yield record batches from the (trusted) Arrow file at `path`.
+
+    Read one batch at a time: the file is mmapped, so a batch costs no RAM
+    until the module reads its values.
+
+    Yield at least one batch, so that a module that yields one output batch
+    per input batch still produces an output schema when the input is empty.
+    """
+    with pa.ipc.open_file(path) as reader:
+        if reader.num_record_batches == 0:
+            schema = reader.schema
+            yield pa.RecordBatch.from_arrays(
+                [_empty_array_for_field(field) for field in schema], schema=schema
+            )
+        else:
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+
+
+def _write_output_batches(path: Path, output: Iterator[pa.RecordBatch]) -> Any:
+    """Write every batch `output` yields to `path`; return its return value.
+
+    Write each batch as soon as it is yielded, so the module needn't hold its
+    whole output in RAM.
+
+    The first batch's schema is the output schema. Every subsequent batch must
+    have the same schema. If `output` yields no batches, write a zero-column
+    table.
+    """
+    schema: Optional[pa.Schema] = None
+    writer: Optional[pa.ipc.RecordBatchFileWriter] = None
+    try:
+        while True:
+            try:
+                batch = next(output)
+            except StopIteration as stop:
+                return stop.value
+
+            if not isinstance(batch, pa.RecordBatch):
+                # Crash. The module author wrote a buggy module.
+                raise ValueError("render_arrow_v2() must yield pyarrow.RecordBatch")
+
+            if writer is None:
+                schema = batch.schema
+                writer = pa.ipc.RecordBatchFileWriter(path, schema)
+            elif not batch.schema.equals(schema, check_metadata=True):
+                # Crash. The module author wrote a buggy module.
+                raise ValueError(
+                    "render_arrow_v2() must yield batches that all share one schema"
+                )
+
+            writer.write_batch(batch)
+    finally:
+        if writer is None:
+            writer = pa.ipc.RecordBatchFileWriter(path, pa.schema([]))
+        writer.close()
+
+
+def call_render(render: Callable, request: ttypes.RenderRequest) -> ttypes.RenderResult:
+    basedir = Path(request.basedir)
+    input_path = basedir / request.input_filename
+    with pa.ipc.open_file(input_path) as reader:
+        input_schema = reader.schema
+    params = thrift_json_object_to_pydict(request.params)
+
+    tab_outputs = {
+        k: TabOutput(
+            tab_name=v.tab_name,
+            table=load_trusted_arrow_file(basedir / v.table_filename),
+        )
+        for k, v in request.tab_outputs.items()
+    }
+
+    uploaded_files = {
+        k: UploadedFile(
+            name=v.name,
+            path=(basedir / v.filename),
+            uploaded_at=datetime.datetime.utcfromtimestamp(
+                v.uploaded_at_timestampus / 1000000.0
+            ),
+        )
+        for k, v in request.uploaded_files.items()
+    }
+
+    if request.fetch_result is None:
+        fetch_result = None
+    else:
+        fetch_result = thrift_fetch_result_to_arrow(request.fetch_result, basedir)
+
+    output = render(
+        _iter_input_batches(input_path),
+        params,
+        input_schema=input_schema,
+        settings=settings,
+        tab_name=request.tab_name,
+        tab_outputs=tab_outputs,
+        uploaded_files=uploaded_files,
+        fetch_result=fetch_result,
+    )
+
+    if not isinstance(output, Iterator):
+        # Crash. The module author wrote a buggy module.
+        raise ValueError(
+            "render_arrow_v2() must be a generator that yields pyarrow.RecordBatch"
+        )
+
+    raw_result = _write_output_batches(basedir / request.output_filename, output)
+
+    if raw_result is None:
+        raw_result = StreamingRenderResult()
+    elif not isinstance(raw_result, StreamingRenderResult):
+        # Crash. The module author wrote a buggy module.
+        raise ValueError(
+            "render_arrow_v2() must return None or a "
+            "cjwkernel.pandas.framework.arrow_v2.StreamingRenderResult"
+        )
+
+    return ttypes.RenderResult(
+        errors=[arrow_render_error_to_thrift(e) for e in raw_result.errors],
+        json_encoded=pydict_to_thrift_json_encoded(raw_result.json),
+    )
@@ -4,9 +4,8 @@ from pathlib import Path
 from typing import Any, Callable, Dict
 
 import pandas as pd
+import pyarrow as pa
 import cjwparquet
-import cjwpandasmodule
-import cjwpandasmodule.convert
 from cjwmodule.spec.paramschema import ParamSchema
 from cjwmodule.spec.types import ModuleSpec
 from cjwmodule.types import RenderError
@@ -16,8 +15,12 @@ from cjwkernel.pandas import types as ptypes
 from cjwkernel.pandas.types import arrow_schema_to_render_columns
 from cjwkernel.thrift import ttypes
 from cjwkernel.types import (
+    ConditionalFetchResult,
+    arrow_conditional_fetch_result_to_thrift,
+    arrow_fetch_validators_to_thrift,
     arrow_render_error_to_thrift,
     arrow_render_result_to_thrift,
+    thrift_fetch_validators_to_arrow,
     thrift_i18n_message_to_arrow,
     thrift_json_object_to_pydict,
 )
@@ -33,7 +36,7 @@ def _thrift_tab_output_to_pandas(
     return ptypes.TabOutput(
         tab_output.tab_name,
         render_columns,
-        cjwpandasmodule.convert.arrow_table_to_pandas_dataframe(table),
+        ptypes.arrow_table_to_dataframe(table),
     )
 
 
@@ -75,23 +78,27 @@ def _prepare_params(
     return recurse(module_spec.param_schema, params)
 
 
+def _fetched_arrow_table_to_pandas(arrow_table: pa.Table) -> pd.DataFrame:
+    return arrow_table.to_pandas(
+        date_as_object=False,
+        deduplicate_objects=True,
+        ignore_metadata=True,
+        categories=[
+            column_name.encode("utf-8")
+            for column_name, column in zip(
+                arrow_table.column_names, arrow_table.columns
+            )
+            if hasattr(column.type, "dictionary")
+        ],
+    )  # TODO ensure dictionaries stay dictionaries
+
+
 def _parquet_to_pandas(path: Path) -> pd.DataFrame:
     if path.stat().st_size == 0:
         return pd.DataFrame()
     else:
         with cjwparquet.open_as_mmapped_arrow(path) as arrow_table:
-            return arrow_table.to_pandas(
-                date_as_object=False,
-                deduplicate_objects=True,
-                ignore_metadata=True,
-                categories=[
-                    column_name.encode("utf-8")
-                    for column_name, column in zip(
-                        arrow_table.column_names, arrow_table.columns
-                    )
-                    if hasattr(column.type, "dictionary")
-                ],
-            )  # TODO ensure dictionaries stay dictionaries
+            return _fetched_arrow_table_to_pandas(arrow_table)
 
 
 def call_render(
@@ -100,7 +107,7 @@ def call_render(
     basedir = Path(request.basedir)
     input_path = basedir / request.input_filename
     table = load_trusted_arrow_file(input_path)
-    dataframe = cjwpandasmodule.convert.arrow_table_to_pandas_dataframe(table)
+    dataframe = ptypes.arrow_table_to_dataframe(table)
     tab_outputs = {
         k: _thrift_tab_output_to_pandas(v, basedir)
         for k, v in request.tab_outputs.items()
@@ -122,7 +129,16 @@ def call_render(
                 RenderError(thrift_i18n_message_to_arrow(e.message))
                 for e in request.fetch_result.errors
             ]
-            if (
+            if request.fetch_result_arrow_filename is not None:
+                # The renderer already converted the Parquet file to Arrow
+                arrow_table = load_trusted_arrow_file(
+                    basedir / request.fetch_result_arrow_filename
+                )
+                fetch_result = ptypes.ProcessResult(
+                    dataframe=_fetched_arrow_table_to_pandas(arrow_table),
+                    errors=errors,
+                )
+            elif (
                 fetch_result_path.stat().st_size == 0
                 or cjwparquet.file_has_parquet_magic_number(fetch_result_path)
             ):
@@ -150,8 +166,6 @@ def call_render(
     pandas_result = ptypes.ProcessResult.coerce(
         raw_result, try_fallback_columns=input_columns
     )
-    pandas_result.truncate_in_place_if_too_big()
-
     arrow_result = pandas_result.to_arrow(basedir / request.output_filename)
     return arrow_render_result_to_thrift(arrow_result)
 
@@ -192,10 +206,26 @@ def call_fetch(fetch: Callable, request: ttypes.FetchRequest) -> ttypes.FetchRes
     if varkw or "output_path" in kwonlyargs:
         kwargs["output_path"] = output_path
 
+    if varkw or "last_fetch_validators" in kwonlyargs:
+        if request.last_fetch_validators is None:
+            kwargs["last_fetch_validators"] = None
+        else:
+            kwargs["last_fetch_validators"] = thrift_fetch_validators_to_arrow(
+                request.last_fetch_validators
+            )
+
     result = fetch(params, **kwargs)
     if asyncio.iscoroutine(result):
         result = asyncio.run(result)
 
+    if isinstance(result, ConditionalFetchResult):
+        if result.result is None:
+            return arrow_conditional_fetch_result_to_thrift(result)
+        validators = result.validators
+        result = result.result
+    else:
+        validators = None
+
     if isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], Path):
         errors = ptypes.coerce_RenderError_list(result[1])
     elif isinstance(result, Path):
@@ -204,7 +234,6 @@ def call_fetch(fetch: Callable, request: ttypes.FetchRequest) -> ttypes.FetchRes
         errors = ptypes.coerce_RenderError_list(result)
     else:
         pandas_result = ptypes.ProcessResult.coerce(result)
-        pandas_result.truncate_in_place_if_too_big()
         # ProcessResult => FetchResult isn't a thing; but we can hack it using
         # ProcessResult => RenderResult => FetchResult.
         with tempfile_context(suffix=".arrow") as arrow_path:
@@ -220,4 +249,7 @@ def call_fetch(fetch: Callable, request: ttypes.FetchRequest) -> ttypes.FetchRes
     return ttypes.FetchResult(
         filename=request.output_filename,
         errors=[arrow_render_error_to_thrift(e) for e in errors],
+        validators=(
+            None if validators is None else arrow_fetch_validators_to_thrift(validators)
+        ),
     )
@@ -1,4 +1,7 @@
+import os
+import resource
 import sys
+import traceback
 import types
 from typing import Any, List
 
@@ -6,12 +9,28 @@ import thrift.protocol.TBinaryProtocol
 import thrift.transport.TTransport
 from cjwmodule.spec.loader import load_spec
 
+import cjwkernel.importtrace
 import cjwkernel.pandas.module
-from cjwkernel.types import CompiledModule
+from cjwkernel.errors import EXIT_CODE_OUT_OF_MEMORY
+from cjwkernel.types import ChildResourceLimits, CompiledModule
 
 
-def main(compiled_module: CompiledModule, function: str, args: List[Any]) -> None:
-    """Run `function` with `args`, and write the (Thrift) result to stdout."""
+def main(
+    compiled_module: CompiledModule,
+    function: str,
+    args: List[Any],
+    resource_limits: ChildResourceLimits = ChildResourceLimits(),
+    trace_imports: bool = False,
+) -> None:
+    """Run `function` with `args`, and write the (Thrift) result to stdout.
+
+    Exit with EXIT_CODE_OUT_OF_MEMORY if the module exceeds
+    `resource_limits.memory_bytes`. The kernel sends SIGXCPU if it exceeds
+    `resource_limits.cpu_seconds`.
+
+    If `trace_imports`, log the modules the module imports (and how long each
+    took) to stderr, for `cjwkernel.importtrace.parse_import_trace()`.
+    """
 
     assert function in (
         "render_thrift",
@@ -24,7 +43,39 @@ def main(compiled_module: CompiledModule, function: str, args: List[Any]) -> Non
     # stdout; we can't have text interwoven.
     sys.stdout = sys.stderr
 
-    run_in_sandbox(compiled_module, function, args)
+    set_resource_limits(resource_limits)
+
+    try:
+        if trace_imports:
+            with cjwkernel.importtrace.trace_imports(sys.stderr):
+                run_in_sandbox(compiled_module, function, args)
+        else:
+            run_in_sandbox(compiled_module, function, args)
+    except MemoryError:
+        # Let the parent distinguish "out of memory" from other crashes. Print
+        # the stack trace anyway: it helps module authors find the culprit.
+        traceback.print_exc()
+        sys.stderr.flush()
+        os._exit(EXIT_CODE_OUT_OF_MEMORY)
+
+
+def set_resource_limits(resource_limits: ChildResourceLimits) -> None:
+    """Call setrlimit(2), so the kernel stops us from hogging RAM or CPU.
+
+    Any process may lower its own limits; our seccomp filter allows it.
+    """
+    if resource_limits.memory_bytes is not None:
+        resource.setrlimit(
+            resource.RLIMIT_AS,
+            (resource_limits.memory_bytes, resource_limits.memory_bytes),
+        )
+    if resource_limits.cpu_seconds is not None:
+        # At the soft limit, the kernel sends SIGXCPU (which kills us). One
+        # second later, at the hard limit, it sends SIGKILL.
+        resource.setrlimit(
+            resource.RLIMIT_CPU,
+            (resource_limits.cpu_seconds, resource_limits.cpu_seconds + 1),
+        )
 
 
 def run_in_sandbox(
@@ -62,6 +113,7 @@ def run_in_sandbox(
         "render",
         "render_arrow",
         "render_arrow_v1",
+        "render_arrow_v2",
         "render_pandas",
         "render_thrift",
     ):
@@ -82,7 +134,9 @@ def run_in_sandbox(
         raise NotImplementedError
 
     transport = thrift.transport.TTransport.TFileObjectTransport(sys.__stdout__.buffer)
-    protocol = thrift.protocol.TBinaryProtocol.TBinaryProtocol(transport)
+    # TBinaryProtocolAccelerated encodes in C (when thrift's "fastbinary"
+    # extension is installed).
+    protocol = thrift.protocol.TBinaryProtocol.TBinaryProtocolAccelerated(transport)
     if result is not None:
         result.write(protocol)
     transport.flush()
@@ -271,13 +271,63 @@ def series_to_arrow_array(series: pd.Series) -> pa.Array:
             series_to_arrow_array(series.cat.categories),
         )
     elif pd.PeriodDtype(freq="D") == series.dtype:
+        # A day Period's ordinal is days since the epoch -- just like date32.
+        # asi8 is an int64 view of the ordinals (NaT is a sentinel we mask).
         return pa.array(
-            [(None if v is pd.NaT else v.ordinal) for v in series], type=pa.date32()
-        )
+            series.array.asi8, type=pa.int32(), mask=series.array.isna()
+        ).cast(pa.date32())
     else:
         return pa.array(series, type=_dtype_to_arrow_type(series.dtype))
 
 
+def arrow_table_to_dataframe(table: pa.Table) -> pd.DataFrame:
+    """Convert `table` to a Pandas DataFrame for a pandas_v0 module.
+
+    Convert with a single `Table.to_pandas(split_blocks=True)` call. The
+    naive approach -- one Series per column, then `pd.DataFrame(...)` --
+    makes Pandas consolidate same-dtype columns into 2-D blocks, copying every
+    value a second time.
+
+    date32 columns become `PeriodDtype(freq="D")` Series, as legacy modules
+    expect.
+
+    Every column is writable. (Legacy modules edit values in place; Arrow's
+    zero-copy arrays are read-only, so we copy those.)
+    """
+    date_indices = [
+        i for i, field in enumerate(table.schema) if pa.types.is_date32(field.type)
+    ]
+    date_columns = {
+        i: (
+            table.column_names[i],
+            pd.arrays.PeriodArray(table.column(i).to_numpy(), freq="D"),
+        )
+        for i in date_indices
+    }
+    if date_indices:
+        table = table.drop([name for name, _ in date_columns.values()])
+
+    if table.num_columns == 0:
+        dataframe = pd.DataFrame(index=pd.RangeIndex(0, table.num_rows))
+    else:
+        dataframe = table.to_pandas(
+            date_as_object=False,
+            deduplicate_objects=True,
+            ignore_metadata=True,
+            split_blocks=True,
+        )
+    # to_pandas() may return read-only (zero-copy) blocks. Copy just those,
+    # block by block. Rebuilding the DataFrame instead would consolidate all
+    # same-dtype columns into one 2-D block -- copying every value again.
+    for block in dataframe._data.blocks:
+        if isinstance(block.values, np.ndarray) and not block.values.flags.writeable:
+            block.values = block.values.copy()
+
+    for i, (name, period_array) in date_columns.items():  # ascending i
+        dataframe.insert(i, name, period_array)
+    return dataframe
+
+
 def _fix_arrow_field(field: pa.Field, column_type: ColumnType):
     if isinstance(column_type, ColumnType.Date):
         return field.with_metadata({"unit": column_type.unit})
@@ -286,24 +336,38 @@ def _fix_arrow_field(field: pa.Field, column_type: ColumnType):
     return field
 
 
+def _head_series(series: pd.Series, n: int) -> pd.Series:
+    head = series.iloc[:n]  # a view, not a copy
+    if hasattr(head, "cat"):
+        # Arrow dictionaries may not contain unused values
+        head = head.cat.remove_unused_categories()
+    return head
+
+
 def dataframe_to_arrow_table(
-    dataframe: pd.DataFrame, columns: List[Column], path: Path
+    dataframe: pd.DataFrame, columns: List[Column], path: Path, max_rows: int
 ) -> None:
-    """Write `dataframe` to an Arrow file."""
-    arrays = []
-    for column in columns:
-        arrays.append(series_to_arrow_array(dataframe[column.name]))
+    """Write the first `max_rows` rows of `dataframe` to an Arrow file.
 
-    arrow_table_without_metadata = pa.Table.from_arrays(
-        arrays, names=[c.name for c in columns]
+    Slice each Series before converting it. That's zero-copy, so a too-big
+    `dataframe` costs no more RAM than one that fits.
+    """
+    if len(dataframe) > max_rows:
+        arrays = [
+            series_to_arrow_array(_head_series(dataframe[column.name], max_rows))
+            for column in columns
+        ]
+    else:
+        arrays = [series_to_arrow_array(dataframe[column.name]) for column in columns]
+    schema = pa.schema(
+        [
+            _fix_arrow_field(pa.field(column.name, array.type), column.type)
+            for column, array in zip(columns, arrays)
+        ]
     )
-    fields = [
-        _fix_arrow_field(arrow_table_without_metadata.schema.field(i), columns[i].type)
-        for i in range(len(columns))
-    ]
-    arrow_table = pa.table(arrow_table_without_metadata.columns, pa.schema(fields))
+    arrow_table = pa.Table.from_arrays(arrays, schema=schema)
 
-    with pa.RecordBatchFileWriter(str(path), arrow_table.schema) as writer:
+    with pa.RecordBatchFileWriter(str(path), schema) as writer:
         writer.write_table(arrow_table)
 
 
@@ -424,32 +488,6 @@ class ProcessResult:
             and self.columns == other.columns
         )
 
-    def truncate_in_place_if_too_big(self) -> "ProcessResult":
-        """
-        Truncate dataframe in-place and add to self.errors if truncated.
-        """
-        old_len = len(self.dataframe)
-        new_len = min(old_len, settings.MAX_ROWS_PER_TABLE)
-        if new_len != old_len:
-            self.dataframe.drop(
-                range(settings.MAX_ROWS_PER_TABLE, old_len), inplace=True
-            )
-            self.errors.append(
-                RenderError(
-                    trans(
-                        "py.cjwkernel.pandas.types.ProcessResult.truncate_in_place_if_too_big.warning",
-                        default="Truncated output from {old_number} rows to {new_number}",
-                        arguments={"old_number": old_len, "new_number": new_len},
-                    )
-                )
-            )
-            self.dataframe.reset_index(inplace=True, drop=True)
-            # Nix unused categories
-            for column in self.dataframe:
-                series = self.dataframe[column]
-                if hasattr(series, "cat"):
-                    series.cat.remove_unused_categories(inplace=True)
-
     @property
     def column_names(self):
         return [c.name for c in self.columns]
@@ -612,6 +650,23 @@ class ProcessResult:
 
         RenderResult is a lower-level (and more modern) representation of a
         module's result. Prefer it everywhere. We will deprecate ProcessResult.
+
+        If the dataframe has more than `settings.MAX_ROWS_PER_TABLE` rows,
+        only write that many rows and add a warning to the result's errors.
+        (`self` is unchanged.)
         """
-        dataframe_to_arrow_table(self.dataframe, self.columns, path)
-        return atypes.RenderResult(errors=self.errors, json=self.json)
+        errors = self.errors
+        n_rows = len(self.dataframe)
+        max_rows = settings.MAX_ROWS_PER_TABLE
+        if n_rows > max_rows:
+            errors = errors + [
+                RenderError(
+                    trans(
+                        "py.cjwkernel.pandas.types.ProcessResult.truncate_in_place_if_too_big.warning",
+                        default="Truncated output from {old_number} rows to {new_number}",
+                        arguments={"old_number": n_rows, "new_number": max_rows},
+                    )
+                )
+            ]
+        dataframe_to_arrow_table(self.dataframe, self.columns, path, max_rows)
+        return atypes.RenderResult(errors=errors, json=self.json)
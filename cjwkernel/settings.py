@@ -7,7 +7,13 @@ MAX_ROWS_PER_TABLE = 1_000_000
 How much table can we parse?
 
 Modules must truncate their results to conform to the row-number limit. The
-default `render_pandas()` implementation does this.
+pandas_v0 framework does this for `render()`, by writing only the first
+`MAX_ROWS_PER_TABLE` rows of the module's DataFrame.
+
+This is also a row budget. Modules receive these settings as
+`settings=...`; a module that generates rows (e.g., by parsing, joining or
+reshaping) may stop once it has produced `MAX_ROWS_PER_TABLE` rows: any rows
+beyond that would be thrown away.
 """
 
 MAX_COLUMNS_PER_TABLE = 600
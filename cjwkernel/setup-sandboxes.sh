@@ -11,8 +11,10 @@
 # is a source of frustration: integration-test runs privileged but staging
 # and production don't. If you're messing with sandboxes, test on staging.
 #
-# This is _one_ chroot environment, suitable for _one_ command. Assume
-# pyspawner never runs two commands at once.
+# Each editable chroot is suitable for _one_ command at a time. The fetcher
+# runs $CJW_FETCHER_N_CONCURRENT_FETCHES commands at once, so we build that
+# many editable chroots (default 1). cjwkernel.chroot.editable_chroot() must
+# agree with this script about paths, veth names and IP addresses.
 #
 # We use overlay mounts:
 #
@@ -35,7 +37,7 @@
 #       * var/tmp/ (empty folder)
 #       * ...
 #   * chroot/ (on a separate filesystem)
-#     * editable/ (a singleton)
+#     * editable/ (and editable1/, editable2/ ... for concurrent fetches)
 #       * upperfs.ext4 (a 20GB sparse file with ext4 filesystem)
 #       * upperfs/ (upperfs.ext4, loopback-mounted)
 #         * upper/ (empty: where mounts and edits from caller+module go)
@@ -71,9 +73,18 @@ CHROOT=/var/lib/cjwkernel/chroot
 LAYERS=/var/lib/cjwkernel/chroot-layers
 EDITABLE_CHROOT_SIZE=20G  # max size of user edits in EDITABLE_CHROOT
 
-# NetworkConfig mimics pyspawner/pyspawner/sandbox.py
-KERNEL_VETH=veth-pyspawn
-CHILD_VETH_IP4="192.168.123.2"
+N_EDITABLE_CHROOTS=${CJW_FETCHER_N_CONCURRENT_FETCHES:-1}
+# cjworkbench/settings/fetchconcurrency.py enforces the same limit: beyond
+# 100, "veth-pyspawnNc" is too long for a Linux interface name.
+if [ "$N_EDITABLE_CHROOTS" -lt 1 ] || [ "$N_EDITABLE_CHROOTS" -gt 100 ]; then
+  echo "CJW_FETCHER_N_CONCURRENT_FETCHES must be between 1 and 100" >&2
+  exit 1
+fi
+
+# NetworkConfig mimics pyspawner/pyspawner/sandbox.py and
+# cjwkernel.chroot.editable_chroot(): chroot N uses veth-pyspawnN (N>0) and
+# 192.168.(123+N).0/24. "veth-pyspawn+" matches all their kernel interfaces.
+KERNEL_VETHS=veth-pyspawn+
 
 
 # /app/cjwkernel (base layer)
@@ -104,64 +115,86 @@ fi
 # "out of disk space" errors. We build a sparse file (`truncate`) to make this
 # script super-fast on producion. (We don't care much about FS speed. The
 # intended use case is large tempfiles and no fsync. When files grow beyond
-# the Linux I/O cache size, users should expect slowdowns.)
-mkdir -p $CHROOT/editable/upperfs
-truncate --size=$EDITABLE_CHROOT_SIZE $CHROOT/editable/upperfs.ext4  # create sparse file
-mkfs.ext4 -q -O ^has_journal $CHROOT/editable/upperfs.ext4
-if ! mount -o loop $CHROOT/editable/upperfs.ext4 $CHROOT/editable/upperfs; then
-  # Docker without --privileged doesn't provide a loopback device. This affects
-  # dev mode (which we don't care about). But it should never happen on production.
-  echo "******* WARNING: failed to mount loopback filesystem $CHROOT/editable/upperfs *****" >&2
-  echo "Workbench will not constrain modules' disk usage. If a module writes" >&2
-  echo "too much to disk, Workbench will experience undefined behavior." >&2
-fi
-# Build overlay filesystem, with upper layer on upperfs
-mkdir -p $CHROOT/editable/upperfs/{upper,work}
-mkdir -p $CHROOT/editable/root
-mount -t overlay overlay -o dirsync,lowerdir=$LAYERS/base,upperdir=$CHROOT/editable/upperfs/upper,workdir=$CHROOT/editable/upperfs/work $CHROOT/editable/root
-
+# the Linux I/O cache size, users should expect slowdowns.) Each editable
+# chroot gets its own upperfs.ext4: one module can't fill another's disk.
+for i in $(seq 0 $(($N_EDITABLE_CHROOTS - 1))); do
+  if [ "$i" = 0 ]; then
+    EDITABLE=$CHROOT/editable
+  else
+    EDITABLE=$CHROOT/editable$i
+  fi
+  mkdir -p $EDITABLE/upperfs
+  truncate --size=$EDITABLE_CHROOT_SIZE $EDITABLE/upperfs.ext4  # create sparse file
+  mkfs.ext4 -q -O ^has_journal $EDITABLE/upperfs.ext4
+  if ! mount -o loop $EDITABLE/upperfs.ext4 $EDITABLE/upperfs; then
+    # Docker without --privileged doesn't provide a loopback device. This affects
+    # dev mode (which we don't care about). But it should never happen on production.
+    echo "******* WARNING: failed to mount loopback filesystem $EDITABLE/upperfs *****" >&2
+    echo "Workbench will not constrain modules' disk usage. If a module writes" >&2
+    echo "too much to disk, Workbench will experience undefined behavior." >&2
+  fi
+  # Build overlay filesystem, with upper layer on upperfs
+  mkdir -p $EDITABLE/upperfs/{upper,work}
+  mkdir -p $EDITABLE/root
+  mount -t overlay overlay -o dirsync,lowerdir=$LAYERS/base,upperdir=$EDITABLE/upperfs/upper,workdir=$EDITABLE/upperfs/work $EDITABLE/root
+done
 
 # iptables
 # "ip route get 1.1.1.1" will display the default route. It looks like:
 #     1.1.1.1 via 192.168.86.1 dev wlp2s0 src 192.168.86.70 uid 1000
 # Grep for the "src x.x.x.x" part and store the "x.x.x.x"
 ipv4_snat_source=$(ip route get 1.1.1.1 | grep -oe "src [^ ]\+" | cut -d' ' -f2)
+forward_rules=""
+snat_rules=""
+for i in $(seq 0 $(($N_EDITABLE_CHROOTS - 1))); do
+  if [ "$i" = 0 ]; then
+    kernel_veth=veth-pyspawn
+  else
+    kernel_veth=veth-pyspawn$i
+  fi
+  child_veth_ip4="192.168.$((123 + $i)).2"
+  forward_rules="$forward_rules
+-A FORWARD -i $kernel_veth -s $child_veth_ip4 -j ACCEPT"
+  snat_rules="$snat_rules
+-A POSTROUTING -s $child_veth_ip4 -j SNAT --to-source $ipv4_snat_source"
+done
 cat << EOF | iptables-legacy-restore --noflush
 *filter
 :INPUT ACCEPT
 :FORWARD DROP
 # Block access to the host itself from a module.
--A INPUT -i $KERNEL_VETH -j REJECT
+-A INPUT -i $KERNEL_VETHS -j REJECT
 # Allow forwarding response packets back to our module (even
 # though our module's IP is in UNSAFE_IPV4_ADDRESS_BLOCKS).
--A FORWARD -o $KERNEL_VETH -j ACCEPT
+-A FORWARD -o $KERNEL_VETHS -j ACCEPT
 # Block unsafe destination addresses. Modules should not be
 # able to access internal services. (Not even our DNS server.)
--A FORWARD -d 0.0.0.0/8          -i $KERNEL_VETH -j REJECT
--A FORWARD -d 10.0.0.0/8         -i $KERNEL_VETH -j REJECT
--A FORWARD -d 100.64.0.0/10      -i $KERNEL_VETH -j REJECT
--A FORWARD -d 127.0.0.0/8        -i $KERNEL_VETH -j REJECT
--A FORWARD -d 169.254.0.0/16     -i $KERNEL_VETH -j REJECT
--A FORWARD -d 172.16.0.0/12      -i $KERNEL_VETH -j REJECT
--A FORWARD -d 192.0.0.0/24       -i $KERNEL_VETH -j REJECT
--A FORWARD -d 192.0.2.0/24       -i $KERNEL_VETH -j REJECT
--A FORWARD -d 192.88.99.0/24     -i $KERNEL_VETH -j REJECT
--A FORWARD -d 192.168.0.0/16     -i $KERNEL_VETH -j REJECT
--A FORWARD -d 198.18.0.0/15      -i $KERNEL_VETH -j REJECT
--A FORWARD -d 198.51.100.0/24    -i $KERNEL_VETH -j REJECT
--A FORWARD -d 203.0.113.0/24     -i $KERNEL_VETH -j REJECT
--A FORWARD -d 224.0.0.0/4        -i $KERNEL_VETH -j REJECT
--A FORWARD -d 240.0.0.0/4        -i $KERNEL_VETH -j REJECT
--A FORWARD -d 255.255.255.255/32 -i $KERNEL_VETH -j REJECT
+-A FORWARD -d 0.0.0.0/8          -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 10.0.0.0/8         -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 100.64.0.0/10      -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 127.0.0.0/8        -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 169.254.0.0/16     -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 172.16.0.0/12      -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 192.0.0.0/24       -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 192.0.2.0/24       -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 192.88.99.0/24     -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 192.168.0.0/16     -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 198.18.0.0/15      -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 198.51.100.0/24    -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 203.0.113.0/24     -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 224.0.0.0/4        -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 240.0.0.0/4        -i $KERNEL_VETHS -j REJECT
+-A FORWARD -d 255.255.255.255/32 -i $KERNEL_VETHS -j REJECT
 # Allow forwarding exactly the source address of the module.
 # Don't forward just any address (i.e. don't set policy
 # ACCEPT): if a module somehow gains CAP_NET_ADMIN (which
 # shouldn't happen) it should not be able to spoof source
 # addresses.
--A FORWARD -i $KERNEL_VETH -s $CHILD_VETH_IP4 -j ACCEPT
+# (One rule per editable chroot.)
+$forward_rules
 COMMIT
 *nat
 :POSTROUTING ACCEPT
--A POSTROUTING -s $CHILD_VETH_IP4 -j SNAT --to-source $ipv4_snat_source
+$snat_rules
 COMMIT
 EOF
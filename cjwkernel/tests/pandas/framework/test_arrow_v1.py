@@ -2,6 +2,7 @@ import unittest
 from datetime import date, datetime
 from pathlib import Path
 
+import pyarrow as pa
 from cjwmodule.spec.paramschema import ParamSchema
 from cjwmodule.arrow.testing import assert_arrow_table_equals, make_column, make_table
 from cjwmodule.arrow.types import ArrowRenderResult
@@ -136,6 +137,24 @@ class RenderTests(unittest.TestCase):
                 ),
             )
 
+    def test_render_write_output_table_many_record_batches(self):
+        def render_arrow_v1(table, params, **kwargs):
+            schema = make_table(make_column("A", ["x"])).schema
+            return ArrowRenderResult(
+                pa.Table.from_batches(
+                    [
+                        pa.record_batch([pa.array(["x", "y"])], schema=schema),
+                        pa.record_batch([pa.array(["z"])], schema=schema),
+                    ]
+                )
+            )
+
+        with ModuleTestEnv(render_arrow_v1=render_arrow_v1) as env:
+            outcome = env.call_render(make_table(), {})
+            table = outcome.read_table()
+            self.assertEqual(table.column(0).num_chunks, 2)
+            self.assertEqual(table["A"].to_pylist(), ["x", "y", "z"])
+
     def test_render_result(self):
         error = RenderError(
             message=I18nMessage("x", {"y": 1}, "module"),
@@ -0,0 +1,145 @@
+import unittest
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.compute
+from cjwmodule.arrow.testing import assert_arrow_table_equals, make_column, make_table
+from cjwmodule.types import I18nMessage, RenderError
+
+from cjwkernel.pandas.framework.arrow_v2 import StreamingRenderResult
+from cjwkernel.tests.util import override_settings
+from cjwkernel.types import RenderResult
+from .util import ModuleTestEnv
+
+
+class RenderTests(unittest.TestCase):
+    def test_render_with_tab_name(self):
+        def render_arrow_v2(batches, params, *, tab_name, **kwargs):
+            self.assertEqual(tab_name, "Tab X")
+            yield from batches
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            env.call_render(make_table(), {}, tab_name="Tab X")
+
+    @override_settings(MAX_ROWS_PER_TABLE=12)
+    def test_render_with_settings(self):
+        def render_arrow_v2(batches, params, *, settings, **kwargs):
+            self.assertEqual(settings.MAX_ROWS_PER_TABLE, 12)
+            yield from batches
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            env.call_render(make_table(), {})
+
+    def test_render_exception_raises(self):
+        def render_arrow_v2(batches, params, **kwargs):
+            raise RuntimeError("move along")
+            yield  # make this a generator
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            with self.assertRaisesRegex(RuntimeError, "move along"):
+                env.call_render(make_table(), {})
+
+    def test_render_not_a_generator(self):
+        def render_arrow_v2(batches, params, **kwargs):
+            return make_table()
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            with self.assertRaisesRegex(ValueError, "must be a generator"):
+                env.call_render(make_table(), {})
+
+    def test_render_yield_invalid_value(self):
+        def render_arrow_v2(batches, params, **kwargs):
+            yield make_table()  # not a RecordBatch
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            with self.assertRaisesRegex(ValueError, "must yield pyarrow.RecordBatch"):
+                env.call_render(make_table(), {})
+
+    def test_render_yield_inconsistent_schema(self):
+        def render_arrow_v2(batches, params, **kwargs):
+            yield pa.record_batch({"A": ["x"]})
+            yield pa.record_batch({"B": ["x"]})
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            with self.assertRaisesRegex(ValueError, "share one schema"):
+                env.call_render(make_table(), {})
+
+    def test_render_input_batches_and_schema(self):
+        table = make_table(
+            make_column("A", ["x", "y"]),
+            make_column("B", [1, 2], format="{:,.3f}"),
+            make_column("C", [date(2021, 4, 12), date(2021, 4, 19)], unit="week"),
+        )
+        two_batch_table = pa.Table.from_batches(
+            table.to_batches(max_chunksize=1), table.schema
+        )
+
+        def render_arrow_v2(batches, params, *, input_schema, **kwargs):
+            self.assertEqual(input_schema, table.schema)
+            batches = list(batches)
+            self.assertEqual(len(batches), 2)
+            assert_arrow_table_equals(pa.Table.from_batches(batches), two_batch_table)
+            yield from batches
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            env.call_render(two_batch_table, {})
+
+    def test_render_empty_input_yields_empty_batch(self):
+        schema = make_table(make_column("A", ["x"])).schema
+
+        def render_arrow_v2(batches, params, **kwargs):
+            batches = list(batches)
+            self.assertEqual(len(batches), 1)
+            self.assertEqual(batches[0].num_rows, 0)
+            self.assertEqual(batches[0].schema, schema)
+            yield from batches
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            outcome = env.call_render(pa.Table.from_batches([], schema), {})
+            self.assertEqual(outcome.read_table().column_names, ["A"])
+
+    def test_render_write_output_batches(self):
+        def render_arrow_v2(batches, params, **kwargs):
+            for batch in batches:
+                yield pa.record_batch(
+                    [pa.compute.utf8_upper(batch.column(0))], schema=batch.schema
+                )
+
+        table = make_table(make_column("A", ["x", "y", "z"]))
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            outcome = env.call_render(
+                pa.Table.from_batches(table.to_batches(max_chunksize=2)), {}
+            )
+            self.assertEqual(outcome.result, RenderResult())
+            result_table = outcome.read_table()
+            self.assertEqual(result_table.column(0).num_chunks, 2)
+            self.assertEqual(result_table["A"].to_pylist(), ["X", "Y", "Z"])
+
+    def test_render_yield_nothing_writes_zero_column_table(self):
+        def render_arrow_v2(batches, params, **kwargs):
+            return
+            yield  # make this a generator
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            outcome = env.call_render(make_table(make_column("A", ["x"])), {})
+            assert_arrow_table_equals(outcome.read_table(), make_table())
+
+    def test_render_result(self):
+        error = RenderError(message=I18nMessage("x", {"y": 1}, "module"))
+
+        def render_arrow_v2(batches, params, **kwargs):
+            yield from batches
+            return StreamingRenderResult([error], {"json": ["A-", 1]})
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            outcome = env.call_render(make_table(make_column("A", ["x"])), {})
+            self.assertEqual(outcome.result, RenderResult([error], {"json": ["A-", 1]}))
+
+    def test_render_invalid_return_value(self):
+        def render_arrow_v2(batches, params, **kwargs):
+            yield from batches
+            return {"foo": "bar"}
+
+        with ModuleTestEnv(render_arrow_v2=render_arrow_v2) as env:
+            with self.assertRaisesRegex(ValueError, "must return None or a"):
+                env.call_render(make_table(), {})
@@ -25,14 +25,18 @@ from cjwkernel.thrift import ttypes
 from cjwkernel.types import (
     Column,
     ColumnType,
+    ConditionalFetchResult,
     FetchError,
     FetchResult,
+    FetchValidators,
     I18nMessage,
     RenderError,
     RenderResult,
     TabOutput,
     arrow_fetch_result_to_thrift,
+    arrow_fetch_validators_to_thrift,
     pydict_to_thrift_json_object,
+    thrift_conditional_fetch_result_to_arrow,
     thrift_fetch_result_to_arrow,
 )
 from cjwkernel.util import create_tempdir, tempfile_context
@@ -125,6 +129,29 @@ class RenderTests(unittest.TestCase):
                     outcome.read_table(), make_table(make_column("A", ["fetched"]))
                 )
 
+    def test_render_with_arrow_copy_of_parquet_fetch_result(self):
+        def render(table, params, *, fetch_result):
+            return fetch_result
+
+        with ModuleTestEnv(render=render) as env:
+            with parquet_file(
+                {"A": ["from-parquet"]}, dir=env.basedir
+            ) as pf, arrow_table_context(
+                make_column("A", ["from-arrow"]), dir=env.basedir
+            ) as (
+                arrow_path,
+                _,
+            ):
+                outcome = env.call_render(
+                    make_table(),
+                    {},
+                    fetch_result=FetchResult(pf),
+                    fetch_result_arrow_filename=arrow_path.name,
+                )
+                assert_arrow_table_equals(
+                    outcome.read_table(), make_table(make_column("A", ["from-arrow"]))
+                )
+
     def test_render_with_non_parquet_fetch_result(self):
         def render(table, params, *, fetch_result):
             return pd.DataFrame({"A": [fetch_result.path.read_text()]})
@@ -267,13 +294,22 @@ class FetchTests(unittest.TestCase):
         shutil.rmtree(self.basedir)
         super().tearDown()
 
-    def _test_fetch(
+    def _test_fetch(self, fetch_fn, **kwargs):
+        thrift_result = self._call_fetch_thrift(fetch_fn, **kwargs)
+        return thrift_fetch_result_to_arrow(thrift_result, self.basedir)
+
+    def _test_conditional_fetch(self, fetch_fn, **kwargs):
+        thrift_result = self._call_fetch_thrift(fetch_fn, **kwargs)
+        return thrift_conditional_fetch_result_to_arrow(thrift_result, self.basedir)
+
+    def _call_fetch_thrift(
         self,
         fetch_fn,
         *,
         params={},
         secrets={},
         last_fetch_result=None,
+        last_fetch_validators=None,
         input_table_parquet_path=None,
         output_filename=None,
     ):
@@ -303,9 +339,14 @@ class FetchTests(unittest.TestCase):
                         else None
                     ),
                     output_filename=output_filename,
+                    last_fetch_validators=(
+                        arrow_fetch_validators_to_thrift(last_fetch_validators)
+                        if last_fetch_validators is not None
+                        else None
+                    ),
                 )
             )
-            return thrift_fetch_result_to_arrow(thrift_result, self.basedir)
+            return thrift_result
 
     def test_fetch_get_input_dataframe_happy_path(self):
         async def fetch(params, *, get_input_dataframe):
@@ -342,6 +383,44 @@ class FetchTests(unittest.TestCase):
 
         self._test_fetch(fetch, secrets={"A": "B"})
 
+    def test_fetch_last_fetch_validators(self):
+        async def fetch(params, *, last_fetch_validators):
+            self.assertEqual(last_fetch_validators, FetchValidators(etag='"abc"'))
+
+        self._test_fetch(fetch, last_fetch_validators=FetchValidators(etag='"abc"'))
+
+    def test_fetch_last_fetch_validators_none(self):
+        async def fetch(params, *, last_fetch_validators):
+            self.assertIsNone(last_fetch_validators)
+
+        self._test_fetch(fetch)
+
+    def test_fetch_return_not_modified(self):
+        async def fetch(params, *, last_fetch_validators):
+            return ConditionalFetchResult(None, last_fetch_validators)
+
+        result = self._test_conditional_fetch(
+            fetch, last_fetch_validators=FetchValidators(etag='"abc"')
+        )
+        self.assertEqual(
+            result, ConditionalFetchResult(None, FetchValidators(etag='"abc"'))
+        )
+
+    def test_fetch_return_dataframe_with_validators(self):
+        async def fetch(params):
+            return ConditionalFetchResult(
+                pd.DataFrame({"A": ["x"]}),
+                FetchValidators(last_modified="Wed, 21 Oct 2015 07:28:00 GMT"),
+            )
+
+        with tempfile_context(dir=self.basedir) as outfile:
+            result = self._test_conditional_fetch(fetch, output_filename=outfile.name)
+            self.assertEqual(result.result, FetchResult(outfile, []))
+            self.assertEqual(
+                result.validators,
+                FetchValidators(last_modified="Wed, 21 Oct 2015 07:28:00 GMT"),
+            )
+
     def test_fetch_return_dataframe(self):
         async def fetch(params):
             return pd.DataFrame({"A": ["x", "y"]})
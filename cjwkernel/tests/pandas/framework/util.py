@@ -103,6 +103,8 @@ class ModuleTestEnv:
         cjwkernel.pandas.module.__dict__.update(self.old_defs)
         if hasattr(cjwkernel.pandas.module, "render_arrow_v1"):
             del cjwkernel.pandas.module.render_arrow_v1
+        if hasattr(cjwkernel.pandas.module, "render_arrow_v2"):
+            del cjwkernel.pandas.module.render_arrow_v2
         del self.old_defs
         shutil.rmtree(self.basedir)
         del self.basedir
@@ -115,6 +117,7 @@ class ModuleTestEnv:
         tab_outputs: Dict[str, TabOutput] = {},
         fetch_result: Optional[FetchResult] = None,
         uploaded_files: Dict[str, UploadedFile] = {},
+        fetch_result_arrow_filename: Optional[str] = None,
     ) -> RenderOutcome:
         """Conveniently call the module's `render_thrift()`.
 
@@ -149,6 +152,7 @@ class ModuleTestEnv:
                             for k, v in uploaded_files.items()
                         },
                         output_filename=output_path.name,
+                        fetch_result_arrow_filename=fetch_result_arrow_filename,
                     )
                 )
             finally:
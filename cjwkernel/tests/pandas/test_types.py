@@ -24,12 +24,16 @@ from cjwkernel.pandas.types import (
     coerce_I18nMessage,
     coerce_RenderError_list,
     coerce_RenderError,
+    arrow_table_to_dataframe,
     dataframe_to_arrow_table,
     arrow_schema_to_render_columns,
 )
 from cjwkernel.tests.util import override_settings, tempfile_context
 from cjwkernel.util import create_tempfile
-from cjwkernel.validate import load_untrusted_arrow_file_with_columns
+from cjwkernel.validate import (
+    load_trusted_arrow_file,
+    load_untrusted_arrow_file_with_columns,
+)
 from cjwmodule.i18n import I18nMessage
 
 
@@ -884,33 +888,18 @@ class ProcessResultTests(unittest.TestCase):
             ProcessResult.coerce([None, "foo"])
 
     @override_settings(MAX_ROWS_PER_TABLE=2)
-    def test_truncate_too_big_no_error(self):
-        expected_df = pd.DataFrame({"foo": ["bar", "baz"]})
-        expected = ProcessResult(
-            dataframe=expected_df,
-            errors=[
-                RenderError(
-                    I18nMessage(
-                        "py.cjwkernel.pandas.types.ProcessResult.truncate_in_place_if_too_big.warning",
-                        {"old_number": 3, "new_number": 2},
-                        None,
-                    )
-                )
-            ],
-        )
-
-        result_df = pd.DataFrame({"foo": ["bar", "baz", "moo"]})
-        result = ProcessResult(result_df, errors=[])
-        result.truncate_in_place_if_too_big()
-
-        self.assertEqual(result, expected)
-
-    @override_settings(MAX_ROWS_PER_TABLE=2)
-    def test_truncate_too_big_and_error(self):
-        expected_df = pd.DataFrame({"foo": ["bar", "baz"]})
-        expected = ProcessResult(
-            dataframe=expected_df,
-            errors=[
+    def test_to_arrow_truncate_too_big(self):
+        dataframe = pd.DataFrame({"foo": ["bar", "baz", "moo"]})
+        result = ProcessResult(dataframe, errors=[RenderError(TODO_i18n("Some error"))])
+        with tempfile_context() as path:
+            arrow_result = result.to_arrow(path)
+            assert_arrow_table_equals(
+                load_trusted_arrow_file(path),
+                make_table(make_column("foo", ["bar", "baz"])),
+            )
+        self.assertEqual(
+            arrow_result.errors,
+            [
                 RenderError(TODO_i18n("Some error")),
                 RenderError(
                     I18nMessage(
@@ -921,29 +910,35 @@ class ProcessResultTests(unittest.TestCase):
                 ),
             ],
         )
-
-        result_df = pd.DataFrame({"foo": ["bar", "baz", "moo"]})
-        result = ProcessResult(result_df, errors=[RenderError(TODO_i18n("Some error"))])
-        result.truncate_in_place_if_too_big()
-
-        self.assertEqual(result, expected)
+        # `result` itself is unchanged
+        self.assertEqual(len(result.dataframe), 3)
+        self.assertEqual(len(result.errors), 1)
 
     @override_settings(MAX_ROWS_PER_TABLE=2)
-    def test_truncate_too_big_remove_unused_categories(self):
-        result_df = pd.DataFrame({"A": ["x", "y", "z", "z"]}, dtype="category")
-        result = ProcessResult(result_df)
-        result.truncate_in_place_if_too_big()
-        assert_frame_equal(
-            result.dataframe, pd.DataFrame({"A": ["x", "y"]}, dtype="category")
-        )
-
-    def test_truncate_not_too_big(self):
-        df = pd.DataFrame({"foo": ["foo", "bar", "baz"]})
-        expected = ProcessResult(df.copy())
-        result = ProcessResult(df)
-        result.truncate_in_place_if_too_big()
+    def test_to_arrow_truncate_too_big_remove_unused_categories(self):
+        dataframe = pd.DataFrame({"A": ["x", "y", "z", "z"]}, dtype="category")
+        with tempfile_context() as path:
+            ProcessResult(dataframe).to_arrow(path)
+            assert_arrow_table_equals(
+                load_trusted_arrow_file(path),
+                pa.table(
+                    {
+                        "A": pa.DictionaryArray.from_arrays(
+                            pa.array([0, 1], pa.int8()), pa.array(["x", "y"])
+                        )
+                    }
+                ),
+            )
 
-        self.assertEqual(result, expected)
+    def test_to_arrow_not_too_big(self):
+        dataframe = pd.DataFrame({"foo": ["foo", "bar", "baz"]})
+        with tempfile_context() as path:
+            arrow_result = ProcessResult(dataframe).to_arrow(path)
+            assert_arrow_table_equals(
+                load_trusted_arrow_file(path),
+                make_table(make_column("foo", ["foo", "bar", "baz"])),
+            )
+        self.assertEqual(arrow_result.errors, [])
 
     def test_columns(self):
         df = pd.DataFrame(
@@ -1036,7 +1031,7 @@ class ArrowConversionTests(unittest.TestCase):
         expected_table: pa.Table,
     ) -> None:
         with tempfile_context() as path:
-            dataframe_to_arrow_table(dataframe, columns, path)
+            dataframe_to_arrow_table(dataframe, columns, path, len(dataframe))
             # "untrusted": more integration-test-ish
             result_table, result_columns = load_untrusted_arrow_file_with_columns(path)
             assert_arrow_table_equals(result_table, expected_table)
@@ -1141,3 +1136,51 @@ class ArrowConversionTests(unittest.TestCase):
             ),
             {"A": RenderColumn("A", "date", "month")},
         )
+
+    def test_arrow_table_to_dataframe(self):
+        assert_frame_equal(
+            arrow_table_to_dataframe(
+                make_table(
+                    make_column("A", [1, 2], format="{:d}"),
+                    make_column("B", [date(2021, 4, 1), None], unit="month"),
+                    make_column("C", ["x", None], dictionary=True),
+                    make_column("D", [1.5, 2.5]),
+                )
+            ),
+            pd.DataFrame(
+                {
+                    "A": [1, 2],
+                    "B": pd.array(
+                        [pd.Period("2021-04-01", freq="D"), None], dtype="period[D]"
+                    ),
+                    "C": pd.Series(["x", None], dtype="category"),
+                    "D": [1.5, 2.5],
+                }
+            ),
+        )
+
+    def test_arrow_table_to_dataframe_only_date_columns(self):
+        assert_frame_equal(
+            arrow_table_to_dataframe(
+                make_table(make_column("A", [date(2021, 4, 1)], unit="day"))
+            ),
+            pd.DataFrame(
+                {"A": pd.array([pd.Period("2021-04-01", freq="D")], dtype="period[D]")}
+            ),
+        )
+
+    def test_arrow_table_to_dataframe_zero_columns(self):
+        assert_frame_equal(
+            arrow_table_to_dataframe(pa.table({})),
+            pd.DataFrame(index=pd.RangeIndex(0, 0)),
+        )
+
+    def test_arrow_table_to_dataframe_columns_are_writable(self):
+        # Legacy modules modify their input in place
+        dataframe = arrow_table_to_dataframe(
+            make_table(make_column("A", [1, 2]), make_column("B", [1.5, 2.5]))
+        )
+        dataframe["A"].values[0] = 3
+        dataframe["B"].values[0] = 3.5
+        self.assertEqual(dataframe["A"].tolist(), [3, 2])
+        self.assertEqual(dataframe["B"].tolist(), [3.5, 2.5])
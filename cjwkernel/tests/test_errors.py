@@ -2,6 +2,7 @@ import unittest
 from cjwkernel.errors import (
     ModuleError,
     ModuleExitedError,
+    ModuleResourceLimitError,
     ModuleTimeoutError,
     format_for_user_debugging,
 )
@@ -13,6 +14,20 @@ class FormatForUserDebuggingTests(unittest.TestCase):
             format_for_user_debugging(ModuleTimeoutError("x", 5.0)), "timed out"
         )
 
+    def test_resource_limit_memory(self):
+        self.assertEqual(
+            format_for_user_debugging(
+                ModuleResourceLimitError("x", "memory", 2 * 1024 * 1024 * 1024)
+            ),
+            "out of memory (limit 2048MB)",
+        )
+
+    def test_resource_limit_cpu(self):
+        self.assertEqual(
+            format_for_user_debugging(ModuleResourceLimitError("x", "cpu", 60)),
+            "out of CPU time (limit 60s)",
+        )
+
     def test_exited_sigkill(self):
         self.assertEqual(
             format_for_user_debugging(ModuleExitedError("x", -9, "")), "SIGKILL"
@@ -0,0 +1,80 @@
+import io
+import sys
+import unittest
+
+from cjwkernel.importtrace import (
+    ImportTrace,
+    PreloadSuggestion,
+    parse_import_trace,
+    suggest_preload_imports,
+    trace_imports,
+)
+
+
+class TraceImportsTest(unittest.TestCase):
+    def test_record_new_import(self):
+        sys.modules.pop("colorsys", None)
+        log = io.StringIO()
+        with trace_imports(log) as durations:
+            import colorsys  # noqa: F401
+        self.assertEqual(list(durations.keys()), ["colorsys"])
+        self.assertEqual(parse_import_trace(log.getvalue()), durations)
+
+    def test_ignore_already_imported(self):
+        import json  # noqa: F401
+
+        log = io.StringIO()
+        with trace_imports(log) as durations:
+            import json  # noqa: F401,F811
+        self.assertEqual(durations, {})
+
+    def test_log_on_error(self):
+        sys.modules.pop("colorsys", None)
+        log = io.StringIO()
+        with self.assertRaises(RuntimeError):
+            with trace_imports(log):
+                import colorsys  # noqa: F401
+
+                raise RuntimeError
+        self.assertEqual(list(parse_import_trace(log.getvalue()).keys()), ["colorsys"])
+
+
+class ParseImportTraceTest(unittest.TestCase):
+    def test_no_trace(self):
+        self.assertEqual(parse_import_trace("Traceback...\nValueError: x\n"), {})
+
+    def test_trace_amid_other_output(self):
+        self.assertEqual(
+            parse_import_trace(
+                'hi\ncjwkernel.importtrace: {"a": 0.5, "b": 1}\nTraceback...\n'
+            ),
+            {"a": 0.5, "b": 1.0},
+        )
+
+    def test_invalid_json(self):
+        self.assertEqual(parse_import_trace("cjwkernel.importtrace: {\n"), {})
+
+    def test_ignore_non_numbers(self):
+        self.assertEqual(
+            parse_import_trace(
+                'cjwkernel.importtrace: {"a": "x", "b": true, "c": 0.1}\n'
+            ),
+            {"c": 0.1},
+        )
+
+
+class SuggestPreloadImportsTest(unittest.TestCase):
+    def test_rank_by_total_seconds(self):
+        self.assertEqual(
+            suggest_preload_imports(
+                [
+                    ImportTrace("m1", "render_thrift", {"a": 0.25, "b": 0.75}),
+                    ImportTrace("m1", "fetch_thrift", {"a": 0.125}),
+                    ImportTrace("m2", "render_thrift", {"a": 0.5}),
+                ]
+            ),
+            [
+                PreloadSuggestion("a", 3, 0.875, ["m1", "m2"]),
+                PreloadSuggestion("b", 1, 0.75, ["m1"]),
+            ],
+        )
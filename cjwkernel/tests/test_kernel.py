@@ -10,7 +10,11 @@ import yaml
 from cjwmodule.arrow.testing import assert_arrow_table_equals, make_column, make_table
 
 from cjwkernel.chroot import EDITABLE_CHROOT
-from cjwkernel.errors import ModuleExitedError, ModuleTimeoutError
+from cjwkernel.errors import (
+    ModuleExitedError,
+    ModuleResourceLimitError,
+    ModuleTimeoutError,
+)
 from cjwkernel.kernel import Kernel
 from cjwkernel.tests.util import arrow_table_context
 from cjwkernel.validate import load_untrusted_arrow_file_with_columns
@@ -146,6 +150,30 @@ class KernelTests(unittest.TestCase):
         with self.assertRaises(ModuleExitedError):
             self.kernel.migrate_params(mod, {"foo": 123})
 
+    def test_migrate_params_out_of_memory(self):
+        mod = _compile(
+            "foo", "def migrate_params(params): return {'x': len(bytearray(64 << 30))}"
+        )
+        with patch.object(
+            self.kernel,
+            "resource_limits",
+            types.ChildResourceLimits(memory_bytes=16 << 30),
+        ):
+            with self.assertRaises(ModuleResourceLimitError) as cm:
+                self.kernel.migrate_params(mod, {})
+        self.assertEqual(cm.exception.resource, "memory")
+        self.assertEqual(cm.exception.limit, 16 << 30)
+
+    def test_migrate_params_out_of_cpu(self):
+        mod = _compile("foo", "def migrate_params(params):\n  while True:\n    pass")
+        with patch.object(
+            self.kernel, "resource_limits", types.ChildResourceLimits(cpu_seconds=1)
+        ):
+            with self.assertRaises(ModuleResourceLimitError) as cm:
+                self.kernel.migrate_params(mod, {})
+        self.assertEqual(cm.exception.resource, "cpu")
+        self.assertEqual(cm.exception.limit, 1)
+
     def test_render_happy_path(self):
         spec = textwrap.dedent(
             """\
@@ -194,7 +222,13 @@ class KernelTests(unittest.TestCase):
                     output_filename=output_path.name,
                 )
 
-                self.assertEqual(result, types.RenderResult())
+                self.assertEqual(result.errors, [])
+                self.assertEqual(result.json, {})
+                self.assertGreater(result.resource_usage.max_rss_kb, 0)
+                self.assertGreater(
+                    result.resource_usage.user_time + result.resource_usage.system_time,
+                    0,
+                )
                 output_table, columns = load_untrusted_arrow_file_with_columns(
                     output_path
                 )
@@ -206,6 +240,47 @@ class KernelTests(unittest.TestCase):
                     ),
                 )
 
+    def test_render_deletes_module_tempfiles(self):
+        code = textwrap.dedent(
+            """\
+            import os
+            def render(table, params):
+                with open("/tmp/module-tempfile", "w") as f:
+                    f.write("x")
+                os.makedirs("/var/tmp/module-tempdir/subdir")
+                with open("/var/tmp/module-tempdir/subdir/file", "w") as f:
+                    f.write("x")
+                return table
+            """
+        )
+        mod = _compile("foo", code)
+        with arrow_table_context(make_column("A", ["x"]), dir=self.basedir) as (
+            input_table_path,
+            _,
+        ):
+            input_table_path.chmod(0o644)
+            with self.chroot_context.tempfile_context(
+                prefix="output-", dir=self.basedir
+            ) as output_path:
+                self.kernel.render(
+                    mod,
+                    self.chroot_context,
+                    basedir=self.basedir,
+                    input_filename=input_table_path.name,
+                    params={},
+                    tab_name="Tab 1",
+                    tab_outputs={},
+                    uploaded_files={},
+                    fetch_result=None,
+                    output_filename=output_path.name,
+                )
+            # Our own files are still here
+            self.assertTrue(input_table_path.exists())
+
+        root = self.chroot_context.chroot.root
+        self.assertFalse((root / "tmp" / "module-tempfile").exists())
+        self.assertFalse((root / "var" / "tmp" / "module-tempdir").exists())
+
     def test_render_exception(self):
         mod = _compile(
             "foo.py", "import os\ndef render(table, params): raise RuntimeError('fail')"
@@ -347,6 +422,72 @@ class KernelTests(unittest.TestCase):
                 output_filename=output_path.name,
             )
 
-            self.assertEquals(result.errors, [])
-            table = pyarrow.parquet.read_pandas(str(result.path))
+            self.assertEquals(result.result.errors, [])
+            table = pyarrow.parquet.read_pandas(str(result.result.path))
             self.assertEquals(table.to_pydict(), {"A": ["x"]})
+
+    def test_fetch_not_modified(self):
+        mod = _compile(
+            "foo",
+            textwrap.dedent(
+                """
+                from cjwkernel.types import ConditionalFetchResult, FetchValidators
+
+                def fetch(params, *, last_fetch_validators):
+                    assert last_fetch_validators.etag == '"abc"'
+                    return ConditionalFetchResult(None, FetchValidators(etag='"abc"'))
+                """
+            ).encode("utf-8"),
+        )
+
+        with contextlib.ExitStack() as ctx:
+            last_path = ctx.enter_context(
+                self.chroot_context.tempfile_context(prefix="last-", dir=self.basedir)
+            )
+            output_path = ctx.enter_context(
+                self.chroot_context.tempfile_context(prefix="output-", dir=self.basedir)
+            )
+            result = self.kernel.fetch(
+                mod,
+                self.chroot_context,
+                basedir=self.basedir,
+                params={},
+                secrets={},
+                input_parquet_filename=None,
+                last_fetch_result=types.FetchResult(last_path, []),
+                output_filename=output_path.name,
+                last_fetch_validators=types.FetchValidators(etag='"abc"'),
+            )
+
+            self.assertEqual(
+                result,
+                types.ConditionalFetchResult(None, types.FetchValidators(etag='"abc"')),
+            )
+
+    def test_fetch_not_modified_without_validators_is_error(self):
+        mod = _compile(
+            "foo",
+            textwrap.dedent(
+                """
+                from cjwkernel.types import ConditionalFetchResult
+
+                def fetch(params):
+                    return ConditionalFetchResult(None)
+                """
+            ).encode("utf-8"),
+        )
+
+        with self.chroot_context.tempfile_context(
+            prefix="output-", dir=self.basedir
+        ) as output_path:
+            with self.assertRaisesRegex(ModuleExitedError, "not_modified"):
+                self.kernel.fetch(
+                    mod,
+                    self.chroot_context,
+                    basedir=self.basedir,
+                    params={},
+                    secrets={},
+                    input_parquet_filename=None,
+                    last_fetch_result=None,
+                    output_filename=output_path.name,
+                )
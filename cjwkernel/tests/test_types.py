@@ -95,6 +95,22 @@ class ThriftConvertersTest(unittest.TestCase):
             },
         )
 
+    def test_pydict_to_thrift_json_encoded(self):
+        self.assertEqual(
+            types.pydict_to_thrift_json_encoded({"A": ["é", 1, 2.5, True, None]}),
+            '{"A":["é",1,2.5,true,null]}',
+        )
+
+    def test_pydict_to_thrift_json_encoded_nan(self):
+        with self.assertRaises(ValueError):
+            types.pydict_to_thrift_json_encoded({"A": float("nan")})
+        with self.assertRaises(ValueError):
+            types.pydict_to_thrift_json_encoded({"A": [float("inf")]})
+
+    def test_pydict_to_thrift_json_encoded_invalid_value(self):
+        with self.assertRaisesRegex(ValueError, "Invalid JSON-ish value"):
+            types.pydict_to_thrift_json_encoded({"A": object()})
+
     def test_i18n_message_from_thrift_source_module(self):
         self.assertEqual(
             types.thrift_i18n_message_to_arrow(
@@ -310,10 +326,58 @@ class ThriftConvertersTest(unittest.TestCase):
         )
 
     def test_render_result_from_thrift(self):
-        pass  # TODO test RenderResult conversion
+        self.assertEqual(
+            types.thrift_render_result_to_arrow(
+                ttypes.RenderResult(
+                    [ttypes.RenderError(ttypes.I18nMessage("x", {}, None), [])],
+                    '{"A":["é",1,2.5,true,null,{}]}',
+                )
+            ),
+            types.RenderResult(
+                [types.RenderError(I18nMessage("x", {}, None))],
+                {"A": ["é", 1, 2.5, True, None, {}]},
+            ),
+        )
+
+    def test_render_result_from_thrift_empty_json(self):
+        self.assertEqual(
+            types.thrift_render_result_to_arrow(ttypes.RenderResult([], "")),
+            types.RenderResult([], {}),
+        )
+
+    def test_render_result_from_thrift_json_not_object(self):
+        with self.assertRaisesRegex(ValueError, "must encode a JSON Object"):
+            types.thrift_render_result_to_arrow(ttypes.RenderResult([], "[1,2]"))
+
+    def test_render_result_from_thrift_invalid_json(self):
+        with self.assertRaises(ValueError):
+            types.thrift_render_result_to_arrow(ttypes.RenderResult([], "{"))
 
     def test_render_result_to_thrift(self):
-        pass  # TODO test RenderResult conversion
+        self.assertEqual(
+            types.arrow_render_result_to_thrift(
+                types.RenderResult(
+                    [types.RenderError(I18nMessage("x", {}, None))],
+                    {"A": ["é", 1, 2.5, True, None, {}]},
+                )
+            ),
+            ttypes.RenderResult(
+                [ttypes.RenderError(ttypes.I18nMessage("x", {}, None), [])],
+                '{"A":["é",1,2.5,true,null,{}]}',
+            ),
+        )
+
+    def test_render_result_to_thrift_empty_json(self):
+        self.assertEqual(
+            types.arrow_render_result_to_thrift(types.RenderResult([], {})),
+            ttypes.RenderResult([], ""),
+        )
+
+    def test_render_result_to_thrift_invalid_json(self):
+        with self.assertRaisesRegex(ValueError, "Invalid JSON-ish value"):
+            types.arrow_render_result_to_thrift(
+                types.RenderResult([], {"A": datetime.date(2021, 4, 12)})
+            )
 
     def test_fetch_result_from_thrift_disallow_directories(self):
         with self.assertRaisesRegex(ValueError, "must not include directory names"):
@@ -358,6 +422,50 @@ class ThriftConvertersTest(unittest.TestCase):
                 ),
             )
 
+    def test_conditional_fetch_result_to_thrift_not_modified(self):
+        self.assertEqual(
+            types.arrow_conditional_fetch_result_to_thrift(
+                types.ConditionalFetchResult(None, types.FetchValidators(etag='"abc"'))
+            ),
+            ttypes.FetchResult(
+                "",
+                [],
+                validators=ttypes.FetchValidators(etag='"abc"'),
+                not_modified=True,
+            ),
+        )
+
+    def test_conditional_fetch_result_from_thrift_not_modified(self):
+        self.assertEqual(
+            types.thrift_conditional_fetch_result_to_arrow(
+                ttypes.FetchResult(
+                    "",
+                    [],
+                    validators=ttypes.FetchValidators(
+                        last_modified="Wed, 21 Oct 2015 07:28:00 GMT"
+                    ),
+                    not_modified=True,
+                ),
+                self.basedir,
+            ),
+            types.ConditionalFetchResult(
+                None,
+                types.FetchValidators(last_modified="Wed, 21 Oct 2015 07:28:00 GMT"),
+            ),
+        )
+
+    def test_conditional_fetch_result_from_thrift_no_validators(self):
+        with tempfile.NamedTemporaryFile(dir=str(self.basedir)) as tf:
+            filename = Path(tf.name).name
+            self.assertEqual(
+                types.thrift_conditional_fetch_result_to_arrow(
+                    ttypes.FetchResult(filename, []), self.basedir
+                ),
+                types.ConditionalFetchResult(
+                    types.FetchResult(Path(tf.name), []), types.FetchValidators()
+                ),
+            )
+
     def test_uploaded_file_to_thrift(self):
         self.assertEqual(
             types.arrow_uploaded_file_to_thrift(
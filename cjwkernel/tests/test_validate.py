@@ -19,7 +19,6 @@ from cjwkernel.validate import (
     TimestampUnitNotAllowed,
     DuplicateColumnName,
     InvalidArrowFile,
-    TableHasTooManyRecordBatches,
     WrongColumnType,
 )
 from cjwkernel.tests.util import arrow_table_context
@@ -91,9 +90,20 @@ class ReadColumnsTest(unittest.TestCase):
         with self.assertRaises(TableSchemaHasMetadata):
             read_columns(table)
 
-    def test_table_too_many_record_batches(self):
+    def test_table_many_record_batches_ok(self):
         table = pa.table({"A": pa.chunked_array([pa.array(["x"]), pa.array(["y"])])})
-        with self.assertRaises(TableHasTooManyRecordBatches):
+        self.assertEqual(read_columns(table), [Text("A")])
+
+    def test_table_many_record_batches_validate_every_batch(self):
+        table = pa.table(
+            [
+                pa.chunked_array(
+                    [pa.array([date(2021, 4, 1)]), pa.array([date(2021, 4, 2)])]
+                )
+            ],
+            pa.schema([pa.field("A", pa.date32(), metadata={b"unit": b"month"})]),
+        )
+        with self.assertRaises(DateValueHasWrongUnit):
             read_columns(table)
 
     def test_duplicate_column_names(self):
@@ -324,3 +334,50 @@ class ReadColumnsTest(unittest.TestCase):
         table = pa.table({"A": pa.array([1231231], pa.time64("ns"))})
         with self.assertRaises(WrongColumnType):
             read_columns(table)
+
+    def test_many_columns_ok(self):
+        table = pa.table(
+            [pa.array([date(2021, 4, 1), None])] * 20 + [pa.array(["x", None])] * 20,
+            pa.schema(
+                [
+                    pa.field("D%d" % i, pa.date32(), metadata={b"unit": b"month"})
+                    for i in range(20)
+                ]
+                + [pa.field("T%d" % i, pa.string()) for i in range(20)]
+            ),
+        )
+        self.assertEqual(
+            read_columns(table),
+            [Date("D%d" % i, "month") for i in range(20)]
+            + [Text("T%d" % i) for i in range(20)],
+        )
+
+    def test_many_columns_raise_leftmost_error(self):
+        table = pa.table(
+            [pa.array(["x"])] * 10
+            + [pa.array([date(2021, 4, 2)])]  # wrong unit: column "D"
+            + [pa.array(["x"])] * 10
+            + [pa.array([1231231], pa.time64("ns"))],  # wrong type: column "X"
+            pa.schema(
+                [pa.field("A%d" % i, pa.string()) for i in range(10)]
+                + [pa.field("D", pa.date32(), metadata={b"unit": b"month"})]
+                + [pa.field("B%d" % i, pa.string()) for i in range(10)]
+                + [pa.field("X", pa.time64("ns"))]
+            ),
+        )
+        with self.assertRaisesRegex(DateValueHasWrongUnit, "'D'"):
+            read_columns(table)
+
+    def test_many_columns_raise_duplicate_after_valid_columns(self):
+        table = pa.table(
+            [pa.array(["x"]), pa.array(["x"]), pa.array([1231231], pa.time64("ns"))],
+            pa.schema(
+                [
+                    pa.field("A", pa.string()),
+                    pa.field("A", pa.string()),
+                    pa.field("X", pa.time64("ns")),
+                ]
+            ),
+        )
+        with self.assertRaises(DuplicateColumnName):
+            read_columns(table)
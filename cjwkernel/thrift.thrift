@@ -126,6 +126,32 @@ struct RenderError {
   2: list<QuickFix> quick_fixes,
 }
 
+/**
+ * Cheap fingerprints of a fetched resource, for conditional fetches.
+ *
+ * A module that fetches over HTTP can send `etag` and `last_modified` in
+ * `If-None-Match` and `If-Modified-Since` request headers, and skip the
+ * download when the server responds "304 Not Modified".
+ */
+struct FetchValidators {
+  /**
+   * HTTP `ETag` response header, verbatim (e.g., `W/"abc"`).
+   */
+  1: optional string etag,
+
+  /**
+   * HTTP `Last-Modified` response header, verbatim.
+   */
+  2: optional string last_modified,
+
+  /**
+   * Hex-encoded SHA-256 of the stored fetch result.
+   *
+   * Workbench computes this. It ignores a module-supplied value.
+   */
+  3: optional string content_sha256,
+}
+
 /**
  * Parameters to `fetch()`.
  */
@@ -183,6 +209,14 @@ struct FetchRequest {
    * The file on disk is in the directory, `basedir`, and it is writable.
    */
   6: string output_filename,
+
+  /**
+   * Validators the previous fetch() reported for `last_fetch_result`.
+   *
+   * Set if and only if `last_fetch_result` is set. The module may answer
+   * with a `not_modified` FetchResult.
+   */
+  7: optional FetchValidators last_fetch_validators,
 }
 
 /**
@@ -206,6 +240,20 @@ struct FetchResult {
    * module authors; and 2) so we can run SQL to find common problems.
    */
   2: list<FetchError> errors,
+
+  /**
+   * Validators to store with this result, for the next fetch().
+   */
+  3: optional FetchValidators validators,
+
+  /**
+   * If true, `last_fetch_result` is still current: the module wrote nothing
+   * and the caller should keep its previous result. `filename` and `errors`
+   * are ignored.
+   *
+   * Only valid when the request included `last_fetch_validators`.
+   */
+  4: optional bool not_modified,
 }
 
 /**
@@ -291,6 +339,17 @@ struct RenderRequest {
    * `params` values may refer to keys here.
    */
   8: map<string, UploadedFile> uploaded_files,
+
+  /**
+   * Arrow copy of `fetch_result.filename`, if that file is Parquet.
+   *
+   * The renderer converts each Parquet fetch result to Arrow once and caches
+   * it, so pandas_v0 modules needn't decode Parquet on every render. Other
+   * frameworks ignore this and pass modules the Parquet file.
+   *
+   * The file on disk will be in `basedir`.
+   */
+  9: optional string fetch_result_arrow_filename,
 }
 
 /**
@@ -307,10 +366,16 @@ struct RenderResult {
    */
   1: list<RenderError> errors,
 
+  // 2: map<string, Json> json -- replaced by json_encoded
+
   /**
-   * JSON to pass to the module's HTML, if it has HTML.
+   * JSON Object to pass to the module's HTML, if it has HTML; empty means {}.
+   *
+   * This is encoded JSON, not a `map<string, Json>`: charts can output
+   * megabytes of JSON, and a `Json` struct per value costs far more than
+   * `json.dumps()` and `json.loads()`.
    */
-  2: map<string, Json> json,
+  3: string json_encoded,
 }
 
 /**
@@ -1016,6 +1016,106 @@ class RenderError(object):
         return not (self == other)
 
 
+class FetchValidators(object):
+    """
+    Cheap fingerprints of a fetched resource, for conditional fetches.
+
+    A module that fetches over HTTP can send `etag` and `last_modified` in
+    `If-None-Match` and `If-Modified-Since` request headers, and skip the
+    download when the server responds "304 Not Modified".
+
+    Attributes:
+     - etag: HTTP `ETag` response header, verbatim (e.g., `W/"abc"`).
+     - last_modified: HTTP `Last-Modified` response header, verbatim.
+     - content_sha256: Hex-encoded SHA-256 of the stored fetch result.
+
+    Workbench computes this. It ignores a module-supplied value.
+
+    """
+
+    __slots__ = (
+        'etag',
+        'last_modified',
+        'content_sha256',
+    )
+
+
+    def __init__(self, etag=None, last_modified=None, content_sha256=None,):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_sha256 = content_sha256
+
+    def read(self, iprot):
+        if iprot._fast_decode is not None and isinstance(iprot.trans, TTransport.CReadableTransport) and self.thrift_spec is not None:
+            iprot._fast_decode(self, iprot, [self.__class__, self.thrift_spec])
+            return
+        iprot.readStructBegin()
+        while True:
+            (fname, ftype, fid) = iprot.readFieldBegin()
+            if ftype == TType.STOP:
+                break
+            if fid == 1:
+                if ftype == TType.STRING:
+                    self.etag = iprot.readString().decode('utf-8') if sys.version_info[0] == 2 else iprot.readString()
+                else:
+                    iprot.skip(ftype)
+            elif fid == 2:
+                if ftype == TType.STRING:
+                    self.last_modified = iprot.readString().decode('utf-8') if sys.version_info[0] == 2 else iprot.readString()
+                else:
+                    iprot.skip(ftype)
+            elif fid == 3:
+                if ftype == TType.STRING:
+                    self.content_sha256 = iprot.readString().decode('utf-8') if sys.version_info[0] == 2 else iprot.readString()
+                else:
+                    iprot.skip(ftype)
+            else:
+                iprot.skip(ftype)
+            iprot.readFieldEnd()
+        iprot.readStructEnd()
+
+    def write(self, oprot):
+        if oprot._fast_encode is not None and self.thrift_spec is not None:
+            oprot.trans.write(oprot._fast_encode(self, [self.__class__, self.thrift_spec]))
+            return
+        oprot.writeStructBegin('FetchValidators')
+        if self.etag is not None:
+            oprot.writeFieldBegin('etag', TType.STRING, 1)
+            oprot.writeString(self.etag.encode('utf-8') if sys.version_info[0] == 2 else self.etag)
+            oprot.writeFieldEnd()
+        if self.last_modified is not None:
+            oprot.writeFieldBegin('last_modified', TType.STRING, 2)
+            oprot.writeString(self.last_modified.encode('utf-8') if sys.version_info[0] == 2 else self.last_modified)
+            oprot.writeFieldEnd()
+        if self.content_sha256 is not None:
+            oprot.writeFieldBegin('content_sha256', TType.STRING, 3)
+            oprot.writeString(self.content_sha256.encode('utf-8') if sys.version_info[0] == 2 else self.content_sha256)
+            oprot.writeFieldEnd()
+        oprot.writeFieldStop()
+        oprot.writeStructEnd()
+
+    def validate(self):
+        return
+
+    def __repr__(self):
+        L = ['%s=%r' % (key, getattr(self, key))
+             for key in self.__slots__]
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(L))
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+        for attr in self.__slots__:
+            my_val = getattr(self, attr)
+            other_val = getattr(other, attr)
+            if my_val != other_val:
+                return False
+        return True
+
+    def __ne__(self, other):
+        return not (self == other)
+
+
 class FetchRequest(object):
     """
     Parameters to `fetch()`.
@@ -1051,6 +1151,10 @@ class FetchRequest(object):
     writable.
 
     The file on disk is in the directory, `basedir`, and it is writable.
+     - last_fetch_validators: Validators the previous fetch() reported for `last_fetch_result`.
+
+    Set if and only if `last_fetch_result` is set. The module may answer
+    with a `not_modified` FetchResult.
 
     """
 
@@ -1061,16 +1165,18 @@ class FetchRequest(object):
         'last_fetch_result',
         'input_table_parquet_filename',
         'output_filename',
+        'last_fetch_validators',
     )
 
 
-    def __init__(self, basedir=None, params=None, secrets=None, last_fetch_result=None, input_table_parquet_filename=None, output_filename=None,):
+    def __init__(self, basedir=None, params=None, secrets=None, last_fetch_result=None, input_table_parquet_filename=None, output_filename=None, last_fetch_validators=None,):
         self.basedir = basedir
         self.params = params
         self.secrets = secrets
         self.last_fetch_result = last_fetch_result
         self.input_table_parquet_filename = input_table_parquet_filename
         self.output_filename = output_filename
+        self.last_fetch_validators = last_fetch_validators
 
     def read(self, iprot):
         if iprot._fast_decode is not None and isinstance(iprot.trans, TTransport.CReadableTransport) and self.thrift_spec is not None:
@@ -1126,6 +1232,12 @@ class FetchRequest(object):
                     self.output_filename = iprot.readString().decode('utf-8') if sys.version_info[0] == 2 else iprot.readString()
                 else:
                     iprot.skip(ftype)
+            elif fid == 7:
+                if ftype == TType.STRUCT:
+                    self.last_fetch_validators = FetchValidators()
+                    self.last_fetch_validators.read(iprot)
+                else:
+                    iprot.skip(ftype)
             else:
                 iprot.skip(ftype)
             iprot.readFieldEnd()
@@ -1168,6 +1280,10 @@ class FetchRequest(object):
             oprot.writeFieldBegin('output_filename', TType.STRING, 6)
             oprot.writeString(self.output_filename.encode('utf-8') if sys.version_info[0] == 2 else self.output_filename)
             oprot.writeFieldEnd()
+        if self.last_fetch_validators is not None:
+            oprot.writeFieldBegin('last_fetch_validators', TType.STRUCT, 7)
+            self.last_fetch_validators.write(oprot)
+            oprot.writeFieldEnd()
         oprot.writeFieldStop()
         oprot.writeStructEnd()
 
@@ -1211,18 +1327,28 @@ class FetchResult(object):
 
     These are separate from `filename` for two reasons: 1) a convenience for
     module authors; and 2) so we can run SQL to find common problems.
+     - validators: Validators to store with this result, for the next fetch().
+     - not_modified: If true, `last_fetch_result` is still current: the module wrote nothing
+    and the caller should keep its previous result. `filename` and `errors`
+    are ignored.
+
+    Only valid when the request included `last_fetch_validators`.
 
     """
 
     __slots__ = (
         'filename',
         'errors',
+        'validators',
+        'not_modified',
     )
 
 
-    def __init__(self, filename=None, errors=None,):
+    def __init__(self, filename=None, errors=None, validators=None, not_modified=None,):
         self.filename = filename
         self.errors = errors
+        self.validators = validators
+        self.not_modified = not_modified
 
     def read(self, iprot):
         if iprot._fast_decode is not None and isinstance(iprot.trans, TTransport.CReadableTransport) and self.thrift_spec is not None:
@@ -1249,6 +1375,17 @@ class FetchResult(object):
                     iprot.readListEnd()
                 else:
                     iprot.skip(ftype)
+            elif fid == 3:
+                if ftype == TType.STRUCT:
+                    self.validators = FetchValidators()
+                    self.validators.read(iprot)
+                else:
+                    iprot.skip(ftype)
+            elif fid == 4:
+                if ftype == TType.BOOL:
+                    self.not_modified = iprot.readBool()
+                else:
+                    iprot.skip(ftype)
             else:
                 iprot.skip(ftype)
             iprot.readFieldEnd()
@@ -1270,6 +1407,14 @@ class FetchResult(object):
                 iter74.write(oprot)
             oprot.writeListEnd()
             oprot.writeFieldEnd()
+        if self.validators is not None:
+            oprot.writeFieldBegin('validators', TType.STRUCT, 3)
+            self.validators.write(oprot)
+            oprot.writeFieldEnd()
+        if self.not_modified is not None:
+            oprot.writeFieldBegin('not_modified', TType.BOOL, 4)
+            oprot.writeBool(self.not_modified)
+            oprot.writeFieldEnd()
         oprot.writeFieldStop()
         oprot.writeStructEnd()
 
@@ -1430,6 +1575,13 @@ class RenderRequest(object):
      - uploaded_files: Files the user uploaded and chose, keyed by UUID.
 
     `params` values may refer to keys here.
+     - fetch_result_arrow_filename: Arrow copy of `fetch_result.filename`, if that file is Parquet.
+
+    The renderer converts each Parquet fetch result to Arrow once and caches
+    it, so pandas_v0 modules needn't decode Parquet on every render. Other
+    frameworks ignore this and pass modules the Parquet file.
+
+    The file on disk will be in `basedir`.
 
     """
 
@@ -1442,10 +1594,11 @@ class RenderRequest(object):
         'output_filename',
         'tab_outputs',
         'uploaded_files',
+        'fetch_result_arrow_filename',
     )
 
 
-    def __init__(self, basedir=None, input_filename=None, params=None, tab_name=None, fetch_result=None, output_filename=None, tab_outputs=None, uploaded_files=None,):
+    def __init__(self, basedir=None, input_filename=None, params=None, tab_name=None, fetch_result=None, output_filename=None, tab_outputs=None, uploaded_files=None, fetch_result_arrow_filename=None,):
         self.basedir = basedir
         self.input_filename = input_filename
         self.params = params
@@ -1454,6 +1607,7 @@ class RenderRequest(object):
         self.output_filename = output_filename
         self.tab_outputs = tab_outputs
         self.uploaded_files = uploaded_files
+        self.fetch_result_arrow_filename = fetch_result_arrow_filename
 
     def read(self, iprot):
         if iprot._fast_decode is not None and isinstance(iprot.trans, TTransport.CReadableTransport) and self.thrift_spec is not None:
@@ -1526,6 +1680,11 @@ class RenderRequest(object):
                     iprot.readMapEnd()
                 else:
                     iprot.skip(ftype)
+            elif fid == 9:
+                if ftype == TType.STRING:
+                    self.fetch_result_arrow_filename = iprot.readString().decode('utf-8') if sys.version_info[0] == 2 else iprot.readString()
+                else:
+                    iprot.skip(ftype)
             else:
                 iprot.skip(ftype)
             iprot.readFieldEnd()
@@ -1580,6 +1739,10 @@ class RenderRequest(object):
                 viter101.write(oprot)
             oprot.writeMapEnd()
             oprot.writeFieldEnd()
+        if self.fetch_result_arrow_filename is not None:
+            oprot.writeFieldBegin('fetch_result_arrow_filename', TType.STRING, 9)
+            oprot.writeString(self.fetch_result_arrow_filename.encode('utf-8') if sys.version_info[0] == 2 else self.fetch_result_arrow_filename)
+            oprot.writeFieldEnd()
         oprot.writeFieldStop()
         oprot.writeStructEnd()
 
@@ -1616,19 +1779,23 @@ class RenderResult(object):
 
     Attributes:
      - errors: User-facing errors or warnings reported by the module.
-     - json: JSON to pass to the module's HTML, if it has HTML.
+     - json_encoded: JSON Object to pass to the module's HTML, if it has HTML; empty means {}.
+
+    This is encoded JSON, not a `map<string, Json>`: charts can output
+    megabytes of JSON, and a `Json` struct per value costs far more than
+    `json.dumps()` and `json.loads()`.
 
     """
 
     __slots__ = (
         'errors',
-        'json',
+        'json_encoded',
     )
 
 
-    def __init__(self, errors=None, json=None,):
+    def __init__(self, errors=None, json_encoded=None,):
         self.errors = errors
-        self.json = json
+        self.json_encoded = json_encoded
 
     def read(self, iprot):
         if iprot._fast_decode is not None and isinstance(iprot.trans, TTransport.CReadableTransport) and self.thrift_spec is not None:
@@ -1650,16 +1817,9 @@ class RenderResult(object):
                     iprot.readListEnd()
                 else:
                     iprot.skip(ftype)
-            elif fid == 2:
-                if ftype == TType.MAP:
-                    self.json = {}
-                    (_ktype109, _vtype110, _size108) = iprot.readMapBegin()
-                    for _i112 in range(_size108):
-                        _key113 = iprot.readString().decode('utf-8') if sys.version_info[0] == 2 else iprot.readString()
-                        _val114 = Json()
-                        _val114.read(iprot)
-                        self.json[_key113] = _val114
-                    iprot.readMapEnd()
+            elif fid == 3:
+                if ftype == TType.STRING:
+                    self.json_encoded = iprot.readString().decode('utf-8') if sys.version_info[0] == 2 else iprot.readString()
                 else:
                     iprot.skip(ftype)
             else:
@@ -1675,17 +1835,13 @@ class RenderResult(object):
         if self.errors is not None:
             oprot.writeFieldBegin('errors', TType.LIST, 1)
             oprot.writeListBegin(TType.STRUCT, len(self.errors))
-            for iter115 in self.errors:
-                iter115.write(oprot)
+            for iter108 in self.errors:
+                iter108.write(oprot)
             oprot.writeListEnd()
             oprot.writeFieldEnd()
-        if self.json is not None:
-            oprot.writeFieldBegin('json', TType.MAP, 2)
-            oprot.writeMapBegin(TType.STRING, TType.STRUCT, len(self.json))
-            for kiter116, viter117 in self.json.items():
-                oprot.writeString(kiter116.encode('utf-8') if sys.version_info[0] == 2 else kiter116)
-                viter117.write(oprot)
-            oprot.writeMapEnd()
+        if self.json_encoded is not None:
+            oprot.writeFieldBegin('json_encoded', TType.STRING, 3)
+            oprot.writeString(self.json_encoded.encode('utf-8') if sys.version_info[0] == 2 else self.json_encoded)
             oprot.writeFieldEnd()
         oprot.writeFieldStop()
         oprot.writeStructEnd()
@@ -1776,6 +1932,13 @@ RenderError.thrift_spec = (
     (1, TType.STRUCT, 'message', [I18nMessage, None], None, ),  # 1
     (2, TType.LIST, 'quick_fixes', (TType.STRUCT, [QuickFix, None], False), None, ),  # 2
 )
+all_structs.append(FetchValidators)
+FetchValidators.thrift_spec = (
+    None,  # 0
+    (1, TType.STRING, 'etag', 'UTF8', None, ),  # 1
+    (2, TType.STRING, 'last_modified', 'UTF8', None, ),  # 2
+    (3, TType.STRING, 'content_sha256', 'UTF8', None, ),  # 3
+)
 all_structs.append(FetchRequest)
 FetchRequest.thrift_spec = (
     None,  # 0
@@ -1785,12 +1948,15 @@ FetchRequest.thrift_spec = (
     (4, TType.STRUCT, 'last_fetch_result', [FetchResult, None], None, ),  # 4
     (5, TType.STRING, 'input_table_parquet_filename', 'UTF8', None, ),  # 5
     (6, TType.STRING, 'output_filename', 'UTF8', None, ),  # 6
+    (7, TType.STRUCT, 'last_fetch_validators', [FetchValidators, None], None, ),  # 7
 )
 all_structs.append(FetchResult)
 FetchResult.thrift_spec = (
     None,  # 0
     (1, TType.STRING, 'filename', 'UTF8', None, ),  # 1
     (2, TType.LIST, 'errors', (TType.STRUCT, [FetchError, None], False), None, ),  # 2
+    (3, TType.STRUCT, 'validators', [FetchValidators, None], None, ),  # 3
+    (4, TType.BOOL, 'not_modified', None, None, ),  # 4
 )
 all_structs.append(UploadedFile)
 UploadedFile.thrift_spec = (
@@ -1810,12 +1976,14 @@ RenderRequest.thrift_spec = (
     (6, TType.STRING, 'output_filename', 'UTF8', None, ),  # 6
     (7, TType.MAP, 'tab_outputs', (TType.STRING, 'UTF8', TType.STRUCT, [TabOutput, None], False), None, ),  # 7
     (8, TType.MAP, 'uploaded_files', (TType.STRING, 'UTF8', TType.STRUCT, [UploadedFile, None], False), None, ),  # 8
+    (9, TType.STRING, 'fetch_result_arrow_filename', 'UTF8', None, ),  # 9
 )
 all_structs.append(RenderResult)
 RenderResult.thrift_spec = (
     None,  # 0
     (1, TType.LIST, 'errors', (TType.STRUCT, [RenderError, None], False), None, ),  # 1
-    (2, TType.MAP, 'json', (TType.STRING, 'UTF8', TType.STRUCT, [Json, None], False), None, ),  # 2
+    None,  # 2
+    (3, TType.STRING, 'json_encoded', 'UTF8', None, ),  # 3
 )
 fix_spec(all_structs)
 del all_structs
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import datetime
+import json
 import marshal
 from pathlib import Path
-from typing import Any, Dict, List, Literal, NamedTuple, Union
+from typing import Any, Dict, List, Literal, NamedTuple, Optional, Union
 
 import pyarrow
 import pyarrow.ipc
@@ -19,24 +20,35 @@ from cjwmodule.types import (
 
 # Some types we can import with no conversion
 from .thrift import ttypes
+from .util import json_encode
 
 __all__ = [
+    "ChildResourceLimits",
+    "ChildResourceUsage",
     "Column",
     "ColumnType",
     "CompiledModule",
+    "ConditionalFetchResult",
+    "FetchValidators",
     "QuickFix",
     "QuickFixAction",
     "RenderError",
     "RenderResult",
     "TableMetadata",
     "TabOutput",
+    "arrow_conditional_fetch_result_to_thrift",
     "arrow_fetch_result_to_thrift",
+    "arrow_fetch_validators_to_thrift",
     "arrow_quick_fix_action_to_thrift",
     "arrow_quick_fix_to_thrift",
     "arrow_tab_output_to_thrift",
     "arrow_render_error_to_thrift",
+    "pydict_to_thrift_json_encoded",
     "pydict_to_thrift_json_object",
+    "thrift_conditional_fetch_result_to_arrow",
     "thrift_fetch_result_to_arrow",
+    "thrift_fetch_validators_to_arrow",
+    "thrift_json_encoded_to_pydict",
     "thrift_json_object_to_pydict",
     "thrift_quick_fix_action_to_arrow",
     "thrift_quick_fix_to_arrow",
@@ -185,6 +197,46 @@ class TabOutput(NamedTuple):
     """Output from the final Step in `tab`."""
 
 
+class FetchValidators(NamedTuple):
+    """Cheap fingerprints of a fetched resource, for conditional fetches.
+
+    A module that fetches over HTTP can send `etag` and `last_modified` as
+    `If-None-Match` and `If-Modified-Since` request headers, and skip the
+    download when the server responds "304 Not Modified".
+    """
+
+    etag: Optional[str] = None
+    """HTTP `ETag` response header, verbatim (e.g., `W/"abc"`)."""
+
+    last_modified: Optional[str] = None
+    """HTTP `Last-Modified` response header, verbatim."""
+
+    content_sha256: Optional[str] = None
+    """Hex-encoded SHA-256 of the stored fetch result.
+
+    Workbench computes this. It ignores a module-supplied value.
+    """
+
+
+class ConditionalFetchResult(NamedTuple):
+    """Outcome of a `fetch()` that reports validators.
+
+    A module's `fetch()` may return this instead of a plain result.
+    """
+
+    result: Optional[FetchResult]
+    """New result; or `None`, meaning "`last_fetch_result` is still current."
+
+    In a pandas_v0 module, `result` may be anything `fetch()` may return.
+    """
+
+    validators: FetchValidators = FetchValidators()
+    """Validators to store with the result, for the next `fetch()`.
+
+    If `result` is `None`, fields left `None` keep their stored values.
+    """
+
+
 def _thrift_i18n_argument_to_arrow(
     value: ttypes.I18nArgument,
 ) -> Union[str, int, float]:
@@ -209,9 +261,67 @@ def _i18n_argument_to_thrift(value: Union[str, int, float]) -> ttypes.I18nArgume
         raise RuntimeError("Unhandled value for I18nArgument: %r" % (value,))
 
 
+class ChildResourceLimits(NamedTuple):
+    """Resources a sandboxed child process may consume, enforced by setrlimit(2).
+
+    None means, "no limit".
+    """
+
+    memory_bytes: Optional[int] = None
+    """Maximum address-space size (RLIMIT_AS), in bytes."""
+
+    cpu_seconds: Optional[int] = None
+    """Maximum CPU time (RLIMIT_CPU), in seconds."""
+
+
+class ChildResourceUsage(NamedTuple):
+    """Resources a sandboxed child process consumed, according to wait4(2)."""
+
+    wall_time: float
+    """Seconds between spawning the child and reaping it."""
+
+    user_time: float
+    """Seconds of CPU time spent in user mode."""
+
+    system_time: float
+    """Seconds of CPU time spent in kernel mode."""
+
+    max_rss_kb: int
+    """Maximum resident set size, in kilobytes."""
+
+    n_block_inputs: int
+    """Number of times the filesystem had to read from disk."""
+
+    n_block_outputs: int
+    """Number of times the filesystem had to write to disk."""
+
+    @classmethod
+    def from_rusage(cls, wall_time: float, rusage) -> ChildResourceUsage:
+        return cls(
+            wall_time=wall_time,
+            user_time=rusage.ru_utime,
+            system_time=rusage.ru_stime,
+            max_rss_kb=rusage.ru_maxrss,  # Linux: kilobytes
+            n_block_inputs=rusage.ru_inblock,
+            n_block_outputs=rusage.ru_oublock,
+        )
+
+    def __str__(self):
+        return "%dms wall, %dms user, %dms sys, %0.1fMB maxrss, %d/%d blocks in/out" % (
+            self.wall_time * 1000,
+            self.user_time * 1000,
+            self.system_time * 1000,
+            self.max_rss_kb / 1024,
+            self.n_block_inputs,
+            self.n_block_outputs,
+        )
+
+
 class RenderResult(NamedTuple):
     errors: List[RenderError] = []
     json: Dict[str, Any] = {}
+    resource_usage: Optional[ChildResourceUsage] = None
+    """Resources the module's child process consumed, if we know them."""
 
 
 class LoadedRenderResult(NamedTuple):
@@ -303,10 +413,31 @@ def arrow_fetch_result_to_thrift(value: FetchResult) -> ttypes.FetchResult:
     )
 
 
+def arrow_fetch_validators_to_thrift(
+    value: FetchValidators,
+) -> ttypes.FetchValidators:
+    return ttypes.FetchValidators(
+        etag=value.etag,
+        last_modified=value.last_modified,
+        content_sha256=value.content_sha256,
+    )
+
+
+def arrow_conditional_fetch_result_to_thrift(
+    value: ConditionalFetchResult,
+) -> ttypes.FetchResult:
+    if value.result is None:
+        ret = ttypes.FetchResult("", [], not_modified=True)
+    else:
+        ret = arrow_fetch_result_to_thrift(value.result)
+    ret.validators = arrow_fetch_validators_to_thrift(value.validators)
+    return ret
+
+
 def arrow_render_result_to_thrift(value: RenderResult) -> ttypes.RenderResult:
     return ttypes.RenderResult(
         errors=[arrow_render_error_to_thrift(e) for e in value.errors],
-        json=pydict_to_thrift_json_object(value.json),
+        json_encoded=pydict_to_thrift_json_encoded(value.json),
     )
 
 
@@ -379,6 +510,37 @@ def pydict_to_thrift_json_object(pydict: Dict[str, Any]) -> Dict[str, ttypes.Jso
     return {k: _python_to_thrift_json(v) for k, v in pydict.items()}
 
 
+def pydict_to_thrift_json_encoded(pydict: Dict[str, Any]) -> str:
+    """Encode `pydict` as JSON, for a Thrift `json_encoded` field.
+
+    `json.dumps()` is written in C, so this costs far less than building a
+    `ttypes.Json` per value.
+
+    Raise ValueError on NaN, Infinity or a non-JSON-ish value, as rendercache
+    would: better that the module fail than that it write invalid JSON.
+    """
+    if not pydict:
+        return ""
+    try:
+        return json_encode(pydict)
+    except TypeError as err:
+        raise ValueError("Invalid JSON-ish value: %s" % str(err)) from None
+
+
+def thrift_json_encoded_to_pydict(value: Optional[str]) -> Dict[str, Any]:
+    """Decode a Thrift `json_encoded` field.
+
+    Raise ValueError if `value` is not a JSON Object. (It comes from an
+    untrusted module.)
+    """
+    if not value:
+        return {}
+    pydict = json.loads(value)  # or raise ValueError
+    if not isinstance(pydict, dict):
+        raise ValueError("json_encoded must encode a JSON Object")
+    return pydict
+
+
 def thrift_quick_fix_action_to_arrow(value: ttypes.QuickFixAction) -> QuickFixAction:
     if value.prepend_step is not None:
         return QuickFixAction.PrependStep(
@@ -414,10 +576,35 @@ def thrift_fetch_result_to_arrow(
     return FetchResult(path, [thrift_fetch_error_to_arrow(e) for e in value.errors])
 
 
+def thrift_fetch_validators_to_arrow(
+    value: ttypes.FetchValidators,
+) -> FetchValidators:
+    return FetchValidators(
+        etag=value.etag,
+        last_modified=value.last_modified,
+        content_sha256=value.content_sha256,
+    )
+
+
+def thrift_conditional_fetch_result_to_arrow(
+    value: ttypes.FetchResult, basedir: Path
+) -> ConditionalFetchResult:
+    if value.validators is None:
+        validators = FetchValidators()
+    else:
+        validators = thrift_fetch_validators_to_arrow(value.validators)
+    if value.not_modified:
+        return ConditionalFetchResult(None, validators)
+    else:
+        return ConditionalFetchResult(
+            thrift_fetch_result_to_arrow(value, basedir), validators
+        )
+
+
 def thrift_render_result_to_arrow(value: ttypes.RenderResult) -> RenderResult:
     return RenderResult(
         errors=[thrift_render_error_to_arrow(e) for e in value.errors],
-        json=thrift_json_object_to_pydict(value.json),
+        json=thrift_json_encoded_to_pydict(value.json_encoded),
     )
 
 
@@ -1,8 +1,11 @@
+import os
 import subprocess
-import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pyarrow as pa
 import pyarrow.compute
 from cjwmodule.arrow.format import parse_number_format
@@ -30,11 +33,6 @@ class TableSchemaHasMetadata(ValidateError):
         super().__init__("table.schema.metadata must be None; got non-null")
 
 
-class TableHasTooManyRecordBatches(ValidateError):
-    def __init__(self, actual: int):
-        super().__init__("Table has %d record batches; we only support 1" % actual)
-
-
 class DuplicateColumnName(ValidateError):
     def __init__(self, name: str, position1: int, position2: int):
         super().__init__(
@@ -143,6 +141,18 @@ def validate_arrow_file(path: Path) -> None:
         raise InvalidArrowFile(message) from None
 
 
+def _truncate_dates(dates: np.ndarray, unit: str) -> np.ndarray:
+    """Round each datetime64[D] in `dates` down to the start of its `unit`."""
+    if unit == "month":
+        starts = dates.astype("datetime64[M]")
+    elif unit == "quarter":
+        months_since_1970 = dates.astype("datetime64[M]").astype(np.int64)
+        starts = (months_since_1970 - months_since_1970 % 3).astype("datetime64[M]")
+    else:  # unit == "year"
+        starts = dates.astype("datetime64[Y]")
+    return starts.astype("datetime64[D]")
+
+
 def _read_column_type(
     column: pa.ChunkedArray, field: pa.Field, *, full: bool
 ) -> ColumnType:
@@ -198,20 +208,17 @@ def _read_column_type(
                         raise DateValueHasWrongUnit(field.name, "week")
                 return ColumnType.Date(unit="week")
             else:
-                is_valid = {
-                    "month": lambda st: st.tm_mday == 1,
-                    "quarter": lambda st: st.tm_mday == 1 and st.tm_mon % 3 == 1,
-                    "year": lambda st: st.tm_mon == 1 and st.tm_mday == 1,
-                }[unit]
                 for chunk in column.chunks:
-                    unix_timestamps = pa.compute.multiply(
-                        chunk.view(pa.int32()).cast(pa.int64()), 86400
+                    days = chunk.view(pa.int32())
+                    # numpy datetime64 math is vectorized and releases the
+                    # GIL, so other threads can validate other columns.
+                    dates = (
+                        pa.compute.filter(days, pa.compute.is_valid(days))
+                        .to_numpy()
+                        .astype("datetime64[D]")
                     )
-                    for unix_timestamp in unix_timestamps:
-                        if unix_timestamp.is_valid:
-                            struct_time = time.gmtime(unix_timestamp.as_py())
-                            if not is_valid(struct_time):
-                                raise DateValueHasWrongUnit(field.name, unit)
+                    if not np.array_equal(_truncate_dates(dates, unit), dates):
+                        raise DateValueHasWrongUnit(field.name, unit)
 
         return ColumnType.Date(unit=unit)
 
@@ -250,44 +257,109 @@ def _read_column_type(
     raise WrongColumnType(field.name, field.type)
 
 
+N_VALIDATE_THREADS = os.cpu_count() or 1
+"""Number of threads `read_columns(full=True)` uses to validate columns.
+
+pyarrow.compute and numpy release the GIL, so validating a wide table's costly columns
+(dates, in particular) scales with cores.
+"""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return a process-wide ThreadPoolExecutor, creating it if needed.
+
+    We create the executor lazily: cjwkernel.validate is imported in processes
+    that fork (the kernel's zygote), and forking a process with threads is
+    asking for trouble. Only `full=True` callers -- which never fork -- spawn
+    threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=N_VALIDATE_THREADS,
+                thread_name_prefix="cjwkernel-validate-",
+            )
+        return _executor
+
+
+def _read_column(column: pa.ChunkedArray, field: pa.Field, *, full: bool) -> Column:
+    return Column(field.name, _read_column_type(column, field, full=full))
+
+
 def read_columns(table: pa.Table, full: bool = True) -> List[Column]:
     """Read Column definitions and validate Workbench assumptions.
 
     Raise ValidateError if:
 
     * table has metadata
-    * table has more than one record batch
     * columns have invalid metadata (e.g., a "format" on a "text" column, or
       a timestamp with unit!=ns or a timezone)
     * column values disagree with metadata (e.g., date32 "2021-04-12" with
       `ColumnType.Date("month")`)
 
+    The table may have any number of record batches. (Modules may write their
+    output incrementally, one record batch at a time.)
+
     Be sure the Arrow file backing the table was validated with
     `validate_arrow_file()` first. Otherwise, you'll get undefined behavior.
 
     If `full=False`, skip costly checks. Only pass `full=False` when you can
     guarantee the data has been generated by a source you trust. (In particular,
     module output is not trusted and it must use the default `full=True`.)
+
+    If `full=True`, validate columns in parallel (see `N_VALIDATE_THREADS`).
+    Errors are deterministic: we raise the error of the leftmost invalid
+    column, just as a serial validation would.
     """
     if table.schema.metadata is not None:
         raise TableSchemaHasMetadata()
 
+    # Find duplicate column names serially: it's cheap, and the error
+    # depends on every column before it.
     seen_column_names: Dict[str, int] = {}
-    ret = []
-
-    for position, column in enumerate(table.itercolumns()):
-        field = table.field(position)
-        if column.num_chunks > 1:
-            raise TableHasTooManyRecordBatches(column.num_chunks)
-
+    duplicate_error: Optional[Tuple[int, DuplicateColumnName]] = None
+    for position, field in enumerate(table.schema):
         if field.name in seen_column_names:
-            raise DuplicateColumnName(
-                field.name, seen_column_names[field.name], position
+            duplicate_error = (
+                position,
+                DuplicateColumnName(
+                    field.name, seen_column_names[field.name], position
+                ),
             )
+            break
         else:
             seen_column_names[field.name] = position
 
-        ret.append(Column(field.name, _read_column_type(column, field, full=full)))
+    # Only validate columns up to the first duplicate: we'll raise before
+    # reading the rest.
+    n_columns = table.num_columns if duplicate_error is None else duplicate_error[0]
+
+    if full and n_columns > 1 and N_VALIDATE_THREADS > 1:
+        executor = _get_executor()
+        futures: List[Future] = [
+            executor.submit(_read_column, table.column(i), table.field(i), full=full)
+            for i in range(n_columns)
+        ]
+        try:
+            # raise the leftmost column's error, if there is one
+            ret = [future.result() for future in futures]
+        finally:
+            # After an error, don't bother validating the columns to the right
+            for future in futures:
+                future.cancel()
+    else:
+        ret = [
+            _read_column(table.column(i), table.field(i), full=full)
+            for i in range(n_columns)
+        ]
+
+    if duplicate_error is not None:
+        raise duplicate_error[1]
 
     return ret
 
@@ -0,0 +1,38 @@
+import os
+
+__all__ = (
+    "AUTOUPDATE_MAX_ERROR_BACKOFF",
+    "AUTOUPDATE_MAX_FETCHES_PER_SECOND",
+    "AUTOUPDATE_MAX_JITTER",
+)
+
+AUTOUPDATE_MAX_FETCHES_PER_SECOND = float(
+    os.environ.get("CJW_AUTOUPDATE_MAX_FETCHES_PER_SECOND", 5)
+)
+"""Rate at which cron queues automatic fetches.
+
+When more steps are due than this allows, cron queues the longest-overdue
+ones first and leaves the rest for its next pass, logging a "Backlog" warning.
+
+This cap overrides each step's `update_interval`: if more than this many
+fetches per second come due, steps fetch late, and the backlog grows until
+the load drops (or somebody raises this setting).
+"""
+
+AUTOUPDATE_MAX_JITTER = int(os.environ.get("CJW_AUTOUPDATE_MAX_JITTER", 60))
+"""Maximum seconds cron delays an automatic fetch past its `next_update`.
+
+Each step gets its own fixed delay, so steps that share an update schedule
+don't all fetch at the same moment. The delay is also at most a tenth of the
+step's `update_interval`.
+"""
+
+AUTOUPDATE_MAX_ERROR_BACKOFF = int(
+    os.environ.get("CJW_AUTOUPDATE_MAX_ERROR_BACKOFF", 7 * 86400)
+)
+"""Maximum seconds fetcher waits between automatic fetches that keep failing.
+
+Each consecutive failed fetch doubles the wait. A successful fetch resets it
+to the step's `update_interval`. Steps with a longer `update_interval` than
+this never wait less than their `update_interval`.
+"""
@@ -0,0 +1,42 @@
+import os
+
+__all__ = (
+    "FETCHER_N_CONCURRENT_FETCHES",
+    "FETCHER_MAX_CONCURRENT_FETCHES_PER_UPSTREAM",
+    "FETCHER_SHARED_FETCH_TTL",
+)
+
+FETCHER_N_CONCURRENT_FETCHES = int(
+    os.environ.get("CJW_FETCHER_N_CONCURRENT_FETCHES", 1)
+)
+"""Number of fetches one fetcher process runs at a time.
+
+Each concurrent fetch needs its own editable chroot. `setup-sandboxes.sh`
+reads the same environment variable to build them.
+
+At most 100: chroot N's network interface is "veth-pyspawn{N}c", and Linux
+interface names can't exceed 15 characters.
+"""
+if not 1 <= FETCHER_N_CONCURRENT_FETCHES <= 100:
+    raise ValueError(
+        "CJW_FETCHER_N_CONCURRENT_FETCHES must be between 1 and 100; got %d"
+        % FETCHER_N_CONCURRENT_FETCHES
+    )
+
+FETCHER_MAX_CONCURRENT_FETCHES_PER_UPSTREAM = int(
+    os.environ.get("CJW_FETCHER_MAX_CONCURRENT_FETCHES_PER_UPSTREAM", 2)
+)
+"""Number of fetches one fetcher process may run against a single host.
+
+This keeps us polite: a hundred steps that auto-update from the same server
+shouldn't all hit it at once. Fetches without a URL param are grouped by
+module instead.
+"""
+
+FETCHER_SHARED_FETCH_TTL = float(os.environ.get("CJW_FETCHER_SHARED_FETCH_TTL", 60))
+"""Seconds one fetcher process reuses a fetch result for identical fetches.
+
+Steps that fetch with the same module version and params -- and no secrets or
+input table -- share the result of one fetch while it runs and for this long
+afterwards.
+"""
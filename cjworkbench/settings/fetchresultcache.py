@@ -0,0 +1,12 @@
+import os
+
+__all__ = ("FETCH_RESULT_ARROW_CACHE_MAX_BYTES",)
+
+FETCH_RESULT_ARROW_CACHE_MAX_BYTES = int(
+    os.environ.get("CJW_FETCH_RESULT_ARROW_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+)
+"""Size of the renderer's fetch-result Arrow cache above which we evict old files.
+
+The cache lives in the renderer's chroot, so it counts against that chroot's
+disk quota.
+"""
@@ -0,0 +1,21 @@
+import os
+
+__all__ = ("KERNEL_MEMORY_LIMIT_BYTES", "KERNEL_CPU_LIMIT_SECONDS")
+
+KERNEL_MEMORY_LIMIT_BYTES = None
+"""Maximum address space of each module child process, in bytes.
+
+None means unlimited. A module that exceeds this limit fails with a
+user-visible "out of memory" error instead of hogging the pod's RAM.
+"""
+if "CJW_KERNEL_MEMORY_LIMIT_BYTES" in os.environ:
+    KERNEL_MEMORY_LIMIT_BYTES = int(os.environ["CJW_KERNEL_MEMORY_LIMIT_BYTES"])
+
+KERNEL_CPU_LIMIT_SECONDS = None
+"""Maximum CPU time of each module child process, in seconds.
+
+None means unlimited. A module that exceeds this limit fails with a
+user-visible "out of CPU time" error instead of hogging the pod's CPU.
+"""
+if "CJW_KERNEL_CPU_LIMIT_SECONDS" in os.environ:
+    KERNEL_CPU_LIMIT_SECONDS = int(os.environ["CJW_KERNEL_CPU_LIMIT_SECONDS"])
@@ -1,6 +1,37 @@
 import os
 
-__all__ = ("AWS_S3_ENDPOINT", "S3_BUCKET_NAME_PATTERN")
+from .util import FalsyStrings
+
+__all__ = (
+    "AWS_S3_ENDPOINT",
+    "AWS_S3_SUPPORTS_DELETE_OBJECTS",
+    "S3_BUCKET_NAME_PATTERN",
+    "S3_MAX_ASYNC_CONNECTIONS",
+    "S3_MAX_CONCURRENT_DELETES",
+    "STORED_OBJECTS_ZSTD_LEVEL",
+)
 
 AWS_S3_ENDPOINT = os.environ.get("AWS_S3_ENDPOINT")  # None means AWS default
 S3_BUCKET_NAME_PATTERN = os.environ.get("S3_BUCKET_NAME_PATTERN", "%s")
+
+AWS_S3_SUPPORTS_DELETE_OBJECTS = (
+    os.environ.get("AWS_S3_SUPPORTS_DELETE_OBJECTS", "False") not in FalsyStrings
+)
+"""True if the S3 server deletes up to 1,000 keys per DeleteObjects request.
+
+AWS and Minio do. Google Cloud Storage's S3 emulation does not: with it, we
+delete one key per request.
+"""
+
+S3_MAX_ASYNC_CONNECTIONS = int(os.environ.get("CJW_S3_MAX_ASYNC_CONNECTIONS", 50))
+"""Number of connections `cjwstate.aios3` keeps open, per event loop."""
+
+S3_MAX_CONCURRENT_DELETES = int(os.environ.get("CJW_S3_MAX_CONCURRENT_DELETES", 8))
+"""Number of delete requests `s3.remove_many()` sends at once."""
+
+STORED_OBJECTS_ZSTD_LEVEL = int(os.environ.get("CJW_STORED_OBJECTS_ZSTD_LEVEL", 0))
+"""zstd compression level for new fetch results; 0 means, "don't compress."
+
+Readers decompress whatever they find, so changing this never affects
+existing StoredObjects.
+"""
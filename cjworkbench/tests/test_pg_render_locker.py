@@ -148,3 +148,21 @@ class PgRenderLockerTest(unittest.TestCase):
                 self.assertEqual(last_line, "exited stalling_op")
 
         asyncio.run(inner())
+
+    def test_find_rendering_workflow_ids(self):
+        async def inner():
+            async with PgRenderLocker() as locker1:
+                async with PgRenderLocker() as locker2:
+                    async with locker1.render_lock(1) as lock1:
+                        async with locker2.render_lock(3) as lock3:
+                            self.assertEqual(
+                                await locker2.find_rendering_workflow_ids([1, 2, 3]),
+                                {1, 3},
+                            )
+                            await lock3.stall_others()
+                        await lock1.stall_others()
+                    self.assertEqual(
+                        await locker2.find_rendering_workflow_ids([1, 2, 3]), set()
+                    )
+
+        asyncio.run(inner())
@@ -83,6 +83,7 @@ _Tables = [
     "delta",
     "module_version",
     "stored_object",
+    "pending_stored_object_deletion",
     "uploaded_file",
     "step",
     "tab",
@@ -0,0 +1,214 @@
+"""Asyncio storage backed by AWS S3, Google GCS, or Minio.
+
+This mirrors part of `cjwstate.s3` -- same buckets, same errors -- for code
+that runs in an event loop. It doesn't need a thread per request: aiobotocore
+gives boto3's client semantics (signing, retries, error parsing) over a pooled
+aiohttp connection. Use it so S3 transfers don't tie up threads (particularly
+database threads).
+
+Usage:
+
+    from cjwstate import aios3, s3
+
+    await aios3.download(s3.StoredObjectsBucket, key, path)
+"""
+
+import asyncio
+import errno
+import pathlib
+from typing import AsyncIterator, Callable, Optional
+
+import aiobotocore
+import aiobotocore.config
+import botocore.exceptions
+from django.conf import settings
+
+from cjwstate import s3
+
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class Layer:
+    def __init__(self):
+        self._client_loop = None
+        self._client_task = None
+
+    async def _create_client(self):
+        session = aiobotocore.get_session()
+        return await session.create_client(
+            "s3",
+            region_name="us-east-1",  # like cjwstate.s3
+            endpoint_url=settings.AWS_S3_ENDPOINT,  # e.g., 'https://localhost:9001/'
+            config=aiobotocore.config.AioConfig(
+                max_pool_connections=settings.S3_MAX_ASYNC_CONNECTIONS
+            ),
+        ).__aenter__()
+
+    async def client(self):
+        """S3 client whose connection pool all requests share.
+
+        Connections belong to an event loop. If the running loop changes (as
+        it does between unit tests), close the old pool and start a new one.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client_loop is not loop:
+            old_task = self._client_task
+            self._client_loop = loop
+            self._client_task = loop.create_task(self._create_client())
+            if old_task is not None:
+                await _close_client(old_task)
+        return await self._client_task
+
+    async def close(self) -> None:
+        """Close the connection pool, if there is one."""
+        task = self._client_task
+        self._client_loop = None
+        self._client_task = None
+        if task is not None:
+            await _close_client(task)
+
+
+async def _close_client(task: asyncio.Task) -> None:
+    if task.get_loop() is asyncio.get_running_loop():
+        await asyncio.wait([task])  # it may still be connecting
+    if not task.done() or task.cancelled() or task.exception() is not None:
+        return  # there is no client to close
+    await task.result().close()
+
+
+layer = Layer()
+
+
+def _is_not_found(err: botocore.exceptions.ClientError) -> bool:
+    return err.response["Error"]["Code"] in ("404", "NoSuchKey")
+
+
+async def _download(
+    bucket: str, key: str, path: pathlib.Path, decode: Callable[[bytes], bytes]
+) -> None:
+    client = await layer.client()
+    try:
+        response = await client.get_object(Bucket=bucket, Key=key)
+    except botocore.exceptions.ClientError as err:
+        if _is_not_found(err):
+            raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
+        raise
+    body = response["Body"]
+    async with body:
+        with path.open("wb") as f:
+            while True:
+                chunk = await body.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(decode(chunk))
+
+
+async def download(bucket: str, key: str, path: pathlib.Path) -> None:
+    """Copy a file from S3 to a pathlib.Path, streaming.
+
+    Raise FileNotFoundError if the key is not on S3.
+    """
+    await _download(bucket, key, path, lambda chunk: chunk)
+
+
+async def download_zstd(bucket: str, key: str, path: pathlib.Path) -> None:
+    """Copy a zstd-compressed file from S3 to a pathlib.Path, decompressing.
+
+    Raise FileNotFoundError if the key is not on S3.
+    """
+    import zstandard  # only needed for compressed stored objects
+
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    await _download(bucket, key, path, decompressor.decompress)
+
+
+async def get_range(bucket: str, key: str, start: int, end: int) -> bytes:
+    """Return bytes `start` through `end` (inclusive) of a file on S3.
+
+    Raise FileNotFoundError if the key is not on S3.
+    """
+    client = await layer.client()
+    try:
+        response = await client.get_object(
+            Bucket=bucket, Key=key, Range="bytes=%d-%d" % (start, end)
+        )
+    except botocore.exceptions.ClientError as err:
+        if _is_not_found(err):
+            raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
+        raise
+    async with response["Body"] as body:
+        return await body.read()
+
+
+async def stat(bucket: str, key: str) -> s3.Stat:
+    """Return an object's metadata or raise an error."""
+    client = await layer.client()
+    response = await client.head_object(Bucket=bucket, Key=key)
+    return s3.Stat(response["ContentLength"])
+
+
+async def exists(bucket: str, key: str) -> bool:
+    try:
+        await stat(bucket, key)
+        return True
+    except botocore.exceptions.ClientError as err:
+        if err.response["Error"]["Code"] == "404":
+            return False
+        raise
+
+
+async def fput_file(bucket: str, key: str, path: pathlib.Path) -> None:
+    """Upload the file at `path` in a single part."""
+    client = await layer.client()
+    with path.open("rb") as f:
+        await client.put_object(
+            Bucket=bucket, Key=key, Body=f, ContentLength=path.stat().st_size
+        )
+
+
+async def put_bytes(bucket: str, key: str, body: bytes) -> None:
+    client = await layer.client()
+    await client.put_object(Bucket=bucket, Key=key, Body=body)
+
+
+async def copy(bucket: str, key: str, copy_source: str) -> None:
+    """Copy `copy_source` (a "bucket/key" string) to `key`."""
+    client = await layer.client()
+    await client.copy_object(Bucket=bucket, Key=key, CopySource=copy_source)
+
+
+async def remove(bucket: str, key: str) -> None:
+    """Delete the file. No-op if it is already deleted."""
+    client = await layer.client()
+    try:
+        await client.delete_object(Bucket=bucket, Key=key)
+    except botocore.exceptions.ClientError as err:
+        if err.response["Error"]["Code"] != "NoSuchKey":
+            raise
+
+
+async def iter_keys(
+    bucket: str,
+    prefix: str,
+    *,
+    delimiter: Optional[str] = None,
+    page_size: int = 1000,
+) -> AsyncIterator[str]:
+    """Yield keys of objects in `bucket` whose keys begin with `prefix`.
+
+    Behaves like `s3.iter_keys()`: request `page_size` keys at a time, lazily;
+    and if `delimiter` is set, list non-recursively.
+    """
+    kwargs = dict(Bucket=bucket, Prefix=prefix)
+    if delimiter is not None:
+        kwargs["Delimiter"] = delimiter
+    # Use list_objects, not list_objects_v2, because Google Cloud Storage's
+    # AWS emulation doesn't support v2.
+    client = await layer.client()
+    paginator = client.get_paginator("list_objects")
+    async for page in paginator.paginate(
+        **kwargs, PaginationConfig={"PageSize": page_size}
+    ):
+        for o in page.get("Contents", []):
+            yield o["Key"]
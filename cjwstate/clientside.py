@@ -275,6 +275,12 @@ class StepUpdate(NamedTuple):
     website and then decided not to create a new FetchedVersion.
     """
 
+    n_consecutive_fetch_errors: Optional[int] = None
+    """Number of fetches in a row that produced only errors.
+
+    While this is nonzero, automatic fetches happen less often.
+    """
+
     is_notify_on_change: Optional[bool] = None
     """True if we are to email the user when the result changes."""
 
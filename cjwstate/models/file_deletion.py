@@ -0,0 +1,52 @@
+import contextlib
+import threading
+from typing import Callable, ContextManager, Dict, Iterable, Set
+
+from django.db import transaction
+
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def deleting_files_in_bulk() -> ContextManager[None]:
+    """Collect files that deleted rows point to; delete them all at the end.
+
+    Django sends one delete signal per row, so the StoredObject and
+    UploadedFile signal handlers would send one S3 request (and, for shared
+    StoredObject files, take one lock and run one query) per row. Wrap
+    deletes that may cascade to many rows -- `Workflow.delete()`,
+    `Step.delete()`, `Tab.delete()` -- in this context manager: the handlers
+    call `delete_files()`, and we call each deleter once, with all its keys,
+    when the block ends.
+
+    We delete files before COMMIT, so if deletion fails, the rows remain.
+
+    Blocks nest: only the outermost one deletes files.
+    """
+    if getattr(_local, "pending", None) is not None:
+        yield  # the outer block will delete
+        return
+
+    pending: Dict[Callable[[Iterable[str]], None], Set[str]] = {}
+    _local.pending = pending
+    try:
+        with transaction.atomic():
+            yield
+            for deleter, keys in pending.items():
+                deleter(keys)
+    finally:
+        _local.pending = None
+
+
+def delete_files(deleter: Callable[[Iterable[str]], None], keys: Iterable[str]):
+    """Call `deleter(keys)` now; or, within `deleting_files_in_bulk()`, later.
+
+    Within `deleting_files_in_bulk()`, `deleter` is called once per block, with
+    the keys from all calls.
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is None:
+        deleter(keys)
+    else:
+        pending.setdefault(deleter, set()).update(keys)
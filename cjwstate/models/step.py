@@ -13,6 +13,7 @@ from cjwstate.modules.types import ModuleZipfile
 
 from .cached_render_result import CachedRenderResult
 from .fields import ColumnsField, FetchErrorsField, RenderErrorsField
+from .file_deletion import deleting_files_in_bulk
 from .tab import Tab
 from .workflow import Workflow
 
@@ -107,6 +108,8 @@ class Step(models.Model):
     # time in seconds between updates, default of 1 day
     update_interval = models.IntegerField(default=86400)
     last_update_check = models.DateTimeField(null=True, blank=True)
+    # number of fetches in a row that failed; fetcher backs off accordingly
+    n_consecutive_fetch_errors = models.IntegerField(default=0)
 
     # true means, 'email owner when output changes'
     notifications = models.BooleanField(default=False)
@@ -145,6 +148,16 @@ class Step(models.Model):
     # be implied by the fact that the cached output revision is wrong.
     is_busy = models.BooleanField(default=False, null=False)
 
+    n_stored_objects = models.IntegerField(default=0)
+    """Number of StoredObjects on this Step.
+
+    We adjust this when creating and deleting StoredObjects, so enforcing
+    storage limits needn't count them.
+    """
+
+    stored_objects_size = models.BigIntegerField(default=0)
+    """Sum of this Step's StoredObjects' sizes, maintained like `n_stored_objects`."""
+
     fetch_errors = FetchErrorsField(default=list)
     """Most recent collection of errors preventing StoredObject creation.
 
@@ -478,7 +491,8 @@ class Step(models.Model):
         )
         # We can't delete in-progress uploads from tusd's bucket because there's
         # no directory hierarchy. The object lifecycle policy will delete them.
-        super().delete(*args, **kwargs)
+        with deleting_files_in_bulk():
+            return super().delete(*args, **kwargs)
 
     def _get_clientside_files(
         self, module_zipfile: Optional[ModuleZipfile]
@@ -569,6 +583,7 @@ class Step(models.Model):
             is_auto_fetch=self.auto_update_data,
             fetch_interval=self.update_interval,
             last_fetched_at=self.last_update_check,
+            n_consecutive_fetch_errors=self.n_consecutive_fetch_errors,
             is_notify_on_change=self.notifications,
             last_relevant_delta_id=self.last_relevant_delta_id,
             versions=self._get_clientside_fetched_version_list(module_zipfile),
@@ -1,19 +1,76 @@
+import contextlib
 import datetime
+from typing import ContextManager, Iterable
 
-from django.db import models
-from django.db.models.signals import pre_delete
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
 
 from cjwstate import s3
 
+from .file_deletion import delete_files
 from .step import Step
 
 
+CONTENT_ADDRESSED_KEY_PREFIX = "sha256/"
+ZSTD_KEY_SUFFIX = ".zst"
+
+
+def content_addressed_key(hash: str, *, zstd: bool = False) -> str:
+    """Return the S3 key for a file whose SHA-256 hex digest is `hash`.
+
+    If `zstd`, the key is for a zstd-compressed copy. (`hash` is always the
+    hash of the _uncompressed_ contents.)
+    """
+    suffix = ZSTD_KEY_SUFFIX if zstd else ""
+    return f"{CONTENT_ADDRESSED_KEY_PREFIX}{hash}.dat{suffix}"
+
+
+def is_content_addressed_key(key: str) -> bool:
+    return key.startswith(CONTENT_ADDRESSED_KEY_PREFIX)
+
+
+def is_zstd_key(key: str) -> bool:
+    """Return True if the file at `key` is zstd-compressed."""
+    return key.endswith(ZSTD_KEY_SUFFIX)
+
+
+def add_to_step_totals(step_id: int, n: int, size: int) -> None:
+    """Adjust `Step.n_stored_objects` and `Step.stored_objects_size`.
+
+    Call this whenever creating (positive) or deleting (negative)
+    StoredObjects, within the same transaction.
+    """
+    Step.objects.filter(id=step_id).update(
+        n_stored_objects=F("n_stored_objects") + n,
+        stored_objects_size=F("stored_objects_size") + size,
+    )
+
+
+@contextlib.contextmanager
+def locked_key(key: str) -> ContextManager[None]:
+    """Open a transaction in which nobody else adds or removes `key`.
+
+    Hold this while you count StoredObjects pointing to `key` and
+    upload or delete its S3 file. Otherwise, a concurrent delete could remove
+    the file just as a concurrent write starts pointing to it.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [key])
+        yield
+
+
 class StoredObject(models.Model):
     """EVIL way of storing fetch results.
 
-    StoredObject links to an S3 key in s3.StoredObjectsBucket. The key must
-    adhere to the format: "{workflow_id}/{step_id}/{uuidv1()}"
+    StoredObject links to an S3 key in s3.StoredObjectsBucket. New keys are
+    content-addressed: "sha256/{hash}.dat" -- or "sha256/{hash}.dat.zst" if
+    the file is zstd-compressed. Many StoredObjects may point to the same key,
+    and the file lives until the last of them is deleted.
+    Legacy keys are "{workflow_id}/{step_id}/{uuidv1()}"; each belongs to a
+    single StoredObject.
 
     TODO store fetch results as fetches.
     """
@@ -31,29 +88,88 @@ class StoredObject(models.Model):
     key = models.CharField(max_length=255, null=False, blank=True, default="")
     stored_at = models.DateTimeField(default=datetime.datetime.now)
 
-    # used only for stored tables
-    hash = models.CharField(max_length=32)
-    size = models.IntegerField(default=0)  # file size
+    # SHA-256 hex digest of the file's contents. ("unhashed" on legacy objects)
+    hash = models.CharField(max_length=64)
+    size = models.IntegerField(default=0)  # file size, uncompressed
+
+    # HTTP validators the module reported, for its next conditional fetch
+    etag = models.TextField(null=True)
+    last_modified = models.TextField(null=True)
 
-    # make a deep copy for another Step
+    # make a copy for another Step
     def duplicate(self, to_step):
+        if is_content_addressed_key(self.key):
+            # Share the file. Lock, so a concurrent delete of `self` can't
+            # delete the file before we point to it.
+            with locked_key(self.key):
+                add_to_step_totals(to_step.id, 1, self.size)
+                return to_step.stored_objects.create(
+                    stored_at=self.stored_at,
+                    hash=self.hash,
+                    key=self.key,
+                    size=self.size,
+                    etag=self.etag,
+                    last_modified=self.last_modified,
+                )
+
+        # Legacy key: Workflow.delete() deletes its whole prefix. Copy the file.
         basename = self.key.split("/")[-1]
         key = f"{to_step.workflow_id}/{to_step.id}/{basename}"
         s3.copy(s3.StoredObjectsBucket, key, f"{s3.StoredObjectsBucket}/{self.key}")
 
+        add_to_step_totals(to_step.id, 1, self.size)
         return to_step.stored_objects.create(
-            stored_at=self.stored_at, hash=self.hash, key=key, size=self.size
+            stored_at=self.stored_at,
+            hash=self.hash,
+            key=key,
+            size=self.size,
+            etag=self.etag,
+            last_modified=self.last_modified,
         )
 
 
-@receiver(pre_delete, sender=StoredObject)
-def _delete_from_s3_pre_delete(sender, instance, **kwargs):
-    """Delete file from S3, pre-delete.
+@receiver(post_delete, sender=StoredObject)
+def _delete_from_s3_post_delete(sender, instance, **kwargs):
+    """Delete file from S3, if no other StoredObject points to it.
+
+    Why post-delete? Because one QuerySet.delete() may delete several
+    StoredObjects that share a key. Only after all are deleted can we tell
+    whether anybody else points to the file.
 
-    Why pre-delete and not post-delete? Because our user expects the file to be
-    _gone_, completely, forever -- that's what "delete" means to the user. If
-    deletion fails, we need the link to remain in our database -- that's how
-    the user will know it isn't deleted.
+    Our user expects the file to be _gone_, completely, forever -- that's
+    what "delete" means to the user. If deletion fails, we need the link to
+    remain in our database -- that's how the user will know it isn't deleted.
+    Django sends post_delete within the deletion's transaction, so if we
+    raise, the deletion rolls back.
+
+    Within `deleting_files_in_bulk()`, delete all the deleted StoredObjects'
+    files at the end, in one `delete_files_if_unreferenced()` call.
     """
+    add_to_step_totals(instance.step_id, -1, -instance.size)
     if instance.key:
-        s3.remove(s3.StoredObjectsBucket, instance.key)
+        delete_files(delete_files_if_unreferenced, [instance.key])
+
+
+def delete_files_if_unreferenced(keys: Iterable[str]) -> None:
+    """Delete the S3 files at `keys`, except those a StoredObject points to.
+
+    Call this after deleting StoredObjects. Lock all the shared keys, query
+    which ones are still referenced and delete the rest with one
+    `s3.remove_many()` call.
+    """
+    keys = set(keys)
+    legacy_keys = [key for key in keys if not is_content_addressed_key(key)]
+    shared_keys = sorted(keys.difference(legacy_keys))
+    with contextlib.ExitStack() as stack:
+        # Lock in sorted order, so concurrent callers can't deadlock
+        for key in shared_keys:
+            stack.enter_context(locked_key(key))
+        referenced_keys = frozenset(
+            StoredObject.objects.filter(key__in=shared_keys).values_list(
+                "key", flat=True
+            )
+        )
+        s3.remove_many(
+            s3.StoredObjectsBucket,
+            legacy_keys + [key for key in shared_keys if key not in referenced_keys],
+        )
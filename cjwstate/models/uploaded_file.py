@@ -1,4 +1,5 @@
 import datetime
+from typing import Iterable
 
 from django.conf import settings
 from django.db import models
@@ -7,6 +8,7 @@ from django.dispatch import receiver
 from cjwstate import s3
 from cjwstate.util import find_deletable_ids
 
+from .file_deletion import delete_files, deleting_files_in_bulk
 from .step import Step
 
 
@@ -54,10 +56,16 @@ def delete_old_files_to_enforce_storage_limits(*, step: Step) -> int:
     if to_delete:
         # QuerySet.delete() sends pre_delete signal, which deletes from S3
         # ref: https://docs.djangoproject.com/en/2.2/ref/models/querysets/#django.db.models.query.QuerySet.delete
-        step.uploaded_files.filter(id__in=to_delete).delete()
+        with deleting_files_in_bulk():
+            step.uploaded_files.filter(id__in=to_delete).delete()
+
+
+def _remove_user_files(keys: Iterable[str]) -> None:
+    s3.remove_many(s3.UserFilesBucket, keys)
 
 
 @receiver(models.signals.pre_delete, sender=UploadedFile)
 def auto_delete_file_on_delete(sender, instance, **kwargs):
-    # Delete S3 data when UploadedFile is deleted
-    s3.remove(s3.UserFilesBucket, instance.key)
+    # Delete S3 data when UploadedFile is deleted -- within
+    # deleting_files_in_bulk(), along with the other deleted files
+    delete_files(_remove_user_files, [instance.key])
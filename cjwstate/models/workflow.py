@@ -15,6 +15,7 @@ from django.urls import reverse
 
 from cjwstate import clientside, s3
 from cjwstate.models.dbutil import user_display_name
+from cjwstate.models.file_deletion import deleting_files_in_bulk
 from cjwstate.models.fields import Role
 from cjwstate.modules.util import gather_param_tab_slugs
 
@@ -458,20 +459,22 @@ class Workflow(models.Model):
         self.fetches_per_day = result["fetches_per_day"] or 0.0
 
     def delete_orphan_soft_deleted_tabs(self):
-        return (
-            self.tabs.filter(is_deleted=True)
-            .exclude(Exists(self.deltas.filter(tab_id=OuterRef("id"))))
-            .delete()
-        )
+        with deleting_files_in_bulk():
+            return (
+                self.tabs.filter(is_deleted=True)
+                .exclude(Exists(self.deltas.filter(tab_id=OuterRef("id"))))
+                .delete()
+            )
 
     def delete_orphan_soft_deleted_steps(self):
         from cjwstate.models import Step
 
-        return (
-            Step.objects.filter(tab__workflow_id=self.id, is_deleted=True)
-            .exclude(Exists(self.deltas.filter(step_id=OuterRef("id"))))
-            .delete()
-        )
+        with deleting_files_in_bulk():
+            return (
+                Step.objects.filter(tab__workflow_id=self.id, is_deleted=True)
+                .exclude(Exists(self.deltas.filter(step_id=OuterRef("id"))))
+                .delete()
+            )
 
     def delete_orphan_soft_deleted_models(self):
         """Delete soft-deleted Tabs and Steps that have no Delta.
@@ -507,7 +510,8 @@ class Workflow(models.Model):
             s3.remove_recursive(s3.StoredObjectsBucket, f"{self.id}/")
             s3.remove_recursive(s3.UserFilesBucket, f"wf-{self.id}/")
 
-        super().delete(*args, **kwargs)
+        with deleting_files_in_bulk():
+            super().delete(*args, **kwargs)
 
     def to_clientside(
         self,
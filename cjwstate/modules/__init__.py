@@ -1,3 +1,5 @@
+from django.conf import settings
+
 import cjwkernel.kernel
 
 kernel = None
@@ -13,4 +15,7 @@ def init_module_system():
     # Ignore spurious init() calls. They happen in unit-testing: each unit test
     # that relies on the module system needs to ensure it's initialized.
     if kernel is None:
-        kernel = cjwkernel.kernel.Kernel()
+        kernel = cjwkernel.kernel.Kernel(
+            memory_limit_bytes=settings.KERNEL_MEMORY_LIMIT_BYTES,
+            cpu_limit_seconds=settings.KERNEL_CPU_LIMIT_SECONDS,
+        )
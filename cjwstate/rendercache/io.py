@@ -5,7 +5,7 @@ from typing import ContextManager
 import cjwparquet
 import pyarrow as pa
 
-from cjwkernel.files import read_parquet_as_arrow
+from cjwkernel.files import write_parquet_as_arrow
 from cjwkernel.types import LoadedRenderResult
 from cjwkernel.util import json_encode, tempfile_context
 from cjwstate import s3
@@ -155,14 +155,13 @@ def load_cached_render_result(
         with downloaded_parquet_file(crr) as parquet_path:
             try:
                 # raises ArrowIOError
-                table = read_parquet_as_arrow(parquet_path, crr.table_metadata.columns)
+                #
+                # Convert one record batch at a time: we don't expect errors
+                # writing to disk, and this shouldn't consume much RAM.
+                write_parquet_as_arrow(parquet_path, crr.table_metadata.columns, path)
             except pa.ArrowIOError as err:
                 raise CorruptCacheError from err
 
-            # We don't expect errors writing to disk: this shouldn't consume RAM
-            with pa.ipc.RecordBatchFileWriter(path, table.schema) as writer:
-                writer.write_table(table)
-
             # Now, read the table from the file, so that `path` and `table` are
             # equivalent. Don't validate the file: we know what it contains.
             with pa.ipc.open_file(path) as reader:
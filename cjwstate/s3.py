@@ -1,7 +1,9 @@
 """High-level storage backed by AWS S3, Google GCS, or Minio.
 """
 
+import concurrent.futures
 import errno
+import itertools
 import json
 import logging
 import pathlib
@@ -9,10 +11,11 @@ import sys
 import urllib3
 import urllib.parse
 from contextlib import contextmanager
-from typing import ContextManager, NamedTuple
+from typing import ContextManager, Iterable, Iterator, List, NamedTuple, Optional
 
 import boto3
 import botocore
+import zstandard
 from boto3.s3.transfer import S3Transfer, TransferConfig
 from django.conf import settings
 
@@ -21,6 +24,8 @@ from cjwkernel.util import tempfile_context
 
 logger = logging.getLogger(__name__)
 
+_MAX_KEYS_PER_DELETE_OBJECTS = 1000  # S3 API limit
+
 
 def encode_content_disposition(filename: str) -> str:
     """Build a Content-Disposition header value for the given filename."""
@@ -108,27 +113,61 @@ def __getattr__(name: str):
     return settings.S3_BUCKET_NAME_PATTERN % BucketNames[name]
 
 
-def list_file_keys(bucket: str, prefix: str):
+def iter_keys(
+    bucket: str,
+    prefix: str,
+    *,
+    delimiter: Optional[str] = None,
+    page_size: int = 1000,
+) -> Iterator[str]:
+    """Yield keys of objects in `bucket` whose keys begin with `prefix`.
+
+    Request `page_size` keys at a time, lazily: the caller may stop iterating
+    (or delete the keys it has seen) before we request the next page.
+
+    If `delimiter` is set (usually `"/"`), skip keys that contain it after
+    `prefix` -- that is, list non-recursively.
+
+    >>> list(s3.iter_keys('bucket', 'filter/a132b3f/', delimiter='/'))
+    ['filter/a132b3f/spec.json', 'filter/a132b3f/filter.py']
+    """
+    kwargs = dict(Bucket=bucket, Prefix=prefix)
+    if delimiter is not None:
+        kwargs["Delimiter"] = delimiter
+    # Use list_objects, not list_objects_v2, because Google Cloud Storage's
+    # AWS emulation doesn't support v2. The paginator requests each page
+    # starting after the last key of the previous one.
+    paginator = layer.client.get_paginator("list_objects")
+    for page in paginator.paginate(**kwargs, PaginationConfig={"PageSize": page_size}):
+        for o in page.get("Contents", []):
+            yield o["Key"]
+
+
+def list_file_keys(bucket: str, prefix: str) -> List[str]:
     """List keys of non-directory objects, non-recursively, in `prefix`.
 
     >>> s3.list_file_keys('bucket', 'filter/a132b3f/')
     ['filter/a132b3f/spec.json', 'filter/a132b3f/filter.py']
     """
-    # Use list_objects, not list_objects_v2, because Google Cloud Storage's
-    # AWS emulation doesn't support v2.
-    response = layer.client.list_objects(
-        Bucket=bucket, Prefix=prefix, Delimiter="/"  # avoid recursive
-    )
-    if response.get("IsTruncated"):
-        # ... I guess we should paginate?
-        raise NotImplementedError("list_objects() returned truncated result")
-    return [o["Key"] for o in response.get("Contents", [])]
+    return list(iter_keys(bucket, prefix, delimiter="/"))
 
 
 def fput_file(bucket: str, key: str, path: pathlib.Path) -> None:
     layer.uploader.upload_file(str(path.resolve()), bucket, key)
 
 
+def fput_file_zstd(bucket: str, key: str, path: pathlib.Path, *, level: int) -> None:
+    """Upload a zstd-compressed copy of the file at `path`.
+
+    Compress in chunks to a tempfile first: each upload is a single part, so
+    it needs a Content-Length.
+    """
+    with tempfile_context(prefix="s3-upload-", suffix=".zst") as compressed_path:
+        with path.open("rb") as src, compressed_path.open("wb") as dest:
+            zstandard.ZstdCompressor(level=level).copy_stream(src, dest)
+        fput_file(bucket, key, compressed_path)
+
+
 def put_bytes(bucket: str, key: str, body: bytes, **kwargs) -> None:
     layer.client.put_object(
         Bucket=bucket, Key=key, Body=body, ContentLength=len(body), **kwargs
@@ -166,6 +205,56 @@ def remove(bucket: str, key: str) -> None:
         pass
 
 
+def _delete_objects(bucket: str, keys: List[str]) -> None:
+    response = layer.client.delete_objects(
+        Bucket=bucket,
+        Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+    )
+    errors = response.get("Errors", [])
+    if errors:
+        # Like delete_object(), ignore already-deleted keys
+        errors = [error for error in errors if error.get("Code") != "NoSuchKey"]
+    if errors:
+        raise botocore.exceptions.ClientError({"Error": errors[0]}, "DeleteObjects")
+
+
+def remove_many(bucket: str, keys: Iterable[str]) -> None:
+    """Delete the files at `keys`. Skip keys that are already deleted.
+
+    If the server supports DeleteObjects, delete up to 1,000 keys per request.
+    Otherwise, send one request per key. Either way, send up to
+    `settings.S3_MAX_CONCURRENT_DELETES` requests at once.
+
+    This is _not atomic_. If one request fails, others may succeed. Raise the
+    first error after all requests finish.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+
+    if settings.AWS_S3_SUPPORTS_DELETE_OBJECTS:
+        batches = [
+            keys[i : i + _MAX_KEYS_PER_DELETE_OBJECTS]
+            for i in range(0, len(keys), _MAX_KEYS_PER_DELETE_OBJECTS)
+        ]
+        tasks = [(_delete_objects, bucket, batch) for batch in batches]
+    else:
+        tasks = [(remove, bucket, key) for key in keys]
+
+    if len(tasks) == 1:
+        fn, *args = tasks[0]
+        fn(*args)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=settings.S3_MAX_CONCURRENT_DELETES,
+        thread_name_prefix="s3-remove-many-",
+    ) as executor:
+        futures = [executor.submit(*task) for task in tasks]
+    for future in futures:
+        future.result()  # raise first error
+
+
 def copy(bucket: str, key: str, copy_source: str, **kwargs) -> None:
     layer.client.copy_object(Bucket=bucket, Key=key, CopySource=copy_source, **kwargs)
 
@@ -176,7 +265,8 @@ def _remove_by_prefix(bucket: str, prefix: str, force=False) -> None:
     This is _not atomic_. An aborted delete may leave some objects deleted
     and others not-deleted.
 
-    It's also slow. Be certain there aren't many files to delete.
+    It's also slow on servers that don't support DeleteObjects (such as
+    Google Cloud Storage): there, each key is its own request.
 
     If you mean to use a directory-style `prefix` -- that is, one that ends in
     `"/"` -- then use `remove_recursive()` to signal your intent.
@@ -188,30 +278,20 @@ def _remove_by_prefix(bucket: str, prefix: str, force=False) -> None:
     if prefix in ("/", "") and not force:
         raise ValueError("Refusing to remove prefix=/ when force=False")
 
-    # Use list_objects, not list_objects_v2, because Google Cloud Storage's
-    # AWS emulation doesn't support v2.
-    #
-    # Loop, deleting 1,000 keys at a time. S3 DELETE is strongly-consistent:
-    # after we delete 1,000 keys, we're guaranteed list_objects() won't re-list
-    # them. Same with Google Cloud Storage, which we configure to emulate AWS on
-    # production.
+    # Delete 1,000 keys at a time, as we list them. S3 DELETE is
+    # strongly-consistent, and each listed page begins after the last key of
+    # the previous page: we won't re-list deleted keys. Same with Google Cloud
+    # Storage, which we configure to emulate AWS on production.
     #
     # ref: https://docs.aws.amazon.com/AmazonS3/latest/dev/Introduction.html#ConsistencyModel
     # ref: https://cloud.google.com/storage/docs/consistency#strongly_consistent_operations
     # ref: https://cloud.google.com/storage/docs/interoperability
-    done = False
-    while not done:
-        # no Delimiter="/" means it's a recursive request
-        list_response = layer.client.list_objects(Bucket=bucket, Prefix=prefix)
-        done = not list_response.get("IsTruncated", False)
-        keys = [o["Key"] for o in list_response.get("Contents", [])]
-        # Use layer.client.delete_object(), not delete_objects(), because Google Cloud
-        # Storage doesn't emulate DeleteObjects.
-        #
-        # This is slow. But so is multi-delete through s3, because s3's
-        # GCS gateway deletes one-at-a-time anyway.
-        for key in keys:
-            remove(bucket, key)
+    keys = iter_keys(bucket, prefix)  # no delimiter means it's recursive
+    while True:
+        batch = list(itertools.islice(keys, _MAX_KEYS_PER_DELETE_OBJECTS))
+        if not batch:
+            break
+        remove_many(bucket, batch)
 
 
 def remove_recursive(bucket: str, prefix: str, force=False) -> None:
@@ -219,9 +299,9 @@ def remove_recursive(bucket: str, prefix: str, force=False) -> None:
 
     `prefix` must appear to be a directory -- that is, it must end with a slash.
 
-    If you really mean to use `prefix='/'` -- which will wipe the entire bucket,
-    up to 1,000 keys -- pass `force=True`. Otherwise, there is a safeguard
-    against `prefix=''` specifically.
+    If you really mean to use `prefix='/'` -- which will wipe the entire
+    bucket -- pass `force=True`. Otherwise, there is a safeguard against
+    `prefix=''` specifically.
     """
     if not prefix.endswith("/"):
         raise ValueError("`prefix` must end with `/`")
@@ -265,3 +345,23 @@ def download(bucket: str, key: str, path: pathlib.Path) -> None:
             raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
         else:
             raise
+
+
+def download_zstd(bucket: str, key: str, path: pathlib.Path) -> None:
+    """Copy a zstd-compressed file from S3 to a pathlib.Path, decompressing.
+
+    Decompress as we download, so the file is never in memory or on disk
+    twice.
+
+    Raise FileNotFoundError if the key is not on S3.
+    """
+    try:
+        response = layer.client.get_object(Bucket=bucket, Key=key)
+    except layer.error.NoSuchKey:
+        raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
+    body = response["Body"]
+    try:
+        with path.open("wb") as f:
+            zstandard.ZstdDecompressor().copy_stream(body, f)
+    finally:
+        body.close()
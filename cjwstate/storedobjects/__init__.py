@@ -1,11 +1,21 @@
 from .io import (
     create_stored_object,
     delete_old_files_to_enforce_storage_limits,
+    delete_pending_files,
+    delete_unreferenced_files,
+    download,
+    download_async,
     downloaded_file,
+    hash_file,
 )
 
 __all__ = (
     "create_stored_object",
     "delete_old_files_to_enforce_storage_limits",
+    "delete_pending_files",
+    "delete_unreferenced_files",
+    "download",
+    "download_async",
     "downloaded_file",
+    "hash_file",
 )
@@ -1,21 +1,61 @@
+import contextlib
 import datetime
-import uuid
+import hashlib
 from pathlib import Path
-from typing import ContextManager, Optional
+from typing import ContextManager, Iterable, List, Optional
 
 from django.conf import settings
+from django.db import connection, transaction
 
 from cjwkernel.util import tempfile_context
-from cjwstate import s3
+from cjwstate import aios3, s3
 from cjwstate.models import Step, StoredObject
-from cjwstate.util import find_deletable_ids
+from cjwstate.models.stored_object import (
+    add_to_step_totals,
+    content_addressed_key,
+    delete_files_if_unreferenced,
+    is_zstd_key,
+    locked_key,
+)
 
 BUCKET = s3.StoredObjectsBucket
+_HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def download(stored_object: StoredObject, path: Path) -> None:
+    """Write the StoredObject's file to `path`, decompressing if needed.
+
+    Raise FileNotFoundError if the object is missing.
+    """
+    if is_zstd_key(stored_object.key):
+        s3.download_zstd(BUCKET, stored_object.key, path)
+    else:
+        s3.download(BUCKET, stored_object.key, path)
+
+
+async def download_async(stored_object: StoredObject, path: Path) -> None:
+    """Like download(), but without blocking a thread.
+
+    Raise FileNotFoundError if the object is missing.
+    """
+    if is_zstd_key(stored_object.key):
+        await aios3.download_zstd(BUCKET, stored_object.key, path)
+    else:
+        await aios3.download(BUCKET, stored_object.key, path)
+
+
+@contextlib.contextmanager
+def _downloaded_file(stored_object: StoredObject, dir=None) -> ContextManager[Path]:
+    with tempfile_context(prefix="s3-download-", dir=dir) as path:
+        download(stored_object, path)  # raise FileNotFoundError (deleting path)
+        yield path
 
 
 def downloaded_file(stored_object: StoredObject, dir=None) -> ContextManager[Path]:
     """Context manager to download and yield `path`, the StoredObject's file.
 
+    The file is decompressed, if it is compressed on S3.
+
     Raise FileNotFoundError if the object is missing.
 
     Usage:
@@ -32,14 +72,23 @@ def downloaded_file(stored_object: StoredObject, dir=None) -> ContextManager[Pat
         return tempfile_context(prefix="storedobjects-empty-file", dir=dir)
     else:
         # raises FileNotFoundError
-        return s3.temporarily_download(
-            s3.StoredObjectsBucket, stored_object.key, dir=dir
-        )
+        return _downloaded_file(stored_object, dir=dir)
+
 
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of the file at `path`.
 
-def _build_key(workflow_id: int, step_id: int) -> str:
-    """Build a helpful S3 key."""
-    return f"{workflow_id}/{step_id}/{uuid.uuid1()}.dat"
+    Read in chunks, so huge files don't consume huge amounts of RAM.
+    """
+    sha256 = hashlib.sha256()
+    buffer = bytearray(_HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with path.open("rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                return sha256.hexdigest()
+            sha256.update(view[:n])
 
 
 def create_stored_object(
@@ -47,45 +96,170 @@ def create_stored_object(
     step_id: int,
     path: Path,
     stored_at: Optional[datetime.datetime] = None,
+    hash: Optional[str] = None,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
 ) -> StoredObject:
     """Write and return a new StoredObject.
 
-    The caller should call enforce_storage_limits() after calling this.
+    Its `hash` is the SHA-256 of `path`'s contents. Pass `hash` if you already
+    computed `hash_file(path)`; otherwise we'll compute it.
+
+    `etag` and `last_modified` are HTTP validators the module reported; the
+    next fetch() receives them.
+
+    The file is content-addressed: if another StoredObject (on any Step)
+    already stored the same bytes, we point to its file instead of uploading.
+    (So `workflow_id` no longer affects the key.) If
+    `settings.STORED_OBJECTS_ZSTD_LEVEL` is set, we upload a zstd-compressed
+    copy; `size` is always the uncompressed size.
+
+    The caller should call delete_old_files_to_enforce_storage_limits() after
+    calling this.
 
     Raise IntegrityError if a database race prevents saving this. Raise a s3
-    error if writing to s3 failed. In case of partial completion, a
-    StoredObject will exist in the database but no file will be saved in s3.
+    error if writing to s3 failed; in that case, the transaction rolls back
+    and no StoredObject is created.
     """
     if stored_at is None:
         stored_at = datetime.datetime.now()
-    key = _build_key(workflow_id, step_id)
     size = path.stat().st_size
-    stored_object = StoredObject.objects.create(
-        stored_at=stored_at,
-        step_id=step_id,
-        key=key,
-        size=size,
-        hash="unhashed",
-    )
-    s3.fput_file(BUCKET, key, path)
+    if hash is None:
+        hash = hash_file(path)
+    zstd_level = settings.STORED_OBJECTS_ZSTD_LEVEL
+    key = content_addressed_key(hash, zstd=zstd_level > 0)
+    with locked_key(key):
+        stored_object = StoredObject.objects.create(
+            stored_at=stored_at,
+            step_id=step_id,
+            key=key,
+            size=size,
+            hash=hash,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        add_to_step_totals(step_id, 1, size)
+        if not s3.exists(BUCKET, key):
+            if zstd_level > 0:
+                s3.fput_file_zstd(BUCKET, key, path, level=zstd_level)
+            else:
+                s3.fput_file(BUCKET, key, path)
     return stored_object
 
 
-def delete_old_files_to_enforce_storage_limits(*, step: Step) -> None:
+def delete_old_files_to_enforce_storage_limits(*, step: Step) -> List[str]:
     """Delete old fetches that bring us past MAX_BYTES_FETCHES_PER_STEP or
-    MAX_N_FETCHES_PER_STEP.
+    MAX_N_FETCHES_PER_STEP. Return the keys of the files they pointed to.
 
     We can't let every workflow grow forever.
+
+    Decide using the Step's running totals, so in the common case -- within
+    limits -- we needn't look at its StoredObjects at all. Otherwise, delete
+    the oldest StoredObjects until we're within limits. Never delete the
+    newest one, nor the one at `step.stored_data_version`.
+
+    Leave the files on S3: S3 is slow, and the caller probably holds the
+    workflow's lock. After releasing the lock, the caller should call
+    `delete_unreferenced_files()` with the returned keys.
+
+    In the same transaction, record the keys in the
+    `pending_stored_object_deletion` table. If the caller crashes, or
+    `delete_unreferenced_files()` fails, `delete_pending_files()` will
+    retry.
     """
-    to_delete = find_deletable_ids(
-        ids_and_sizes=step.stored_objects.order_by("-stored_at").values_list(
-            "id", "size"
-        ),
-        n_limit=settings.MAX_N_FETCHES_PER_STEP,
-        size_limit=settings.MAX_BYTES_FETCHES_PER_STEP,
+    n, size = (
+        Step.objects.filter(id=step.id)
+        .values_list("n_stored_objects", "stored_objects_size")
+        .get()
+    )
+    n_limit = settings.MAX_N_FETCHES_PER_STEP
+    size_limit = settings.MAX_BYTES_FETCHES_PER_STEP
+    if n <= n_limit and size <= size_limit:
+        return []
+
+    # Never delete the newest or the selected version. Exclude them in the
+    # query: if the running totals drifted high, we mustn't trust `n` to
+    # tell us which rows are old.
+    newest_id = (
+        step.stored_objects.order_by("-stored_at").values_list("id", flat=True).first()
     )
+    oldest_first = (
+        step.stored_objects.exclude(id=newest_id)
+        .exclude(stored_at=step.stored_data_version)
+        .order_by("stored_at")
+        .values_list("id", "size")
+    )
+
+    to_delete = []
+    delete_size = 0
+    for id, stored_object_size in oldest_first:
+        if n - len(to_delete) <= n_limit and size - delete_size <= size_limit:
+            break
+        to_delete.append(id)
+        delete_size += stored_object_size
 
-    if to_delete:
-        # QuerySet.delete() sends pre_delete signal, which deletes from S3
-        # ref: https://docs.djangoproject.com/en/2.2/ref/models/querysets/#django.db.models.query.QuerySet.delete
-        step.stored_objects.filter(id__in=to_delete).delete()
+    if not to_delete:
+        return []
+
+    # Delete with SQL, not QuerySet.delete(): the post_delete signal would
+    # delete files from S3 right now.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM stored_object WHERE id = ANY(%s) RETURNING key",
+                [to_delete],
+            )
+            keys = [key for key, in cursor.fetchall() if key]
+            cursor.execute(
+                """
+                INSERT INTO pending_stored_object_deletion (key)
+                SELECT UNNEST(%s)
+                ON CONFLICT DO NOTHING
+                """,
+                [keys],
+            )
+        add_to_step_totals(step.id, -len(to_delete), -delete_size)
+    return keys
+
+
+def delete_unreferenced_files(keys: Iterable[str]) -> None:
+    """Delete files from S3 that no StoredObject points to any more.
+
+    Call this with the output of delete_old_files_to_enforce_storage_limits().
+    Delete the files with `delete_files_if_unreferenced()`. Then forget the
+    keys in `pending_stored_object_deletion`.
+    """
+    keys = set(keys)
+    with transaction.atomic():
+        delete_files_if_unreferenced(keys)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM pending_stored_object_deletion WHERE key = ANY(%s)",
+                [list(keys)],
+            )
+
+
+def delete_pending_files(
+    min_age: datetime.timedelta = datetime.timedelta(minutes=10), limit: int = 1000
+) -> int:
+    """Retry `delete_unreferenced_files()` for keys nobody deleted.
+
+    Only consider keys recorded more than `min_age` ago: younger ones most
+    likely belong to a fetcher that's about to delete them itself. Return the
+    number of keys we handled (at most `limit`).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT key
+            FROM pending_stored_object_deletion
+            WHERE created_at <= NOW() - %s
+            ORDER BY created_at
+            LIMIT %s
+            """,
+            [min_age, limit],
+        )
+        keys = [key for key, in cursor.fetchall()]
+    if keys:
+        delete_unreferenced_files(keys)
+    return len(keys)
@@ -45,12 +45,9 @@ class StepTests(DbTestCase):
         self.assertEqual(step1d.stored_objects.count(), 1)
         self.assertEqual(step1d.stored_data_version, step1.stored_data_version)
         so2d = step1d.stored_objects.first()
-        # The StoredObject was copied byte for byte into a different file
-        self.assertNotEqual(so2d.key, so2.key)
-        self.assertEqual(
-            get_s3_object_with_data(s3.StoredObjectsBucket, so2d.key)["Body"],
-            get_s3_object_with_data(s3.StoredObjectsBucket, so2.key)["Body"],
-        )
+        # The StoredObject shares the same (content-addressed) file
+        self.assertEqual(so2d.key, so2.key)
+        self.assertEqual(so2d.hash, so2.hash)
 
     def test_step_duplicate_disable_auto_update(self):
         # Duplicates should be lightweight by default: no auto-updating.
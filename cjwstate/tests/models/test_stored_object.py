@@ -1,6 +1,9 @@
+from unittest.mock import patch
 from uuid import uuid1
+from cjwkernel.util import tempfile_context
 from cjwstate import s3
 from cjwstate.models import Workflow
+from cjwstate.storedobjects import create_stored_object
 from cjwstate.tests.utils import DbTestCase, get_s3_object_with_data
 
 
@@ -69,3 +72,53 @@ class StoredObjectTests(DbTestCase):
         step = workflow.tabs.first().steps.create(order=0, slug="step-1")
         so = step.stored_objects.create(size=4, key="missing-key")
         so.delete()
+
+    def test_duplicate_content_addressed_shares_file(self):
+        with tempfile_context() as path:
+            path.write_bytes(b"12345")
+            so1 = create_stored_object(self.workflow.id, self.step1.id, path)
+        step2 = self.step1.tab.steps.create(order=1, slug="step-2")
+        so2 = so1.duplicate(step2)
+        self.assertEqual(so2.key, so1.key)
+        self.assertEqual(so2.hash, so1.hash)
+        self.assertEqual(so2.stored_at, so1.stored_at)
+
+    def test_delete_keeps_file_other_step_points_to(self):
+        with tempfile_context() as path:
+            path.write_bytes(b"12345")
+            so1 = create_stored_object(self.workflow.id, self.step1.id, path)
+        step2 = self.step1.tab.steps.create(order=1, slug="step-2")
+        so1.duplicate(step2)
+        self.step1.delete()
+        self.assertTrue(s3.exists(s3.StoredObjectsBucket, so1.key))
+        step2.delete()
+        self.assertFalse(s3.exists(s3.StoredObjectsBucket, so1.key))
+
+    def test_delete_workflow_deletes_shared_file(self):
+        with tempfile_context() as path:
+            path.write_bytes(b"12345")
+            so1 = create_stored_object(self.workflow.id, self.step1.id, path)
+        step2 = self.step1.tab.steps.create(order=1, slug="step-2")
+        so1.duplicate(step2)
+        self.workflow.delete()  # deletes both StoredObjects in one query
+        self.assertFalse(s3.exists(s3.StoredObjectsBucket, so1.key))
+
+    def test_delete_tab_deletes_files_in_one_call(self):
+        tab = self.workflow.tabs.create(position=1, slug="tab-2")
+        step = tab.steps.create(order=0, slug="step-2")
+        keys = []
+        for i in range(3):
+            with tempfile_context() as path:
+                path.write_bytes(b"file %d" % i)
+                keys.append(create_stored_object(self.workflow.id, step.id, path).key)
+        step.stored_objects.create(size=4, key="test.dat")  # legacy key
+        s3.put_bytes(s3.StoredObjectsBucket, "test.dat", b"abcd")
+        with patch.object(s3, "remove_many", wraps=s3.remove_many) as remove_many:
+            tab.delete()
+        remove_many.assert_called_once()
+        self.assertEqual(remove_many.call_args[0][0], s3.StoredObjectsBucket)
+        self.assertEqual(
+            sorted(remove_many.call_args[0][1]), sorted(keys + ["test.dat"])
+        )
+        for key in keys + ["test.dat"]:
+            self.assertFalse(s3.exists(s3.StoredObjectsBucket, key))
@@ -1,10 +1,20 @@
+import datetime
+import hashlib
+import unittest
+from unittest.mock import patch
+
 from django.test.utils import override_settings
 
 from cjwkernel.tests.util import tempfile_context
-from cjwstate.models import Workflow
+from cjwstate import s3
+from cjwstate.models import Step, Workflow
 from cjwstate.storedobjects.io import (
     create_stored_object,
     delete_old_files_to_enforce_storage_limits,
+    delete_pending_files,
+    delete_unreferenced_files,
+    downloaded_file,
+    hash_file,
 )
 from cjwstate.tests.utils import DbTestCase
 
@@ -95,3 +105,221 @@ class EnforceStorageLimitsTests(DbTestCase):
             ),
             [so4.id, so3.id],
         )
+
+    @override_settings(MAX_N_FETCHES_PER_STEP=1)
+    def test_never_delete_selected_version(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, slug="step-1")
+
+        with tempfile_context() as path:
+            path.write_text("abc")
+            so1 = create_stored_object(workflow.id, step.id, path)
+            path.write_text("def")
+            create_stored_object(workflow.id, step.id, path)
+            path.write_text("ghi")
+            so3 = create_stored_object(workflow.id, step.id, path)  # newest
+        step.stored_data_version = so1.stored_at
+        step.save(update_fields=["stored_data_version"])
+
+        delete_old_files_to_enforce_storage_limits(step=step)
+        self.assertEqual(
+            list(
+                step.stored_objects.order_by("stored_at").values_list("id", flat=True)
+            ),
+            [so1.id, so3.id],
+        )
+
+    @override_settings(MAX_N_FETCHES_PER_STEP=2)
+    def test_never_delete_newest_when_totals_drift(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, slug="step-1")
+
+        with tempfile_context() as path:
+            path.write_text("abc")
+            create_stored_object(workflow.id, step.id, path)
+            path.write_text("def")
+            so2 = create_stored_object(workflow.id, step.id, path)  # newest
+        # e.g., old code deleted rows without updating the totals
+        Step.objects.filter(id=step.id).update(n_stored_objects=10)
+
+        delete_old_files_to_enforce_storage_limits(step=step)
+        self.assertEqual(
+            list(step.stored_objects.values_list("id", flat=True)), [so2.id]
+        )
+
+    @override_settings(MAX_N_FETCHES_PER_STEP=1)
+    def test_leave_files_for_delete_unreferenced_files(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, slug="step-1")
+
+        with tempfile_context() as path:
+            path.write_text("abc")
+            so1 = create_stored_object(workflow.id, step.id, path)
+            path.write_text("def")
+            create_stored_object(workflow.id, step.id, path)
+
+        keys = delete_old_files_to_enforce_storage_limits(step=step)
+        self.assertEqual(keys, [so1.key])
+        self.assertTrue(s3.exists(s3.StoredObjectsBucket, so1.key))
+        delete_unreferenced_files(keys)
+        self.assertFalse(s3.exists(s3.StoredObjectsBucket, so1.key))
+
+    @override_settings(MAX_N_FETCHES_PER_STEP=1)
+    def test_delete_pending_files_after_failed_delete(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, slug="step-1")
+
+        with tempfile_context() as path:
+            path.write_text("abc")
+            so1 = create_stored_object(workflow.id, step.id, path)
+            path.write_text("def")
+            create_stored_object(workflow.id, step.id, path)
+
+        # The caller never calls delete_unreferenced_files() -- e.g., it crashed
+        delete_old_files_to_enforce_storage_limits(step=step)
+        self.assertEqual(delete_pending_files(), 0)  # too young
+        self.assertEqual(delete_pending_files(min_age=datetime.timedelta(0)), 1)
+        self.assertFalse(s3.exists(s3.StoredObjectsBucket, so1.key))
+        self.assertEqual(delete_pending_files(min_age=datetime.timedelta(0)), 0)
+
+    @override_settings(MAX_N_FETCHES_PER_STEP=1)
+    def test_delete_unreferenced_files_forgets_pending_keys(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, slug="step-1")
+
+        with tempfile_context() as path:
+            path.write_text("abc")
+            create_stored_object(workflow.id, step.id, path)
+            path.write_text("def")
+            create_stored_object(workflow.id, step.id, path)
+
+        delete_unreferenced_files(delete_old_files_to_enforce_storage_limits(step=step))
+        self.assertEqual(delete_pending_files(min_age=datetime.timedelta(0)), 0)
+
+    @override_settings(MAX_N_FETCHES_PER_STEP=1)
+    def test_delete_unreferenced_files_keeps_shared_file(self):
+        workflow = Workflow.create_and_init()
+        step1 = workflow.tabs.first().steps.create(order=1, slug="step-1")
+        step2 = workflow.tabs.first().steps.create(order=2, slug="step-2")
+
+        with tempfile_context() as path:
+            path.write_text("abc")
+            so1 = create_stored_object(workflow.id, step1.id, path)
+            create_stored_object(workflow.id, step2.id, path)
+            path.write_text("def")
+            create_stored_object(workflow.id, step1.id, path)
+
+        delete_unreferenced_files(
+            delete_old_files_to_enforce_storage_limits(step=step1)
+        )
+        self.assertTrue(s3.exists(s3.StoredObjectsBucket, so1.key))
+
+    @override_settings(MAX_N_FETCHES_PER_STEP=2)
+    def test_maintain_step_totals(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, slug="step-1")
+
+        with tempfile_context() as path:
+            for data in ("1", "22", "333"):
+                path.write_text(data)
+                create_stored_object(workflow.id, step.id, path)
+            step.refresh_from_db()
+            self.assertEqual(step.n_stored_objects, 3)
+            self.assertEqual(step.stored_objects_size, 6)
+
+        delete_old_files_to_enforce_storage_limits(step=step)
+        step.refresh_from_db()
+        self.assertEqual(step.n_stored_objects, 2)
+        self.assertEqual(step.stored_objects_size, 5)
+
+        step.stored_objects.first().delete()
+        step.refresh_from_db()
+        self.assertEqual(step.n_stored_objects, 1)
+
+
+class CreateStoredObjectTests(DbTestCase):
+    def test_hash_contents(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, module_id_name="x")
+
+        with tempfile_context() as path:
+            path.write_bytes(b"abc")
+            stored_object = create_stored_object(workflow.id, step.id, path)
+
+        self.assertEqual(
+            stored_object.hash,
+            "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad",
+        )
+
+    def test_store_validators(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, module_id_name="x")
+
+        with tempfile_context() as path:
+            path.write_bytes(b"abc")
+            create_stored_object(
+                workflow.id,
+                step.id,
+                path,
+                etag='"abc"',
+                last_modified="Wed, 21 Oct 2015 07:28:00 GMT",
+            )
+
+        stored_object = step.stored_objects.get()
+        self.assertEqual(stored_object.etag, '"abc"')
+        self.assertEqual(stored_object.last_modified, "Wed, 21 Oct 2015 07:28:00 GMT")
+
+
+class HashFileTests(unittest.TestCase):
+    def test_hash_in_chunks(self):
+        data = b"x" * (3 * 1024 * 1024 + 1)
+        with tempfile_context() as path:
+            path.write_bytes(data)
+            self.assertEqual(hash_file(path), hashlib.sha256(data).hexdigest())
+
+
+class CreateStoredObjectDeduplicationTests(DbTestCase):
+    def test_share_file_with_same_contents(self):
+        workflow = Workflow.create_and_init()
+        step1 = workflow.tabs.first().steps.create(order=1, slug="step-1")
+        step2 = workflow.tabs.first().steps.create(order=2, slug="step-2")
+
+        with tempfile_context() as path:
+            path.write_bytes(b"abc")
+            so1 = create_stored_object(workflow.id, step1.id, path)
+            with patch.object(s3, "fput_file") as fput_file:
+                so2 = create_stored_object(workflow.id, step2.id, path)
+            fput_file.assert_not_called()
+
+        self.assertEqual(so1.key, so2.key)
+        self.assertTrue(so1.key.startswith("sha256/"))
+
+    def test_different_contents_different_files(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, slug="step-1")
+
+        with tempfile_context() as path:
+            path.write_bytes(b"abc")
+            so1 = create_stored_object(workflow.id, step.id, path)
+            path.write_bytes(b"def")
+            so2 = create_stored_object(workflow.id, step.id, path)
+
+        self.assertNotEqual(so1.key, so2.key)
+
+    @override_settings(STORED_OBJECTS_ZSTD_LEVEL=3)
+    def test_compress(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, slug="step-1")
+        data = b"compressible\n" * 10000
+
+        with tempfile_context() as path:
+            path.write_bytes(data)
+            stored_object = create_stored_object(workflow.id, step.id, path)
+
+        self.assertTrue(stored_object.key.endswith(".zst"))
+        self.assertEqual(stored_object.size, len(data))
+        self.assertLess(
+            s3.stat(s3.StoredObjectsBucket, stored_object.key).size, len(data)
+        )
+        with downloaded_file(stored_object) as path:
+            self.assertEqual(path.read_bytes(), data)
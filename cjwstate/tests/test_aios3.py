@@ -0,0 +1,113 @@
+import asyncio
+import unittest
+
+import botocore.exceptions
+
+from cjwkernel.util import tempfile_context
+from cjwstate import aios3, s3
+
+Bucket = s3.CachedRenderResultsBucket
+Key = "aios3/key"
+
+
+class Aios3Test(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        super().setUp()
+        s3.remove_recursive(Bucket, "aios3/")
+
+    def tearDown(self):
+        s3.remove_recursive(Bucket, "aios3/")
+        super().tearDown()
+
+    async def asyncTearDown(self):
+        await aios3.layer.close()
+        await super().asyncTearDown()
+
+    async def test_download(self):
+        s3.put_bytes(Bucket, Key, b"1234")
+        with tempfile_context() as path:
+            await aios3.download(Bucket, Key, path)
+            self.assertEqual(path.read_bytes(), b"1234")
+
+    async def test_download_file_not_found(self):
+        with tempfile_context() as path:
+            with self.assertRaises(FileNotFoundError):
+                await aios3.download(Bucket, Key, path)
+
+    async def test_download_zstd(self):
+        data = b"compressible\n" * 10000
+        with tempfile_context() as path:
+            path.write_bytes(data)
+            s3.fput_file_zstd(Bucket, Key, path, level=3)
+        with tempfile_context() as path:
+            await aios3.download_zstd(Bucket, Key, path)
+            self.assertEqual(path.read_bytes(), data)
+
+    async def test_get_range(self):
+        s3.put_bytes(Bucket, Key, b"0123456789")
+        self.assertEqual(await aios3.get_range(Bucket, Key, 2, 4), b"234")
+
+    async def test_fput_file(self):
+        with tempfile_context() as path:
+            path.write_bytes(b"x" * 3000000)  # several chunks
+            await aios3.fput_file(Bucket, Key, path)
+        self.assertEqual(s3.stat(Bucket, Key).size, 3000000)
+
+    async def test_stat_and_exists(self):
+        await aios3.put_bytes(Bucket, Key, b"1234")
+        self.assertEqual(await aios3.stat(Bucket, Key), s3.Stat(4))
+        self.assertTrue(await aios3.exists(Bucket, Key))
+        self.assertFalse(await aios3.exists(Bucket, "aios3/missing"))
+
+    async def test_key_with_special_characters(self):
+        key = "aios3/a b+c~é"
+        await aios3.put_bytes(Bucket, key, b"1234")
+        self.assertTrue(s3.exists(Bucket, key))
+
+    async def test_copy(self):
+        s3.put_bytes(Bucket, Key, b"1234")
+        await aios3.copy(Bucket, "aios3/copy", "%s/%s" % (Bucket, Key))
+        with s3.temporarily_download(Bucket, "aios3/copy") as path:
+            self.assertEqual(path.read_bytes(), b"1234")
+
+    async def test_copy_missing_source(self):
+        with self.assertRaises(botocore.exceptions.ClientError):
+            await aios3.copy(Bucket, "aios3/copy", "%s/aios3/missing" % Bucket)
+
+    async def test_remove(self):
+        s3.put_bytes(Bucket, Key, b"1234")
+        await aios3.remove(Bucket, Key)
+        self.assertFalse(s3.exists(Bucket, Key))
+        await aios3.remove(Bucket, Key)  # no error
+
+    async def test_iter_keys(self):
+        keys = ["aios3/%d" % i for i in range(5)]
+        for key in keys:
+            s3.put_bytes(Bucket, key, b"x")
+        s3.put_bytes(Bucket, "aios3/dir/x", b"x")
+        self.assertEqual(
+            [key async for key in aios3.iter_keys(Bucket, "aios3/", page_size=2)],
+            keys + ["aios3/dir/x"],
+        )
+        self.assertEqual(
+            [
+                key
+                async for key in aios3.iter_keys(
+                    Bucket, "aios3/", delimiter="/", page_size=2
+                )
+            ],
+            keys,
+        )
+
+
+class LayerTest(unittest.TestCase):
+    def test_close_client_when_event_loop_changes(self):
+        async def get_client():
+            return await aios3.layer.client()
+
+        client1 = asyncio.run(get_client())
+        client2 = asyncio.run(get_client())
+        self.assertIsNot(client2, client1)
+        self.assertTrue(client1._endpoint.http_session.closed)
+        asyncio.run(aios3.layer.close())
+        self.assertTrue(client2._endpoint.http_session.closed)
@@ -1,5 +1,9 @@
 import unittest
+from unittest.mock import patch
 
+from django.test.utils import override_settings
+
+from cjwkernel.util import tempfile_context
 from cjwstate import s3
 
 Bucket = s3.CachedRenderResultsBucket
@@ -32,3 +36,92 @@ class TemporarilyDownloadTest(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             with s3.temporarily_download(Bucket, Key) as _:
                 pass
+
+
+class ZstdTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        _clear()
+
+    def tearDown(self):
+        _clear()
+        super().tearDown()
+
+    def test_round_trip(self):
+        data = b"compressible\n" * 10000
+        with tempfile_context() as path:
+            path.write_bytes(data)
+            s3.fput_file_zstd(Bucket, Key, path, level=3)
+        self.assertLess(s3.stat(Bucket, Key).size, len(data))
+        with tempfile_context() as path:
+            s3.download_zstd(Bucket, Key, path)
+            self.assertEqual(path.read_bytes(), data)
+
+    def test_download_file_not_found(self):
+        with tempfile_context() as path:
+            with self.assertRaises(FileNotFoundError):
+                s3.download_zstd(Bucket, Key, path)
+
+
+class RemoveManyTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        s3.remove_recursive(Bucket, "remove-many/")
+
+    def tearDown(self):
+        s3.remove_recursive(Bucket, "remove-many/")
+        super().tearDown()
+
+    def _test_remove_many(self):
+        keys = ["remove-many/%d" % i for i in range(3)]
+        for key in keys:
+            s3.put_bytes(Bucket, key, b"x")
+        s3.put_bytes(Bucket, "remove-many/keep", b"x")
+        s3.remove_many(Bucket, keys + ["remove-many/already-deleted"])
+        self.assertEqual(
+            [key for key in keys + ["remove-many/keep"] if s3.exists(Bucket, key)],
+            ["remove-many/keep"],
+        )
+
+    def test_remove_one_per_request(self):
+        self._test_remove_many()
+
+    @override_settings(AWS_S3_SUPPORTS_DELETE_OBJECTS=True)
+    def test_remove_with_delete_objects(self):
+        self._test_remove_many()
+
+    def test_no_keys(self):
+        s3.remove_many(Bucket, [])  # no error
+
+
+class IterKeysTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        s3.remove_recursive(Bucket, "iter-keys/")
+
+    def tearDown(self):
+        s3.remove_recursive(Bucket, "iter-keys/")
+        super().tearDown()
+
+    def test_paginate(self):
+        keys = ["iter-keys/%d" % i for i in range(5)]
+        for key in keys:
+            s3.put_bytes(Bucket, key, b"x")
+        self.assertEqual(list(s3.iter_keys(Bucket, "iter-keys/", page_size=2)), keys)
+
+    def test_delimiter(self):
+        s3.put_bytes(Bucket, "iter-keys/a", b"x")
+        s3.put_bytes(Bucket, "iter-keys/b/c", b"x")
+        self.assertEqual(
+            list(s3.iter_keys(Bucket, "iter-keys/", delimiter="/")), ["iter-keys/a"]
+        )
+        self.assertEqual(
+            list(s3.iter_keys(Bucket, "iter-keys/")), ["iter-keys/a", "iter-keys/b/c"]
+        )
+
+    def test_remove_recursive_many_pages(self):
+        for i in range(5):
+            s3.put_bytes(Bucket, "iter-keys/%d" % i, b"x")
+        with patch.object(s3, "_MAX_KEYS_PER_DELETE_OBJECTS", 2):
+            s3.remove_recursive(Bucket, "iter-keys/")
+        self.assertEqual(list(s3.iter_keys(Bucket, "iter-keys/")), [])
@@ -1,8 +1,13 @@
+import asyncio
 import datetime
 import logging
-from typing import List, Tuple
+import random
+from typing import Dict, List, Optional, Tuple
 
-from cjworkbench.pg_render_locker import PgRenderLocker, WorkflowAlreadyLocked
+import django.db
+from django.conf import settings
+
+from cjworkbench.pg_render_locker import PgRenderLocker
 from cjworkbench.sync import database_sync_to_async
 from cjwstate import clientside, rabbitmq
 from cjwstate.models import Step
@@ -11,61 +16,118 @@ from cjwstate.models import Step
 logger = logging.getLogger(__name__)
 
 
+def step_jitter(step_id: int, update_interval: int) -> datetime.timedelta:
+    """Return how long after its `next_update` we should fetch a Step.
+
+    The delay is random-looking but fixed per Step, so Steps with the same
+    schedule fetch at different moments. It's at most a tenth of
+    `update_interval`; and `fetcher` schedules the following `next_update`
+    without it, so delays don't accumulate.
+    """
+    max_seconds = min(settings.AUTOUPDATE_MAX_JITTER, update_interval / 10)
+    return datetime.timedelta(seconds=random.Random(step_id).random() * max_seconds)
+
+
 @database_sync_to_async
-def load_pending_steps() -> List[Tuple[int, Step]]:
-    """Return list of (workflow_id, step_id) with pending fetches."""
+def load_pending_steps(max_n: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Return list of (workflow_id, step_id) with pending fetches.
+
+    Order by due time (`next_update` plus jitter), most overdue first. Return
+    at most `max_n` (if set).
+
+    Log a warning if more than `max_n` are due: that means the rate cap is
+    making steps fetch later than their `update_interval` says.
+    """
     now = datetime.datetime.now()
     # Step.workflow_id is a database operation
-    return list(
-        Step.objects.filter(
-            is_deleted=False,
-            tab__is_deleted=False,
-            is_busy=False,  # not already scheduled
-            auto_update_data=True,  # user wants auto-update
-            next_update__isnull=False,  # DB isn't inconsistent
-            next_update__lte=now,  # enough time has passed
-        ).values_list("tab__workflow_id", "id")
-    )
+    candidates = Step.objects.filter(
+        is_deleted=False,
+        tab__is_deleted=False,
+        is_busy=False,  # not already scheduled
+        auto_update_data=True,  # user wants auto-update
+        next_update__isnull=False,  # DB isn't inconsistent
+        next_update__lte=now,  # enough time has passed (ignoring jitter)
+    ).values_list("tab__workflow_id", "id", "next_update", "update_interval")
+
+    due = []
+    for workflow_id, step_id, next_update, update_interval in candidates:
+        due_at = next_update + step_jitter(step_id, update_interval)
+        if due_at <= now:
+            due.append((due_at, workflow_id, step_id))
+    due.sort()
+    if max_n is not None and len(due) > max_n:
+        logger.warning(
+            "Backlog: %d automatic fetches are due; queueing %d. Most overdue: %s",
+            len(due),
+            max_n,
+            now - due[0][0],
+        )
+    return [(workflow_id, step_id) for _, workflow_id, step_id in due[:max_n]]
 
 
 @database_sync_to_async
-def set_step_busy(step_id):
+def set_steps_busy(step_ids: List[int]) -> None:
     # Database writes can't be on the event-loop thread
-    Step.objects.filter(id=step_id).update(is_busy=True)
+    with django.db.connections["default"].cursor() as cursor:
+        cursor.execute("UPDATE step SET is_busy = TRUE WHERE id = ANY(%s)", [step_ids])
 
 
-async def queue_fetches(pg_render_locker: PgRenderLocker):
-    """Queue all pending fetches in RabbitMQ.
+async def queue_fetches(
+    pg_render_locker: PgRenderLocker, max_fetches: Optional[int] = None
+) -> None:
+    """Queue pending fetches in RabbitMQ -- at most `max_fetches` (if set).
 
     We'll set is_busy=True as we queue them, so we don't send double-fetches.
+    Steps we don't queue stay pending, for the next call.
     """
-    pending_ids = await load_pending_steps()
+    pending_ids = await load_pending_steps(max_fetches)
+    if not pending_ids:
+        return
 
+    # Don't schedule a fetch if we're currently rendering.
+    #
+    # This still lets us schedule a fetch if a render is _queued_, so it
+    # doesn't solve any races. But it should lower the number of fetches of
+    # resource-intensive workflows.
+    #
+    # Skipping rendering workflows means we only queue fetches _between_
+    # renders. The fetch/render queues may be non-empty (we aren't checking);
+    # but we're giving the renderers a chance to tackle some backlog. We'll
+    # revisit skipped Steps next time we query for pending fetches.
+    rendering_workflow_ids = await pg_render_locker.find_rendering_workflow_ids(
+        workflow_id for workflow_id, _ in pending_ids
+    )
+    step_ids_by_workflow: Dict[int, List[int]] = {}
     for workflow_id, step_id in pending_ids:
-        # Don't schedule a fetch if we're currently rendering.
-        #
-        # This still lets us schedule a fetch if a render is _queued_, so it
-        # doesn't solve any races. But it should lower the number of fetches of
-        # resource-intensive workflows.
-        #
-        # Using pg_render_locker means we can only queue a fetch _between_
-        # renders. The fetch/render queues may be non-empty (we aren't
-        # checking); but we're giving the renderers a chance to tackle some
-        # backlog.
-        try:
-            async with pg_render_locker.render_lock(workflow_id) as lock:
-                # At this moment, the workflow isn't rendering. Let's pass
-                # through and queue the fetch.
-                await lock.stall_others()  # required by the PgRenderLocker API
+        if workflow_id not in rendering_workflow_ids:
+            step_ids_by_workflow.setdefault(workflow_id, []).append(step_id)
+    if not step_ids_by_workflow:
+        return
 
+    for workflow_id, step_ids in step_ids_by_workflow.items():
+        for step_id in step_ids:
             logger.info("Queue fetch of step(%d, %d)", workflow_id, step_id)
-            await set_step_busy(step_id)
-            await rabbitmq.send_update_to_workflow_clients(
+    await set_steps_busy(
+        [step_id for step_ids in step_ids_by_workflow.values() for step_id in step_ids]
+    )
+
+    # Pipeline publishes: send them all, then wait for RabbitMQ's confirms.
+    await asyncio.gather(
+        *(
+            rabbitmq.send_update_to_workflow_clients(
                 workflow_id,
-                clientside.Update(steps={step_id: clientside.StepUpdate(is_busy=True)}),
+                clientside.Update(
+                    steps={
+                        step_id: clientside.StepUpdate(is_busy=True)
+                        for step_id in step_ids
+                    }
+                ),
             )
-            await rabbitmq.queue_fetch(workflow_id, step_id)
-        except WorkflowAlreadyLocked:
-            # Don't queue a fetch. We'll revisit this Step next time we
-            # query for pending fetches.
-            pass
+            for workflow_id, step_ids in step_ids_by_workflow.items()
+        ),
+        *(
+            rabbitmq.queue_fetch(workflow_id, step_id)
+            for workflow_id, step_ids in step_ids_by_workflow.items()
+            for step_id in step_ids
+        ),
+    )
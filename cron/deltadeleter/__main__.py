@@ -15,6 +15,7 @@ logger = logging.getLogger(__name__)
 MaxNWorkflowsPerCycle = 5000  # SQL LIMIT to avoid too-big query results
 Interval = 300  # seconds
 MaxAge = datetime.timedelta(days=30)
+MaxNPendingFilesPerBatch = 1000  # keys per delete_pending_files() call
 
 
 def delete_workflow_stale_deltas(
@@ -150,10 +151,30 @@ def delete_stale_deltas(now: datetime.datetime) -> None:
                 )
 
 
+def delete_pending_stored_object_files() -> None:
+    """Delete StoredObject files that fetchers failed to delete.
+
+    Rationale: a fetcher deletes old fetches' rows, then their files. If it
+    crashes in between (or S3 is down), the files' keys stay in
+    `pending_stored_object_deletion`; nothing else would delete them.
+    """
+    # import _after_ django.setup() initializes apps
+    from cjwstate import storedobjects
+
+    with benchmark_sync(logger, "Deleting pending stored-object files"):
+        try:
+            while storedobjects.delete_pending_files(limit=MaxNPendingFilesPerBatch):
+                pass
+        except Exception:
+            # e.g., S3 is down. Don't stop deleting deltas; retry next cycle.
+            logger.exception("Failed to delete pending stored-object files")
+
+
 if __name__ == "__main__":
     django.setup()
 
     while True:
         django.db.close_old_connections()
         delete_stale_deltas(datetime.datetime.now())
+        delete_pending_stored_object_files()
         time.sleep(Interval)
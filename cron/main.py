@@ -3,6 +3,8 @@ import logging
 import math
 import time
 
+from django.conf import settings
+
 from cjworkbench.pg_render_locker import PgRenderLocker
 from cjworkbench.util import benchmark
 
@@ -10,7 +12,13 @@ from cjworkbench.util import benchmark
 logger = logging.getLogger(__name__)
 
 
-FetchInterval = 60  # seconds
+FetchInterval = 5  # seconds
+"""Time between queue_fetches() calls.
+
+Short, so we queue each minute's fetches in small batches rather than all at
+once. (Each Step's jitter spreads them; AUTOUPDATE_MAX_FETCHES_PER_SECOND caps
+each batch.)
+"""
 
 
 async def main():
@@ -29,11 +37,15 @@ async def main():
         while not rabbitmq_connection.closed.done():
             t1 = time.time()
 
-            await benchmark(logger, queue_fetches(pg_render_locker), "queue_fetches()")
-
-            # Try to fetch at the beginning of each interval. Canonical example
-            # is FetchInterval=60: queue all our fetches as soon as the minute
-            # hand of the clock moves.
+            max_fetches = math.ceil(
+                settings.AUTOUPDATE_MAX_FETCHES_PER_SECOND * FetchInterval
+            )
+            await benchmark(
+                logger,
+                queue_fetches(pg_render_locker, max_fetches),
+                "queue_fetches(max_fetches=%d)",
+                max_fetches,
+            )
 
             next_t = (math.floor(t1 / FetchInterval) + 1) * FetchInterval
             delay = max(0, next_t - time.time())
@@ -1,3 +1,4 @@
+from cjworkbench.settings.autoupdate import *
 from cjworkbench.settings.database import *
 from cjworkbench.settings.logging import *
 from cjworkbench.settings.rabbitmq import *
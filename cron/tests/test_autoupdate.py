@@ -1,12 +1,14 @@
 import asyncio
+import datetime
 import logging
-from contextlib import asynccontextmanager
+import unittest
 from unittest.mock import patch
 
 from freezegun import freeze_time
 from dateutil import parser
+from django.test.utils import override_settings
 
-from cjwstate import rabbitmq
+from cjwstate import clientside, rabbitmq
 from cjwstate.models import Workflow
 from cjwstate.tests.utils import DbTestCase
 from cron import autoupdate
@@ -16,22 +18,14 @@ future_none = asyncio.Future()
 future_none.set_result(None)
 
 
-class _RenderLock:
-    def __init__(self):
-        self.stalled = False
+class IdleRenderLocker:
+    async def find_rendering_workflow_ids(self, workflow_ids):
+        return set()
 
-    async def stall_others(self):
-        self.stalled = True
 
-
-class SuccessfulRenderLock:
-    @asynccontextmanager
-    async def render_lock(self, workflow_id: int):
-        lock = _RenderLock()
-        try:
-            yield lock
-        finally:
-            assert lock.stalled
+class BusyRenderLocker:
+    async def find_rendering_workflow_ids(self, workflow_ids):
+        return set(workflow_ids)
 
 
 class UpdatesTests(DbTestCase):
@@ -71,7 +65,7 @@ class UpdatesTests(DbTestCase):
         with freeze_time("1999-08-28T14:35"):
             # eat log messages
             with self.assertLogs(autoupdate.__name__, logging.INFO):
-                self.run_with_async_db(autoupdate.queue_fetches(SuccessfulRenderLock()))
+                self.run_with_async_db(autoupdate.queue_fetches(IdleRenderLocker()))
 
         self.assertEqual(mock_queue_fetch.call_count, 1)
         mock_queue_fetch.assert_called_with(workflow.id, step2.id)
@@ -81,6 +75,144 @@ class UpdatesTests(DbTestCase):
 
         # Second call shouldn't fetch again, because it's busy
         with freeze_time("1999-08-28T14:36"):
-            self.run_with_async_db(autoupdate.queue_fetches(SuccessfulRenderLock()))
+            self.run_with_async_db(autoupdate.queue_fetches(IdleRenderLocker()))
 
         self.assertEqual(mock_queue_fetch.call_count, 1)
+
+    @patch.object(rabbitmq, "queue_fetch")
+    @patch.object(
+        rabbitmq, "send_update_to_workflow_clients", lambda _1, _2: future_none
+    )
+    def test_queue_fetches_most_overdue_first(self, mock_queue_fetch):
+        workflow = Workflow.objects.create()
+        tab = workflow.tabs.create(position=0)
+        step1 = tab.steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            next_update=parser.parse("1999-08-28T14:30"),
+            update_interval=600,
+        )
+        step2 = tab.steps.create(
+            order=1,
+            slug="step-2",
+            auto_update_data=True,
+            next_update=parser.parse("1999-08-28T14:20"),
+            update_interval=600,
+        )
+        mock_queue_fetch.return_value = future_none
+
+        with freeze_time("1999-08-28T14:35"):
+            with self.assertLogs(autoupdate.__name__, logging.INFO) as cm:
+                self.run_with_async_db(autoupdate.queue_fetches(IdleRenderLocker(), 1))
+        mock_queue_fetch.assert_called_once_with(workflow.id, step2.id)
+        self.assertIn(
+            "WARNING:cron.autoupdate:Backlog: 2 automatic fetches are due; queueing 1",
+            cm.output[0],
+        )
+
+        step1.refresh_from_db()
+        self.assertFalse(step1.is_busy)  # we'll queue it next time
+
+    @patch.object(rabbitmq, "queue_fetch")
+    def test_queue_fetches_wait_for_jitter(self, mock_queue_fetch):
+        workflow = Workflow.objects.create()
+        tab = workflow.tabs.create(position=0)
+        step = tab.steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            next_update=parser.parse("1999-08-28T14:34"),
+            update_interval=600,
+        )
+        jitter = autoupdate.step_jitter(step.id, 600)
+
+        with freeze_time(parser.parse("1999-08-28T14:34") + jitter / 2):
+            self.run_with_async_db(autoupdate.queue_fetches(IdleRenderLocker()))
+        mock_queue_fetch.assert_not_called()
+
+    @patch.object(rabbitmq, "queue_fetch")
+    def test_queue_fetches_skip_rendering_workflow(self, mock_queue_fetch):
+        workflow = Workflow.objects.create()
+        tab = workflow.tabs.create(position=0)
+        step = tab.steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            next_update=parser.parse("1999-08-28T14:00"),
+            update_interval=600,
+        )
+
+        with freeze_time("1999-08-28T14:35"):
+            self.run_with_async_db(autoupdate.queue_fetches(BusyRenderLocker()))
+        mock_queue_fetch.assert_not_called()
+        step.refresh_from_db()
+        self.assertFalse(step.is_busy)  # we'll queue it next time
+
+    @patch.object(rabbitmq, "queue_fetch")
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_queue_fetches_one_update_per_workflow(
+        self, mock_send_update, mock_queue_fetch
+    ):
+        workflow = Workflow.objects.create()
+        tab = workflow.tabs.create(position=0)
+        step1 = tab.steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            next_update=parser.parse("1999-08-28T14:00"),
+            update_interval=600,
+        )
+        step2 = tab.steps.create(
+            order=1,
+            slug="step-2",
+            auto_update_data=True,
+            next_update=parser.parse("1999-08-28T14:00"),
+            update_interval=600,
+        )
+        mock_queue_fetch.return_value = future_none
+        mock_send_update.return_value = future_none
+
+        with freeze_time("1999-08-28T14:35"):
+            with self.assertLogs(autoupdate.__name__, logging.INFO):
+                self.run_with_async_db(autoupdate.queue_fetches(IdleRenderLocker()))
+
+        self.assertEqual(mock_queue_fetch.call_count, 2)
+        mock_send_update.assert_called_once_with(
+            workflow.id,
+            clientside.Update(
+                steps={
+                    step1.id: clientside.StepUpdate(is_busy=True),
+                    step2.id: clientside.StepUpdate(is_busy=True),
+                }
+            ),
+        )
+        step1.refresh_from_db()
+        self.assertTrue(step1.is_busy)
+        step2.refresh_from_db()
+        self.assertTrue(step2.is_busy)
+
+
+class StepJitterTests(unittest.TestCase):
+    def test_deterministic(self):
+        self.assertEqual(
+            autoupdate.step_jitter(123, 600), autoupdate.step_jitter(123, 600)
+        )
+
+    def test_vary_by_step(self):
+        self.assertNotEqual(
+            autoupdate.step_jitter(123, 600), autoupdate.step_jitter(124, 600)
+        )
+
+    def test_at_most_tenth_of_update_interval(self):
+        for step_id in range(100):
+            self.assertLess(
+                autoupdate.step_jitter(step_id, 300), datetime.timedelta(seconds=30)
+            )
+
+    @override_settings(AUTOUPDATE_MAX_JITTER=5)
+    def test_at_most_max_jitter(self):
+        for step_id in range(100):
+            self.assertLess(
+                autoupdate.step_jitter(step_id, 86400), datetime.timedelta(seconds=5)
+            )
@@ -0,0 +1,99 @@
+"""Limits on how many fetches run at once.
+
+A fetch spends most of its time waiting for a remote server, so one fetcher
+process runs several. Each running fetch needs a chroot of its own; and we
+don't want to flood any single server with requests.
+"""
+import asyncio
+import contextlib
+import urllib.parse
+from typing import Any, AsyncContextManager, Dict, Iterable
+
+from cjwkernel.chroot import Chroot, ChrootContext
+
+
+class ChrootPool:
+    """Editable chroots that fetches can borrow, one fetch at a time.
+
+    Create this within a running event loop.
+    """
+
+    def __init__(self, chroots: Iterable[Chroot]):
+        self._queue = asyncio.Queue()
+        for chroot in chroots:
+            self._queue.put_nowait(chroot)
+
+    @contextlib.asynccontextmanager
+    async def acquire_context(self) -> AsyncContextManager[ChrootContext]:
+        """Wait for a free chroot; yield its (cleared) context.
+
+        The chroot returns to the pool after its context exits -- that is,
+        after it has been wiped.
+        """
+        chroot = await self._queue.get()
+        try:
+            # Entering and exiting wipe the previous module's files, which
+            # may be huge. Do that in a thread, so other fetches keep going.
+            loop = asyncio.get_event_loop()
+            chroot_context = chroot.acquire_context()
+            await loop.run_in_executor(None, chroot_context.__enter__)
+            try:
+                yield chroot_context
+            finally:
+                await loop.run_in_executor(
+                    None, chroot_context.__exit__, None, None, None
+                )
+        finally:
+            self._queue.put_nowait(chroot)
+
+
+class UpstreamLimiter:
+    """Cap the number of concurrent fetches to each upstream server.
+
+    Create this within a running event loop.
+    """
+
+    def __init__(self, max_concurrent_per_upstream: int):
+        self.max_concurrent_per_upstream = max_concurrent_per_upstream
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._n_users: Dict[str, int] = {}  # so we can forget idle upstreams
+
+    @contextlib.asynccontextmanager
+    async def limit(self, upstream: str) -> AsyncContextManager[None]:
+        """Wait until fewer than the maximum fetches are using `upstream`."""
+        if upstream not in self._semaphores:
+            self._semaphores[upstream] = asyncio.Semaphore(
+                self.max_concurrent_per_upstream
+            )
+            self._n_users[upstream] = 0
+        semaphore = self._semaphores[upstream]
+        self._n_users[upstream] += 1
+        try:
+            async with semaphore:
+                yield
+        finally:
+            self._n_users[upstream] -= 1
+            if self._n_users[upstream] == 0:
+                del self._n_users[upstream]
+                del self._semaphores[upstream]
+
+
+def guess_upstream(module_id_name: str, params: Any) -> str:
+    """Guess which server a fetch will contact.
+
+    Most fetching modules have a "url" param. Others (e.g., Twitter, Google
+    Sheets) always contact the same server; for those, the module ID is a fine
+    stand-in for the hostname.
+
+    `params` may be anything (e.g., a ModuleError, if migrate_params() failed).
+    """
+    if isinstance(params, dict):
+        url = params.get("url")
+        if isinstance(url, str):
+            try:
+                hostname = urllib.parse.urlsplit(url.strip()).hostname
+            except ValueError:
+                hostname = None  # invalid URL: the module will report an error
+            if hostname:
+                return hostname
+    return module_id_name
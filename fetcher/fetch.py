@@ -1,10 +1,21 @@
 import asyncio
 import contextlib
 import datetime
+import json
 import logging
 import time
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple, Optional, Union
+from typing import (
+    Any,
+    AsyncContextManager,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Union,
+)
 
 from django.conf import settings
 
@@ -13,14 +24,23 @@ import fetcher.secrets
 from cjwkernel.chroot import EDITABLE_CHROOT, ChrootContext
 from cjwkernel.errors import ModuleError, format_for_user_debugging
 from cjwkernel.i18n import trans
-from cjwkernel.types import FetchError, FetchResult, TableMetadata
+from cjwkernel.util import tempdir_context, tempfile_context
+from cjwkernel.types import (
+    ConditionalFetchResult,
+    FetchError,
+    FetchResult,
+    FetchValidators,
+    TableMetadata,
+)
 from cjworkbench.sync import database_sync_to_async
 from cjwstate.models import CachedRenderResult, StoredObject, Step, Workflow
 from cjwstate.models.module_registry import MODULE_REGISTRY
 from cjwstate.modules.types import ModuleZipfile
-from cjwstate import rendercache, storedobjects
+from cjwstate import clientside, rabbitmq, rendercache, storedobjects
 
 from . import fetchprep, save, versions
+from .concurrency import ChrootPool, UpstreamLimiter, guess_upstream
+from .sharing import SharedFetches
 
 
 logger = logging.getLogger(__name__)
@@ -34,11 +54,15 @@ def invoke_fetch(
     params: Dict[str, Any],
     secrets: Dict[str, Any],
     last_fetch_result: Optional[FetchResult],
+    last_fetch_validators: Optional[FetchValidators],
     input_parquet_filename: Optional[str],
     output_filename: str,
-) -> FetchResult:
+) -> ConditionalFetchResult:
     """Use kernel to invoke module `fetch(...)` method and build a `FetchResult`.
 
+    The return value's `.result` is `None` if the module said nothing changed
+    since `last_fetch_result`.
+
     Raise `ModuleError` on error. (This is usually the module author's fault.)
 
     Log any ModuleError. Also log success.
@@ -62,8 +86,12 @@ def invoke_fetch(
             last_fetch_result=last_fetch_result,
             input_parquet_filename=input_parquet_filename,
             output_filename=output_filename,
+            last_fetch_validators=last_fetch_validators,
         )
-        status = "%0.1fMB" % (ret.path.stat().st_size / 1024 / 1024)
+        if ret.result is None:
+            status = "not modified"
+        else:
+            status = "%0.1fMB" % (ret.result.path.stat().st_size / 1024 / 1024)
         return ret
     except ModuleError as err:
         logger.exception("Exception in %s:fetch", module_zipfile.path.name)
@@ -145,30 +173,76 @@ def load_database_objects(workflow_id: int, step_id: int) -> DatabaseObjects:
         )
 
 
+def auto_update_delay(update_interval: int, n_consecutive_fetch_errors: int) -> int:
+    """Return the number of seconds between automatic fetches of a step.
+
+    Each consecutive failed fetch doubles the delay, up to
+    `settings.AUTOUPDATE_MAX_ERROR_BACKOFF`. The delay is never shorter than
+    `update_interval`.
+    """
+    interval = max(update_interval, settings.MIN_AUTOFETCH_INTERVAL)
+    # min(..., 32): don't compute giant integers for steps that never work
+    backoff = interval * 2 ** min(n_consecutive_fetch_errors, 32)
+    return max(interval, min(backoff, settings.AUTOUPDATE_MAX_ERROR_BACKOFF))
+
+
 @database_sync_to_async
-def update_next_update_time(workflow_id, step, now):
-    """Schedule next update, skipping missed updates if any."""
+def _do_update_next_update_time(workflow_id, step, now, failed) -> bool:
+    """Schedule next update and count errors; return True if the count changed.
 
-    tick = datetime.timedelta(
-        seconds=max(step.update_interval, settings.MIN_AUTOFETCH_INTERVAL)
-    )
+    Raise Workflow.DoesNotExist or Step.DoesNotExist in the event of a race.
+    """
+    with Workflow.lookup_and_cooperative_lock(id=workflow_id):
+        step.refresh_from_db()
+        old_n_errors = step.n_consecutive_fetch_errors
+        n_errors = old_n_errors + 1 if failed else 0
 
+        tick = datetime.timedelta(
+            seconds=auto_update_delay(step.update_interval, n_errors)
+        )
+        next_update = step.next_update
+        if next_update:
+            while next_update <= now:
+                next_update += tick
+
+        step.last_update_check = now
+        step.next_update = next_update
+        step.n_consecutive_fetch_errors = n_errors
+        Step.objects.filter(id=step.id).update(
+            last_update_check=now,
+            next_update=next_update,
+            n_consecutive_fetch_errors=n_errors,
+        )
+        return n_errors != old_n_errors
+
+
+async def update_next_update_time(workflow_id, step, now, *, failed=False):
+    """Schedule next update, skipping missed updates if any.
+
+    If `failed`, back off: see `auto_update_delay()`. Tell clients when the
+    number of consecutive errors changes.
+    """
     try:
-        with Workflow.lookup_and_cooperative_lock(id=workflow_id):
-            step.refresh_from_db()
-            next_update = step.next_update
-            if next_update:
-                while next_update <= now:
-                    next_update += tick
-
-            Step.objects.filter(id=step.id).update(
-                last_update_check=now, next_update=next_update
-            )
+        is_n_errors_changed = await _do_update_next_update_time(
+            workflow_id, step, now, failed
+        )
     except (Step.DoesNotExist, Workflow.DoesNotExist):
         # [2019-05-27] `step.workflow` throws `Workflow.DoesNotExist` if
         # the Step is deleted. This handler is for deleted-Workflow _and_
         # deleted-Step.
-        pass
+        return
+
+    if is_n_errors_changed:
+        await rabbitmq.send_update_to_workflow_clients(
+            workflow_id,
+            clientside.Update(
+                steps={
+                    step.id: clientside.StepUpdate(
+                        n_consecutive_fetch_errors=step.n_consecutive_fetch_errors
+                    )
+                }
+            ),
+        )
 
 
 def user_visible_bug_fetch_result(output_path: Path, message: str) -> FetchResult:
@@ -212,7 +286,7 @@ def _download_cached_render_result(
             return DownloadedCachedRenderResult(None, TableMetadata())
 
 
-def _stored_object_to_fetch_result(
+async def _stored_object_to_fetch_result(
     exit_stack: contextlib.ExitStack,
     stored_object: Optional[StoredObject],
     step_fetch_errors: List[FetchError],
@@ -220,18 +294,79 @@ def _stored_object_to_fetch_result(
 ) -> Optional[FetchResult]:
     """Given a StoredObject (or None), return a FetchResult (or None).
 
+    Download without blocking the event loop.
+
     This cannot error. Any errors lead to a `None` return value.
     """
     if stored_object is None:
         return None
+
+    with contextlib.ExitStack() as inner_stack:
+        last_fetch_path = inner_stack.enter_context(
+            tempfile_context(prefix="s3-download-", dir=dir)
+        )
+        # Some stored objects with size=0 do not have key. These are valid:
+        # they represent empty files.
+        if stored_object.size > 0:
+            try:
+                await storedobjects.download_async(stored_object, last_fetch_path)
+            except FileNotFoundError:
+                return None
+        # Transfer ownership of `last_fetch_path` to exit_stack
+        exit_stack.callback(inner_stack.pop_all().close)
+    return FetchResult(last_fetch_path, step_fetch_errors)
+
+
+def _stored_object_to_fetch_validators(
+    stored_object: StoredObject,
+) -> FetchValidators:
+    return FetchValidators(
+        etag=stored_object.etag,
+        last_modified=stored_object.last_modified,
+        content_sha256=(
+            stored_object.hash if versions.is_sha256(stored_object.hash) else None
+        ),
+    )
+
+
+def _shared_fetch_key(
+    step: Step,
+    module_zipfile: Optional[ModuleZipfile],
+    migrated_params: Union[Dict[str, Any], ModuleError],
+    stored_object: Optional[StoredObject],
+    input_crr: Optional[CachedRenderResult],
+) -> Optional[Hashable]:
+    """Identify what `step`'s fetch will do, so identical fetches can share.
+
+    Fetches with equal keys call the same module version with the same params
+    and the same previous result, so they'll produce the same output. Return
+    None if the fetch depends on something we can't compare cheaply: secrets,
+    an input table, or a previous result we can't identify by hash.
+    """
+    if (
+        module_zipfile is None
+        or not isinstance(migrated_params, dict)
+        or step.secrets
+        or step.fetch_errors
+        or input_crr is not None
+    ):
+        return None
+    if stored_object is None:
+        last_fetch = None
+    elif versions.is_sha256(stored_object.hash):
+        last_fetch = (
+            stored_object.hash,
+            stored_object.etag,
+            stored_object.last_modified,
+        )
     else:
-        try:
-            last_fetch_path = exit_stack.enter_context(
-                storedobjects.downloaded_file(stored_object, dir=dir)
-            )
-            return FetchResult(last_fetch_path, step_fetch_errors)
-        except FileNotFoundError:
-            return None
+        return None  # legacy StoredObject: we don't know its contents' hash
+    return (
+        module_zipfile.module_id,
+        module_zipfile.version,
+        json.dumps(migrated_params, sort_keys=True),
+        last_fetch,
+    )
 
 
 def fetch_or_wrap_error(
@@ -243,13 +378,17 @@ def fetch_or_wrap_error(
     migrated_params_or_error: Union[Dict[str, Any], ModuleError],
     secrets: Dict[str, Any],
     last_fetch_result: Optional[FetchResult],
+    last_fetch_validators: Optional[FetchValidators],
     maybe_input_crr: Optional[CachedRenderResult],
     output_path: Path,
-):
+) -> ConditionalFetchResult:
     """Fetch, and do not raise any exceptions worth catching.
 
     Exceptions are wrapped -- the result is a FetchResult with `.errors`.
 
+    The FetchResult is wrapped in a ConditionalFetchResult. Its `.result` is
+    `None` if the module said `last_fetch_result` is still current.
+
     This function is slow indeed. Perhaps call it from
     EventLoop.run_in_executor(). (Why not make it async? Because all the logic
     inside -- compile module, fetch() -- is sandboxed, meaning it gets its own
@@ -267,16 +406,18 @@ def fetch_or_wrap_error(
     # module_zipfile=None is allowed
     if module_zipfile is None:
         logger.info("fetch() deleted module '%s'", module_id_name)
-        return FetchResult(
-            output_path,
-            [
-                FetchError(
-                    trans(
-                        "py.fetcher.fetch.no_loaded_module",
-                        default="Cannot fetch: module was deleted",
+        return ConditionalFetchResult(
+            FetchResult(
+                output_path,
+                [
+                    FetchError(
+                        trans(
+                            "py.fetcher.fetch.no_loaded_module",
+                            default="Cannot fetch: module was deleted",
+                        )
                     )
-                )
-            ],
+                ],
+            )
         )
     module_spec = module_zipfile.get_spec()
     param_schema = module_spec.param_schema
@@ -290,8 +431,10 @@ def fetch_or_wrap_error(
             logger.exception(
                 "%s:migrate_params() raised error", module_zipfile.path.name
             )
-        return user_visible_bug_fetch_result(
-            output_path, format_for_user_debugging(migrated_params_or_error)
+        return ConditionalFetchResult(
+            user_visible_bug_fetch_result(
+                output_path, format_for_user_debugging(migrated_params_or_error)
+            )
         )
     migrated_params = migrated_params_or_error
 
@@ -301,9 +444,11 @@ def fetch_or_wrap_error(
         logger.exception(
             "Invalid return value from %s:migrate_params()", module_zipfile.path.name
         )
-        return user_visible_bug_fetch_result(
-            output_path,
-            "%s:migrate_params() output invalid params" % module_zipfile.path.name,
+        return ConditionalFetchResult(
+            user_visible_bug_fetch_result(
+                output_path,
+                "%s:migrate_params() output invalid params" % module_zipfile.path.name,
+            )
         )
 
     # get input_metadata, input_parquet_path. (This can't error.)
@@ -323,6 +468,7 @@ def fetch_or_wrap_error(
             params=params,
             secrets=secrets,
             last_fetch_result=last_fetch_result,
+            last_fetch_validators=last_fetch_validators,
             input_parquet_filename=(
                 None if input_parquet_path is None else input_parquet_path.name
             ),
@@ -330,13 +476,33 @@ def fetch_or_wrap_error(
         )
     except ModuleError as err:
         logger.exception("Error calling %s:fetch()", module_zipfile.path.name)
-        return user_visible_bug_fetch_result(
-            output_path, format_for_user_debugging(err)
+        return ConditionalFetchResult(
+            user_visible_bug_fetch_result(output_path, format_for_user_debugging(err))
         )
 
 
+@contextlib.asynccontextmanager
+async def _exit_stack_in_executor() -> AsyncContextManager[contextlib.ExitStack]:
+    """Yield an ExitStack; close it in a thread.
+
+    Closing deletes tempfiles, which may be huge. Don't block the event loop
+    (and every other concurrent fetch) while that happens.
+    """
+    exit_stack = contextlib.ExitStack()
+    try:
+        yield exit_stack
+    finally:
+        await asyncio.get_event_loop().run_in_executor(None, exit_stack.close)
+
+
 async def fetch(
-    *, workflow_id: int, step_id: int, now: Optional[datetime.datetime] = None
+    *,
+    workflow_id: int,
+    step_id: int,
+    now: Optional[datetime.datetime] = None,
+    chroot_pool: Optional[ChrootPool] = None,
+    upstream_limiter: Optional[UpstreamLimiter] = None,
+    shared_fetches: Optional[SharedFetches] = None,
 ) -> None:
     # 1. Load database objects
     #    - missing Step? Return prematurely
@@ -344,14 +510,17 @@ async def fetch(
     #    - module_zipfile missing/invalid? user-visible error
     #    - migrate_params() fails? user-visible error
     # 2. Calculate result
-    #    2a. Build fetch kwargs
-    #    2b. Call fetch (no errors possible -- LoadedModule catches them)
+    #    2a. Reuse an identical step's result, if there is one (and skip 2b-2d)
+    #    2b. Wait for upstream limit and a free chroot
+    #    2c. Build fetch kwargs
+    #    2d. Call fetch (no errors possible -- LoadedModule catches them)
     # 3. Save result (and create SetStepDataVersion => queueing a render)
     #    - database errors? Raise
     #    - rabbitmq errors? Raise
     #    - other error (bug in `save`)? Raise
-    # 4. Update Step last-fetch time
+    # 4. Update Step last-fetch time and error count (for backoff)
     #    - database errors? Raise
+    #    - rabbitmq errors? Raise
     logger.info("begin fetch(workflow_id=%d, step_id=%d)", workflow_id, step_id)
 
     try:
@@ -382,42 +551,135 @@ async def fetch(
     if now is None:
         now = datetime.datetime.now()
 
-    with contextlib.ExitStack() as exit_stack:
-        chroot_context = exit_stack.enter_context(EDITABLE_CHROOT.acquire_context())
-        basedir = exit_stack.enter_context(
-            chroot_context.tempdir_context(prefix="fetch-")
-        )
-        output_path = exit_stack.enter_context(
-            chroot_context.tempfile_context(prefix="fetch-result-", dir=basedir)
-        )
-        # get last_fetch_result (This can't error.)
-        last_fetch_result = _stored_object_to_fetch_result(
-            exit_stack, stored_object, step.fetch_errors, dir=basedir
-        )
-        result = await asyncio.get_event_loop().run_in_executor(
-            None,
-            fetch_or_wrap_error,
-            exit_stack,
-            chroot_context,
-            basedir,
-            step.module_id_name,
-            module_zipfile,
-            migrated_params,
-            secrets,
-            last_fetch_result,
-            input_crr,
-            output_path,
+    if chroot_pool is None:
+        chroot_pool = ChrootPool([EDITABLE_CHROOT])
+
+    if shared_fetches is None:
+        shared_fetch_key = None
+    else:
+        shared_fetch_key = _shared_fetch_key(
+            step, module_zipfile, migrated_params, stored_object, input_crr
         )
 
-        if last_fetch_result is not None and versions.are_fetch_results_equal(
-            last_fetch_result, result
-        ):
-            await save.mark_result_unchanged(workflow_id, step, now)
+    async with contextlib.AsyncExitStack() as async_exit_stack:
+        if shared_fetch_key is None:
+            shared_fetch = None
+            shared_result = None
         else:
-            await save.create_result(workflow_id, step, result, now)
+            shared_fetch = await async_exit_stack.enter_async_context(
+                shared_fetches.join(shared_fetch_key)
+            )
+            shared_result = shared_fetch.result
+
+        async with _exit_stack_in_executor() as exit_stack:
+            if shared_result is None:
+                if upstream_limiter is not None:
+                    await async_exit_stack.enter_async_context(
+                        upstream_limiter.limit(
+                            guess_upstream(step.module_id_name, migrated_params)
+                        )
+                    )
+                chroot_context = await async_exit_stack.enter_async_context(
+                    chroot_pool.acquire_context()
+                )
+                basedir = exit_stack.enter_context(
+                    chroot_context.tempdir_context(prefix="fetch-")
+                )
+            else:
+                # Another step fetched this already. We won't run the module,
+                # so we don't need a chroot.
+                basedir = exit_stack.enter_context(tempdir_context(prefix="fetch-"))
+
+            # get last_fetch_result (This can't error.)
+            last_fetch_result = await _stored_object_to_fetch_result(
+                exit_stack, stored_object, step.fetch_errors, dir=basedir
+            )
 
-    await update_next_update_time(workflow_id, step, now)
+            if shared_result is None:
+                output_path = exit_stack.enter_context(
+                    chroot_context.tempfile_context(prefix="fetch-result-", dir=basedir)
+                )
+                if last_fetch_result is None:
+                    last_fetch_validators = None
+                else:
+                    last_fetch_validators = _stored_object_to_fetch_validators(
+                        stored_object
+                    )
+                result, validators = await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    fetch_or_wrap_error,
+                    exit_stack,
+                    chroot_context,
+                    basedir,
+                    step.module_id_name,
+                    module_zipfile,
+                    migrated_params,
+                    secrets,
+                    last_fetch_result,
+                    last_fetch_validators,
+                    input_crr,
+                    output_path,
+                )
+                if result is None:
+                    result_hash = None
+                else:
+                    result_hash = await asyncio.get_event_loop().run_in_executor(
+                        None, storedobjects.hash_file, result.path
+                    )
+                if shared_fetch is not None:
+                    await shared_fetch.publish(
+                        ConditionalFetchResult(result, validators), result_hash
+                    )
+            else:
+                (result, validators), result_hash = shared_result
+
+            # A fetch "failed" if it produced errors and no data. (A "not
+            # modified" result is a success.)
+            failed = (
+                result is not None
+                and bool(result.errors)
+                and result.path.stat().st_size == 0
+            )
+
+            if result is None:
+                # The module says nothing changed. Don't hash or compare files.
+                is_unchanged = True
+            elif last_fetch_result is None:
+                is_unchanged = False
+            else:
+                # Comparing may read both files. Do it in a thread, like
+                # hashing, to keep the event loop responsive.
+                is_unchanged = await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    partial(
+                        versions.are_fetch_results_equal,
+                        result,
+                        last_fetch_result,
+                        new_hash=result_hash,
+                        old_hash=stored_object.hash,
+                    ),
+                )
+
+            if is_unchanged:
+                await save.mark_result_unchanged(workflow_id, step, now, validators)
+            else:
+                await save.create_result(
+                    workflow_id, step, result, now, result_hash, validators
+                )
 
+    await update_next_update_time(workflow_id, step, now, failed=failed)
 
-async def handle_fetch(message):
-    await fetch(**message)
+
+async def handle_fetch(
+    message,
+    *,
+    chroot_pool: Optional[ChrootPool] = None,
+    upstream_limiter: Optional[UpstreamLimiter] = None,
+    shared_fetches: Optional[SharedFetches] = None,
+):
+    await fetch(
+        **message,
+        chroot_pool=chroot_pool,
+        upstream_limiter=upstream_limiter,
+        shared_fetches=shared_fetches,
+    )
@@ -1,27 +1,87 @@
 import asyncio
+from typing import Any, Awaitable, Callable, Dict
 
+import carehare
 import msgpack
 
 
+async def _consume_concurrently(
+    consumer, handle: Callable[[Dict[str, Any]], Awaitable[None]]
+) -> None:
+    """Run `handle(message)` for each message, without waiting for the last.
+
+    RabbitMQ won't deliver more than the consumer's `prefetch_count` unacked
+    messages; so that's how many handlers run at once.
+
+    Ack each message after its handler succeeds. Crash on error, and don't
+    ack. Return when the channel closes.
+    """
+    running: Dict[asyncio.Task, int] = {}  # task => delivery_tag
+    next_delivery = asyncio.ensure_future(consumer.next_delivery())
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                [next_delivery, *running], return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task is next_delivery:
+                    try:
+                        message_bytes, delivery_tag = task.result()
+                    except carehare.ChannelClosed:
+                        return
+                    message = msgpack.unpackb(message_bytes)
+                    running[asyncio.create_task(handle(message))] = delivery_tag
+                    next_delivery = asyncio.ensure_future(consumer.next_delivery())
+                else:
+                    delivery_tag = running.pop(task)
+                    task.result()  # raise on error
+                    consumer.ack(delivery_tag)
+    finally:
+        pending = [next_delivery, *running]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
 async def main():
     """Fetch, forever."""
     # import AFTER django.setup()
+    from django.conf import settings
+
     import cjwstate.modules
+    from cjwkernel.chroot import editable_chroot
     from cjwstate import rabbitmq
     from cjwstate.rabbitmq.connection import open_global_connection
+    from .concurrency import ChrootPool, UpstreamLimiter
     from .fetch import handle_fetch
+    from .sharing import SharedFetches
 
     cjwstate.modules.init_module_system()
 
+    n_fetches = settings.FETCHER_N_CONCURRENT_FETCHES
+    chroot_pool = ChrootPool(editable_chroot(i) for i in range(n_fetches))
+    upstream_limiter = UpstreamLimiter(
+        settings.FETCHER_MAX_CONCURRENT_FETCHES_PER_UPSTREAM
+    )
+    shared_fetches = SharedFetches(settings.FETCHER_SHARED_FETCH_TTL)
+
+    async def handle(message):
+        await handle_fetch(
+            message,
+            chroot_pool=chroot_pool,
+            upstream_limiter=upstream_limiter,
+            shared_fetches=shared_fetches,
+        )
+
     async with open_global_connection() as rabbitmq_connection:
         await rabbitmq_connection.queue_declare(rabbitmq.Fetch, durable=True)
         await rabbitmq_connection.queue_declare(rabbitmq.Render, durable=True)
         await rabbitmq_connection.exchange_declare(rabbitmq.GroupsExchange)
-        # Fetch; ack; fetch; ack ... forever.
-        async with rabbitmq_connection.acking_consumer(rabbitmq.Fetch) as consumer:
-            async for message_bytes in consumer:
-                message = msgpack.unpackb(message_bytes)
-                await handle_fetch(message)
+        # Fetch n_fetches messages at a time; ack each when it's done ... forever.
+        async with rabbitmq_connection.acking_consumer(
+            rabbitmq.Fetch, prefetch_count=n_fetches
+        ) as consumer:
+            await _consume_concurrently(consumer, handle)
 
 
 if __name__ == "__main__":
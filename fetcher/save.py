@@ -1,13 +1,18 @@
 import contextlib
 import datetime
+import logging
+from typing import List, Optional
 
-from cjwkernel.types import FetchResult
+from cjwkernel.types import FetchResult, FetchValidators
 from cjworkbench.sync import database_sync_to_async
 from cjwstate import clientside, commands, rabbitmq, storedobjects
 from cjwstate.models import Step, Workflow
 from cjwstate.models.commands import SetStepDataVersion
 
 
+logger = logging.getLogger(__name__)
+
+
 @contextlib.contextmanager
 def _locked_step(workflow_id: int, step: Step):
     """Refresh step from database and yield with workflow lock.
@@ -40,8 +45,13 @@ async def _notify_websockets(workflow_id: int, step: Step) -> None:
 
 @database_sync_to_async
 def _do_create_result(
-    workflow_id: int, step: Step, result: FetchResult, now: datetime.datetime
-) -> None:
+    workflow_id: int,
+    step: Step,
+    result: FetchResult,
+    now: datetime.datetime,
+    result_hash: Optional[str],
+    validators: Optional[FetchValidators],
+) -> List[str]:
     """Do database manipulations for create_result().
 
     Modify `step` in-place.
@@ -49,26 +59,66 @@ def _do_create_result(
     Do *not* do the logic in SetStepDataVersion. We're creating a new
     version, not doing something undoable.
 
+    Return S3 keys of StoredObjects we deleted to enforce storage limits. The
+    caller should delete their files after we release the workflow lock.
+
     Raise Step.DoesNotExist or Workflow.DoesNotExist in case of a race.
     """
     with _locked_step(workflow_id, step):
+        if validators is None:
+            validators = FetchValidators()
         storedobjects.create_stored_object(
-            workflow_id, step.id, result.path, stored_at=now
+            workflow_id,
+            step.id,
+            result.path,
+            stored_at=now,
+            hash=result_hash,
+            etag=validators.etag,
+            last_modified=validators.last_modified,
+        )
+        deleted_keys = storedobjects.delete_old_files_to_enforce_storage_limits(
+            step=step
         )
-        storedobjects.delete_old_files_to_enforce_storage_limits(step=step)
         # Assume caller sends new list to clients via SetStepDataVersion
 
         step.fetch_errors = result.errors
         step.is_busy = False
         step.last_update_check = now
         step.save(update_fields=["fetch_errors", "is_busy", "last_update_check"])
+    return deleted_keys
+
+
+@database_sync_to_async
+def _delete_unreferenced_files(keys: List[str]) -> None:
+    """Delete files; log (and otherwise ignore) errors.
+
+    The fetch succeeded and its result is saved. Failing to clean up old
+    files (e.g., because S3 is down) shouldn't make the fetch look failed.
+    The keys stay in `pending_stored_object_deletion`, and cron retries.
+    """
+    try:
+        storedobjects.delete_unreferenced_files(keys)
+    except Exception:
+        logger.exception(
+            "Failed to delete %d unreferenced stored-object files; cron will retry",
+            len(keys),
+        )
 
 
 async def create_result(
-    workflow_id: int, step: Step, result: FetchResult, now: datetime.datetime
+    workflow_id: int,
+    step: Step,
+    result: FetchResult,
+    now: datetime.datetime,
+    result_hash: Optional[str] = None,
+    validators: Optional[FetchValidators] = None,
 ) -> None:
     """Store fetched table as storedobject.
 
+    Pass `result_hash` if you already computed `hash_file(result.path)`.
+
+    Store `validators` (if the module reported them) with the storedobject.
+
     Set `fetch_errors` to `result.errors`. Set `is_busy` to `False`. Set
     `last_update_check`.
 
@@ -78,10 +128,16 @@ async def create_result(
 
     Notify the user over Websockets.
 
+    Delete old storedobjects' files, if storage limits require it. (We do
+    this last, after releasing the workflow lock, because S3 is slow.) If
+    that fails, log the error: cron will retry.
+
     No-op if `workflow` or `step` has been deleted.
     """
     try:
-        await _do_create_result(workflow_id, step, result, now)
+        deleted_keys = await _do_create_result(
+            workflow_id, step, result, now, result_hash, validators
+        )
     except (Step.DoesNotExist, Workflow.DoesNotExist):
         return  # there's nothing more to do
 
@@ -107,10 +163,16 @@ async def create_result(
 
     await _notify_websockets(workflow_id, step)
 
+    if deleted_keys:
+        await _delete_unreferenced_files(deleted_keys)
+
 
 @database_sync_to_async
 def _do_mark_result_unchanged(
-    workflow_id: int, step: Step, now: datetime.datetime
+    workflow_id: int,
+    step: Step,
+    now: datetime.datetime,
+    validators: Optional[FetchValidators],
 ) -> None:
     """Do database manipulations for mark_result_unchanged().
 
@@ -119,15 +181,40 @@ def _do_mark_result_unchanged(
     Raise Step.DoesNotExist or Workflow.DoesNotExist in case of a race.
     """
     with _locked_step(workflow_id, step):
+        if validators is not None:
+            # A `None` field means the module didn't report it (e.g., a plain
+            # ConditionalFetchResult(None)). Keep the stored value, so the
+            # next fetch can still be conditional.
+            updates = {
+                field: value
+                for field, value in (
+                    ("etag", validators.etag),
+                    ("last_modified", validators.last_modified),
+                )
+                if value is not None
+            }
+            if updates:
+                step.stored_objects.filter(stored_at=step.stored_data_version).update(
+                    **updates
+                )
         step.is_busy = False
         step.last_update_check = now
         step.save(update_fields=["is_busy", "last_update_check"])
 
 
 async def mark_result_unchanged(
-    workflow_id: int, step: Step, now: datetime.datetime
+    workflow_id: int,
+    step: Step,
+    now: datetime.datetime,
+    validators: Optional[FetchValidators] = None,
 ) -> None:
-    """Leave storedobjects and `step.fetch_errors` unchanged.
+    """Leave storedobject files and `step.fetch_errors` unchanged.
+
+    This reads no files: call it when a module answered "not modified", too.
+
+    If `validators` is set, store its non-`None` fields on the current
+    storedobject. (A server may send new validators along with "not
+    modified".) Leave the other fields as they are.
 
     Set step.is_busy to False.
 
@@ -138,7 +225,7 @@ async def mark_result_unchanged(
     No-op if `workflow` or `step` has been deleted.
     """
     try:
-        await _do_mark_result_unchanged(workflow_id, step, now)
+        await _do_mark_result_unchanged(workflow_id, step, now, validators)
     except (Step.DoesNotExist, Workflow.DoesNotExist):
         return  # there's nothing more to do
 
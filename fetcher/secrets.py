@@ -1,5 +1,7 @@
+import asyncio
+import time
 from functools import singledispatch
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import httpx
 from cjwmodule.spec.paramfield import ParamField
@@ -12,6 +14,12 @@ from cjwstate import oauth
 UserProvidedSecret = Optional[Dict[str, Any]]
 ModuleSecret = Optional[Dict[str, Any]]
 
+OAUTH2_ACCESS_TOKEN_EXPIRY_MARGIN = 660  # seconds
+"""Seconds before expiry when we stop handing out a cached access token.
+
+A module may use its token throughout a fetch, and a fetch may last 10min.
+"""
+
 
 def _service_no_longer_configured_error(service: str):
     return trans(
@@ -200,6 +208,7 @@ async def _refresh_oauth2_token(
             return {
                 "token_type": maybe_json.get("token_type"),
                 "access_token": maybe_json.get("access_token"),
+                "expires_in": maybe_json.get("expires_in"),
             }
     except httpx.TimeoutException:
         raise _RefreshOauth2TokenError(
@@ -218,6 +227,70 @@ async def _refresh_oauth2_token(
         )
 
 
+class _CachedAccessToken(NamedTuple):
+    token: Dict[str, Any]
+    expires_at: float  # time.monotonic() value
+
+
+class OAuth2AccessTokenCache:
+    """Access tokens, keyed by service and refresh token, until they expire.
+
+    Concurrent requests for the same refresh token share one HTTP request.
+    Tokens without an "expires_in" are never cached.
+
+    Keep this in memory only: access tokens are as sensitive as passwords.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._tokens: Dict[Tuple[str, str], _CachedAccessToken] = {}
+        self._refreshes: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+    async def get(self, service: oauth.OAuth2, refresh_token: str) -> Dict[str, Any]:
+        """Return a cached token or `await _refresh_oauth2_token(...)`.
+
+        Raise _RefreshOauth2TokenError on error. (Errors aren't cached.)
+        """
+        key = (service.service_id, refresh_token)
+        cached = self._tokens.get(key)
+        if cached is not None and cached.expires_at > self._clock():
+            return cached.token
+
+        if key not in self._refreshes:
+            self._refreshes[key] = asyncio.ensure_future(
+                self._refresh(key, service, refresh_token)
+            )
+        # shield(): one caller's cancellation mustn't cancel everybody's refresh
+        return await asyncio.shield(self._refreshes[key])
+
+    async def _refresh(
+        self, key: Tuple[str, str], service: oauth.OAuth2, refresh_token: str
+    ) -> Dict[str, Any]:
+        try:
+            token = await _refresh_oauth2_token(service, refresh_token)
+        finally:
+            del self._refreshes[key]
+
+        now = self._clock()
+        self._evict_expired(now)
+        expires_in = token.get("expires_in")
+        if isinstance(expires_in, (int, float)) and not isinstance(expires_in, bool):
+            expires_at = now + expires_in - OAUTH2_ACCESS_TOKEN_EXPIRY_MARGIN
+            if expires_at > now:
+                self._tokens[key] = _CachedAccessToken(token, expires_at)
+        return token
+
+    def _evict_expired(self, now: float) -> None:
+        for key in [k for k, v in self._tokens.items() if v.expires_at <= now]:
+            del self._tokens[key]
+
+
+oauth2_access_token_cache = OAuth2AccessTokenCache()
+
+
 @prepare_secret.register(ParamField.Secret.Logic.Oauth2)
 async def prepare_secret_oauth2(
     logic: ParamField.Secret.Logic.Oauth2, value: UserProvidedSecret
@@ -235,7 +308,9 @@ async def prepare_secret_oauth2(
         * `"token_type"`: token type (unset implies `"Bearer"`)
         * `"access_token"`: token that might expire, provided by service.
         * `"refresh_token"`: provided by some services (Google) so we can
-                             give modules a temporary token.
+                             give modules a temporary token. We reuse each
+                             temporary token until it nears expiry: see
+                             `oauth2_access_token_cache`.
 
     On success, ModuleSecret "secret" sub-dict will have keys:
 
@@ -264,7 +339,7 @@ async def prepare_secret_oauth2(
     token = value.get("secret", {})
     if "refresh_token" in token:
         try:
-            token = await _refresh_oauth2_token(service, token["refresh_token"])
+            token = await oauth2_access_token_cache.get(service, token["refresh_token"])
         except _RefreshOauth2TokenError as err:
             return _secret_error(value, err.i18n_message)
 
@@ -1,5 +1,8 @@
+from cjworkbench.settings.autoupdate import *
 from cjworkbench.settings.database import *
+from cjworkbench.settings.fetchconcurrency import *
 from cjworkbench.settings.hardlimits import *
+from cjworkbench.settings.kernellimits import *
 from cjworkbench.settings.logging import *
 from cjworkbench.settings.oauth import OAUTH_SERVICES
 from cjworkbench.settings.rabbitmq import *
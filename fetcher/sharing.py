@@ -0,0 +1,133 @@
+"""Share one fetch's result among steps that would fetch the same thing.
+
+Many steps fetch with the same module and params -- say, a hundred "loadurl"
+steps on the same URL, all auto-updating at the same minute. When nothing
+step-specific (secrets, input table, previous result) can change a fetch's
+output, we call the module once and hand its result to every such step.
+"""
+import asyncio
+import contextlib
+import shutil
+from typing import AsyncContextManager, Dict, Hashable, NamedTuple, Optional
+
+from cjwkernel.types import ConditionalFetchResult
+from cjwkernel.util import tempfile_context
+
+
+class SharedFetchResult(NamedTuple):
+    result: ConditionalFetchResult
+    """Module output. Its file (if any) is shared: do not modify it."""
+
+    result_hash: Optional[str]
+    """SHA-256 hash of `result.result.path`; None if `result.result` is None."""
+
+
+class _Entry:
+    def __init__(self):
+        self.done = asyncio.Event()  # set when the leader publishes or gives up
+        self.result: Optional[SharedFetchResult] = None
+        self.n_users = 0
+        self.is_expired = False
+        self.exit_stack = contextlib.ExitStack()  # deletes the shared file
+
+
+class SharedFetch:
+    """One step's handle on a fetch it may share with other steps.
+
+    If `result` is set, another step fetched already: use that. Otherwise,
+    fetch and then call `publish()`.
+    """
+
+    def __init__(self, entry: _Entry, is_leader: bool):
+        self._entry = entry
+        self._is_leader = is_leader
+
+    @property
+    def result(self) -> Optional[SharedFetchResult]:
+        return None if self._is_leader else self._entry.result
+
+    async def publish(
+        self, result: ConditionalFetchResult, result_hash: Optional[str]
+    ) -> None:
+        """Share `result` with waiting and upcoming steps.
+
+        Copy the result file: the caller's file is in a chroot that will be
+        wiped. Do nothing if other steps aren't relying on this one.
+        """
+        entry = self._entry
+        if not self._is_leader or entry.done.is_set():
+            return
+
+        if result.result is None:
+            shared = result
+        else:
+            path = entry.exit_stack.enter_context(
+                tempfile_context(prefix="shared-fetch-")
+            )
+            await asyncio.get_event_loop().run_in_executor(
+                None, shutil.copyfile, result.result.path, path
+            )
+            shared = result._replace(result=result.result._replace(path=path))
+        entry.result = SharedFetchResult(shared, result_hash)
+        entry.done.set()
+
+
+class SharedFetches:
+    """In-flight and recent fetches, by key.
+
+    Create this within a running event loop.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    @contextlib.asynccontextmanager
+    async def join(self, key: Hashable) -> AsyncContextManager[SharedFetch]:
+        """Yield a SharedFetch for `key`.
+
+        The first caller leads: its `result` is None, and it should fetch and
+        `publish()`. Other callers wait for the leader to publish, then see its
+        result until `ttl` seconds after the leader exits. If the leader exits
+        without publishing (say, because of an exception), waiting callers'
+        `result` is None and they should fetch for themselves.
+
+        The shared file stays on disk until the result expires _and_ every
+        caller has exited its context.
+        """
+        entry = self._entries.get(key)
+        is_leader = entry is None
+        if is_leader:
+            entry = _Entry()
+            self._entries[key] = entry
+        entry.n_users += 1
+        try:
+            if is_leader:
+                try:
+                    yield SharedFetch(entry, True)
+                finally:
+                    entry.done.set()
+                    if entry.result is None:
+                        # Nothing to share: the next caller should lead
+                        self._expire(key, entry)
+                    else:
+                        asyncio.get_event_loop().call_later(
+                            self.ttl, self._expire, key, entry
+                        )
+            else:
+                await entry.done.wait()
+                yield SharedFetch(entry, False)
+        finally:
+            entry.n_users -= 1
+            self._close_if_unused(entry)
+
+    def _expire(self, key: Hashable, entry: _Entry) -> None:
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        entry.is_expired = True
+        self._close_if_unused(entry)
+
+    @staticmethod
+    def _close_if_unused(entry: _Entry) -> None:
+        if entry.is_expired and entry.n_users == 0:
+            entry.exit_stack.close()
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from cjwkernel.chroot import Chroot, ChrootContext
+from cjwkernel.util import tempdir_context
+from fetcher.concurrency import ChrootPool, UpstreamLimiter, guess_upstream
+
+
+class ChrootPoolTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tempdir_context = tempdir_context()
+        tempdir = self.tempdir_context.__enter__()
+        self.chroot1 = Chroot(tempdir / "1", tempdir / "base", tempdir / "1u")
+        self.chroot2 = Chroot(tempdir / "2", tempdir / "base", tempdir / "2u")
+
+    def tearDown(self):
+        self.tempdir_context.__exit__(None, None, None)
+        super().tearDown()
+
+    async def test_lend_distinct_chroots(self):
+        pool = ChrootPool([self.chroot1, self.chroot2])
+        async with pool.acquire_context() as ctx1:
+            async with pool.acquire_context() as ctx2:
+                self.assertEqual(
+                    {ctx1.chroot.root, ctx2.chroot.root},
+                    {self.chroot1.root, self.chroot2.root},
+                )
+
+    async def test_wait_for_free_chroot(self):
+        pool = ChrootPool([self.chroot1])
+        events = []
+
+        async def borrow(name):
+            async with pool.acquire_context():
+                events.append("begin " + name)
+                await asyncio.sleep(0)
+                events.append("end " + name)
+
+        await asyncio.gather(borrow("a"), borrow("b"))
+        self.assertEqual(events, ["begin a", "end a", "begin b", "end b"])
+
+    async def test_return_chroot_on_error(self):
+        pool = ChrootPool([self.chroot1])
+        with self.assertRaises(RuntimeError):
+            async with pool.acquire_context():
+                raise RuntimeError
+        async with pool.acquire_context() as ctx:
+            self.assertIs(ctx.chroot, self.chroot1)
+
+    async def test_clear_chroot_in_a_thread(self):
+        # Clearing may delete gigabytes. It mustn't block the event loop.
+        pool = ChrootPool([self.chroot1])
+        threads = []
+        with patch.object(
+            ChrootContext,
+            "_clear_all_edits",
+            lambda self: threads.append(threading.current_thread()),
+        ):
+            async with pool.acquire_context():
+                pass
+        self.assertEqual(len(threads), 2)  # enter and exit
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+class UpstreamLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_limit_per_upstream(self):
+        limiter = UpstreamLimiter(2)
+        n_running = {"a": 0, "b": 0}
+        max_running = {"a": 0, "b": 0}
+
+        async def fetch(upstream):
+            async with limiter.limit(upstream):
+                n_running[upstream] += 1
+                max_running[upstream] = max(max_running[upstream], n_running[upstream])
+                await asyncio.sleep(0)
+                n_running[upstream] -= 1
+
+        await asyncio.gather(*(fetch(upstream) for upstream in "aaaab"))
+        self.assertEqual(max_running, {"a": 2, "b": 1})
+
+    async def test_forget_idle_upstreams(self):
+        limiter = UpstreamLimiter(1)
+        async with limiter.limit("a"):
+            pass
+        self.assertEqual(limiter._semaphores, {})
+
+
+class GuessUpstreamTests(unittest.TestCase):
+    def test_url_hostname(self):
+        self.assertEqual(
+            guess_upstream("loadurl", {"url": " https://Example.com:8080/x.csv"}),
+            "example.com",
+        )
+
+    def test_no_url_param(self):
+        self.assertEqual(guess_upstream("twitter", {"username": "x"}), "twitter")
+
+    def test_url_without_hostname(self):
+        self.assertEqual(guess_upstream("loadurl", {"url": "not a url"}), "loadurl")
+
+    def test_params_are_error(self):
+        self.assertEqual(guess_upstream("loadurl", ValueError("x")), "loadurl")
@@ -9,6 +9,7 @@ from unittest.mock import patch
 from cjwmodule.arrow.testing import assert_arrow_table_equals, make_column, make_table
 from cjwmodule.spec.paramschema import ParamSchema
 from dateutil import parser
+from django.test.utils import override_settings
 
 import cjwstate.modules
 from cjwkernel.chroot import EDITABLE_CHROOT
@@ -17,14 +18,16 @@ from cjwkernel.files import read_parquet_as_arrow
 from cjwkernel.types import (
     Column,
     ColumnType,
+    ConditionalFetchResult,
     FetchError,
     FetchResult,
+    FetchValidators,
     I18nMessage,
     TableMetadata,
 )
 from cjwkernel.tests.util import parquet_file
 from cjwkernel.util import tempfile_context
-from cjwstate import s3, rabbitmq, rendercache, storedobjects
+from cjwstate import clientside, s3, rabbitmq, rendercache, storedobjects
 from cjwstate.models import CachedRenderResult, Step, Workflow
 from cjwstate.rendercache.testing import write_to_rendercache
 from cjwstate.tests.utils import (
@@ -34,6 +37,7 @@ from cjwstate.tests.utils import (
     create_module_zipfile,
 )
 from fetcher import fetch, fetchprep, save
+from fetcher.sharing import SharedFetches
 
 
 def async_value(v):
@@ -204,10 +208,12 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
         self.ctx.close()
         super().tearDown()
 
-    def _err(self, message: I18nMessage) -> FetchResult:
-        return FetchResult(self.output_path, [FetchError(message)])
+    def _err(self, message: I18nMessage) -> ConditionalFetchResult:
+        return ConditionalFetchResult(
+            FetchResult(self.output_path, [FetchError(message)])
+        )
 
-    def _bug_err(self, message: str) -> FetchResult:
+    def _bug_err(self, message: str) -> ConditionalFetchResult:
         return self._err(
             I18nMessage(
                 "py.fetcher.fetch.user_visible_bug_during_fetch",
@@ -228,6 +234,7 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
                 {},
                 None,
                 None,
+                None,
                 self.output_path,
             )
         self.assertEqual(self.output_path.stat().st_size, 0)
@@ -237,7 +244,9 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
         )
 
     def test_simple(self):
-        self.kernel.fetch.return_value = FetchResult(self.output_path)
+        self.kernel.fetch.return_value = ConditionalFetchResult(
+            FetchResult(self.output_path)
+        )
         module_zipfile = create_module_zipfile(
             "mod", spec_kwargs={"parameters": [{"id_name": "A", "type": "string"}]}
         )
@@ -251,10 +260,13 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
                 migrated_params_or_error={"A": "B"},
                 secrets={"C": "D"},
                 last_fetch_result=None,
+                last_fetch_validators=None,
                 maybe_input_crr=None,
                 output_path=self.output_path,
             )
-        self.assertEqual(result, FetchResult(self.output_path, []))
+        self.assertEqual(
+            result, ConditionalFetchResult(FetchResult(self.output_path, []))
+        )
         self.assertEqual(
             self.kernel.fetch.call_args[1]["compiled_module"],
             module_zipfile.compile_code_without_executing(),
@@ -262,6 +274,7 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
         self.assertEqual(self.kernel.fetch.call_args[1]["params"], {"A": "B"})
         self.assertEqual(self.kernel.fetch.call_args[1]["secrets"], {"C": "D"})
         self.assertIsNone(self.kernel.fetch.call_args[1]["last_fetch_result"])
+        self.assertIsNone(self.kernel.fetch.call_args[1]["last_fetch_validators"])
         self.assertIsNone(self.kernel.fetch.call_args[1]["input_parquet_filename"])
 
     def test_migrated_params_is_error(self):
@@ -276,6 +289,7 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
                 {},
                 None,
                 None,
+                None,
                 self.output_path,
             )
         self.assertEqual(result, self._bug_err("exit code 1: RuntimeError: bad"))
@@ -295,6 +309,7 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
                 {},
                 None,
                 None,
+                None,
                 self.output_path,
             )
         self.assertEqual(
@@ -316,9 +331,10 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
             last_fetch_result,
             input_parquet_filename,
             output_filename,
+            last_fetch_validators,
         ):
             shutil.copy(basedir / input_parquet_filename, basedir / output_filename)
-            return FetchResult(basedir / output_filename)
+            return ConditionalFetchResult(FetchResult(basedir / output_filename))
 
         self.kernel.fetch.side_effect = do_fetch
         clean_value.return_value = {}
@@ -339,12 +355,13 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
                     {},
                     {},
                     None,
+                    None,
                     input_crr,
                     self.output_path,
                 )
 
             # Passed file is downloaded from rendercache
-            self.assertEqual(result.path.read_bytes(), b"abc123")
+            self.assertEqual(result.result.path.read_bytes(), b"abc123")
             # clean_value() is called with input metadata from CachedRenderResult
             clean_value.assert_called()
             self.assertEqual(clean_value.call_args[0][2], input_metadata)
@@ -352,7 +369,9 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
     @patch.object(fetchprep, "clean_value", lambda *a: {})
     @patch.object(rendercache, "downloaded_parquet_file")
     def test_input_crr_corrupt_cache_error_is_none(self, downloaded_parquet_file):
-        self.kernel.fetch.return_value = FetchResult(self.output_path, [])
+        self.kernel.fetch.return_value = ConditionalFetchResult(
+            FetchResult(self.output_path, [])
+        )
         downloaded_parquet_file.side_effect = rendercache.CorruptCacheError(
             "file not found"
         )
@@ -368,6 +387,7 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
                 {},
                 {},
                 None,
+                None,
                 input_crr,
                 self.output_path,
             )
@@ -382,7 +402,9 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
 
         result_path = self.ctx.enter_context(tempfile_context(prefix="result"))
 
-        self.kernel.fetch.return_value = FetchResult(result_path, [])
+        self.kernel.fetch.return_value = ConditionalFetchResult(
+            FetchResult(result_path, [])
+        )
         with self.assertLogs("fetcher.fetch", level=logging.INFO):
             fetch.fetch_or_wrap_error(
                 self.ctx,
@@ -393,6 +415,7 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
                 {},
                 {},
                 FetchResult(last_result_path, []),
+                FetchValidators(etag='"abc"'),
                 None,
                 self.output_path,
             )
@@ -400,6 +423,32 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
             self.kernel.fetch.call_args[1]["last_fetch_result"],
             FetchResult(last_result_path, []),
         )
+        self.assertEqual(
+            self.kernel.fetch.call_args[1]["last_fetch_validators"],
+            FetchValidators(etag='"abc"'),
+        )
+
+    def test_not_modified(self):
+        self.kernel.fetch.return_value = ConditionalFetchResult(
+            None, FetchValidators(etag='"abc"')
+        )
+        with self.assertLogs("fetcher.fetch", level=logging.INFO):
+            result = fetch.fetch_or_wrap_error(
+                self.ctx,
+                self.chroot_context,
+                self.basedir,
+                "mod",
+                create_module_zipfile("mod"),
+                {},
+                {},
+                FetchResult(self.output_path, []),
+                FetchValidators(etag='"abc"'),
+                None,
+                self.output_path,
+            )
+        self.assertEqual(
+            result, ConditionalFetchResult(None, FetchValidators(etag='"abc"'))
+        )
 
     def test_fetch_module_error(self):
         self.kernel.fetch.side_effect = ModuleExitedError("mod", 1, "RuntimeError: bad")
@@ -414,6 +463,7 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
                 {},
                 None,
                 None,
+                None,
                 self.output_path,
             )
         self.assertEqual(result, self._bug_err("exit code 1: RuntimeError: bad"))
@@ -455,6 +505,75 @@ class FetchTests(DbTestCaseWithModuleRegistry):
         queue_render.assert_called_with(workflow.id, workflow.last_delta_id)
         send_update.assert_called()
 
+    @patch.object(rabbitmq, "queue_render_if_consumers_are_listening")
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_fetch_integration_share_identical_fetches(self, send_update, queue_render):
+        queue_render.side_effect = async_value(None)
+        send_update.side_effect = async_value(None)
+        workflow = Workflow.create_and_init()
+        create_module_zipfile(
+            "mod",
+            python_code=(
+                "import pandas as pd\ndef fetch(params): return pd.DataFrame({'A': [1]})\ndef render(table, params): return table"
+            ),
+        )
+        step1 = workflow.tabs.first().steps.create(
+            order=0, slug="step-1", module_id_name="mod"
+        )
+        step2 = workflow.tabs.first().steps.create(
+            order=1, slug="step-2", module_id_name="mod"
+        )
+        cjwstate.modules.init_module_system()
+        shared_fetches = SharedFetches(60)
+        with patch.object(
+            fetch, "fetch_or_wrap_error", wraps=fetch.fetch_or_wrap_error
+        ) as fetch_or_wrap_error:
+            with self.assertLogs(level=logging.INFO):
+                for step in (step1, step2):
+                    self.run_with_async_db(
+                        fetch.fetch(
+                            workflow_id=workflow.id,
+                            step_id=step.id,
+                            shared_fetches=shared_fetches,
+                        )
+                    )
+        fetch_or_wrap_error.assert_called_once()
+        self.assertEqual(step1.stored_objects.get().key, step2.stored_objects.get().key)
+
+    @patch.object(rabbitmq, "queue_render_if_consumers_are_listening")
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_fetch_integration_do_not_share_secrets(self, send_update, queue_render):
+        queue_render.side_effect = async_value(None)
+        send_update.side_effect = async_value(None)
+        workflow = Workflow.create_and_init()
+        create_module_zipfile(
+            "mod",
+            python_code=(
+                "import pandas as pd\ndef fetch(params): return pd.DataFrame({'A': [1]})\ndef render(table, params): return table"
+            ),
+        )
+        step1 = workflow.tabs.first().steps.create(
+            order=0, slug="step-1", module_id_name="mod"
+        )
+        step2 = workflow.tabs.first().steps.create(
+            order=1, slug="step-2", module_id_name="mod", secrets={"x": "y"}
+        )
+        cjwstate.modules.init_module_system()
+        shared_fetches = SharedFetches(60)
+        with patch.object(
+            fetch, "fetch_or_wrap_error", wraps=fetch.fetch_or_wrap_error
+        ) as fetch_or_wrap_error:
+            with self.assertLogs(level=logging.INFO):
+                for step in (step1, step2):
+                    self.run_with_async_db(
+                        fetch.fetch(
+                            workflow_id=workflow.id,
+                            step_id=step.id,
+                            shared_fetches=shared_fetches,
+                        )
+                    )
+        self.assertEqual(fetch_or_wrap_error.call_count, 2)
+
     @patch.object(save, "create_result")
     def test_fetch_integration_tempfiles_are_on_disk(self, create_result):
         # /tmp is RAM; /var/tmp is disk. Assert big files go on disk.
@@ -477,6 +596,53 @@ class FetchTests(DbTestCaseWithModuleRegistry):
         saved_result: FetchResult = create_result.call_args[0][2]
         self.assertRegex(str(saved_result.path), r"/var/tmp/")
 
+    @patch.object(rabbitmq, "queue_render_if_consumers_are_listening")
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_fetch_integration_not_modified(self, send_update, queue_render):
+        queue_render.side_effect = async_value(None)
+        send_update.side_effect = async_value(None)
+        workflow = Workflow.create_and_init()
+        create_module_zipfile(
+            "mod",
+            python_code=textwrap.dedent(
+                """
+                import pandas as pd
+                from cjwkernel.types import ConditionalFetchResult, FetchValidators
+
+                def fetch(params, *, last_fetch_validators):
+                    if last_fetch_validators is None:
+                        return ConditionalFetchResult(
+                            pd.DataFrame({"A": [1]}), FetchValidators(etag='"v1"')
+                        )
+                    assert last_fetch_validators.etag == '"v1"'
+                    return ConditionalFetchResult(None, FetchValidators(etag='"v2"'))
+
+                def render(table, params):
+                    return table
+                """
+            ),
+        )
+        step = workflow.tabs.first().steps.create(
+            order=0, slug="step-1", module_id_name="mod"
+        )
+        cjwstate.modules.init_module_system()
+        now1 = datetime.datetime(2021, 4, 20, 1, 2, 3)
+        now2 = datetime.datetime(2021, 4, 20, 2, 3, 4)
+        with self.assertLogs(level=logging.INFO):
+            self.run_with_async_db(
+                fetch.fetch(workflow_id=workflow.id, step_id=step.id, now=now1)
+            )
+            with patch.object(storedobjects, "hash_file") as hash_file:
+                self.run_with_async_db(
+                    fetch.fetch(workflow_id=workflow.id, step_id=step.id, now=now2)
+                )
+            hash_file.assert_not_called()
+
+        step.refresh_from_db()
+        self.assertEqual(step.stored_data_version, now1)
+        self.assertEqual(step.last_update_check, now2)
+        self.assertEqual(step.stored_objects.get().etag, '"v2"')
+
 
 class UpdateNextUpdateTimeTests(DbTestCase):
     def test_update_on_schedule(self):
@@ -564,3 +730,111 @@ class UpdateNextUpdateTimeTests(DbTestCase):
                 workflow.id, step, parser.parse("2001-01-01T02:59")
             )
         )
+
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_back_off_after_error(self, send_update):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            update_interval=3600,
+            next_update=parser.parse("2000-01-01T01:00"),
+            n_consecutive_fetch_errors=1,
+        )
+        self.run_with_async_db(
+            fetch.update_next_update_time(
+                workflow.id, step, parser.parse("2000-01-01T01:00:01"), failed=True
+            )
+        )
+        step.refresh_from_db()
+        self.assertEqual(step.n_consecutive_fetch_errors, 2)
+        self.assertEqual(step.next_update, parser.parse("2000-01-01T05:00"))
+        send_update.assert_called_with(
+            workflow.id,
+            clientside.Update(
+                steps={step.id: clientside.StepUpdate(n_consecutive_fetch_errors=2)}
+            ),
+        )
+
+    @override_settings(AUTOUPDATE_MAX_ERROR_BACKOFF=7200)
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_back_off_at_most_max_error_backoff(self, send_update):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            update_interval=3600,
+            next_update=parser.parse("2000-01-01T01:00"),
+            n_consecutive_fetch_errors=100,
+        )
+        self.run_with_async_db(
+            fetch.update_next_update_time(
+                workflow.id, step, parser.parse("2000-01-01T01:00:01"), failed=True
+            )
+        )
+        step.refresh_from_db()
+        self.assertEqual(step.next_update, parser.parse("2000-01-01T03:00"))
+
+    @override_settings(AUTOUPDATE_MAX_ERROR_BACKOFF=60)
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_back_off_never_shortens_update_interval(self, send_update):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            update_interval=3600,
+            next_update=parser.parse("2000-01-01T01:00"),
+        )
+        self.run_with_async_db(
+            fetch.update_next_update_time(
+                workflow.id, step, parser.parse("2000-01-01T01:00:01"), failed=True
+            )
+        )
+        step.refresh_from_db()
+        self.assertEqual(step.next_update, parser.parse("2000-01-01T02:00"))
+
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_reset_back_off_after_success(self, send_update):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            update_interval=3600,
+            next_update=parser.parse("2000-01-01T01:00"),
+            n_consecutive_fetch_errors=3,
+        )
+        self.run_with_async_db(
+            fetch.update_next_update_time(
+                workflow.id, step, parser.parse("2000-01-01T01:00:01")
+            )
+        )
+        step.refresh_from_db()
+        self.assertEqual(step.n_consecutive_fetch_errors, 0)
+        self.assertEqual(step.next_update, parser.parse("2000-01-01T02:00"))
+        send_update.assert_called_with(
+            workflow.id,
+            clientside.Update(
+                steps={step.id: clientside.StepUpdate(n_consecutive_fetch_errors=0)}
+            ),
+        )
+
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_no_update_when_errors_unchanged(self, send_update):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            update_interval=3600,
+            next_update=parser.parse("2000-01-01T01:00"),
+        )
+        self.run_with_async_db(
+            fetch.update_next_update_time(
+                workflow.id, step, parser.parse("2000-01-01T01:00:01")
+            )
+        )
+        send_update.assert_not_called()
@@ -1,8 +1,9 @@
 import datetime
+import logging
 from unittest.mock import patch
 
 from cjwkernel.tests.util import parquet_file
-from cjwkernel.types import FetchError, FetchResult, I18nMessage
+from cjwkernel.types import FetchError, FetchResult, FetchValidators, I18nMessage
 from cjwstate import clientside, rabbitmq, storedobjects
 from cjwstate.models import Step, Workflow
 from cjwstate.models.commands import SetStepDataVersion
@@ -93,9 +94,63 @@ class SaveTests(DbTestCase):
             ),
         )
 
+    @patch.object(rabbitmq, "send_update_to_workflow_clients")
+    def test_mark_result_unchanged_stores_validators(self, send_update):
+        send_update.side_effect = async_noop
+        workflow = Workflow.create_and_init()
+        stored_at = datetime.datetime(2019, 10, 22, 12, 11)
+        step = workflow.tabs.first().steps.create(
+            order=0, slug="step-1", is_busy=True, stored_data_version=stored_at
+        )
+        step.stored_objects.create(
+            stored_at=stored_at, key="sha256/abc.dat", size=3, etag='"v1"'
+        )
+        now = datetime.datetime(2019, 10, 22, 12, 22)
+
+        self.run_with_async_db(
+            save.mark_result_unchanged(
+                workflow.id, step, now, FetchValidators(etag='"v2"')
+            )
+        )
+        stored_object = step.stored_objects.get()
+        self.assertEqual(stored_object.etag, '"v2"')
+        self.assertIsNone(stored_object.last_modified)
+
+    @patch.object(rabbitmq, "send_update_to_workflow_clients", async_noop)
+    def test_mark_result_unchanged_keeps_unreported_validators(self):
+        workflow = Workflow.create_and_init()
+        stored_at = datetime.datetime(2019, 10, 22, 12, 11)
+        step = workflow.tabs.first().steps.create(
+            order=0, slug="step-1", is_busy=True, stored_data_version=stored_at
+        )
+        step.stored_objects.create(
+            stored_at=stored_at,
+            key="sha256/abc.dat",
+            size=3,
+            etag='"v1"',
+            last_modified="Tue, 22 Oct 2019 12:11:00 GMT",
+        )
+
+        # Not modified, twice. The module reports no validators -- e.g., it
+        # returned ConditionalFetchResult(None) -- so we must keep the old
+        # ones, or the next fetch would download everything again.
+        for now in (
+            datetime.datetime(2019, 10, 22, 12, 22),
+            datetime.datetime(2019, 10, 22, 12, 33),
+        ):
+            self.run_with_async_db(
+                save.mark_result_unchanged(workflow.id, step, now, FetchValidators())
+            )
+            stored_object = step.stored_objects.get()
+            self.assertEqual(stored_object.etag, '"v1"')
+            self.assertEqual(
+                stored_object.last_modified, "Tue, 22 Oct 2019 12:11:00 GMT"
+            )
+
     @patch.object(rabbitmq, "send_update_to_workflow_clients", async_noop)
     @patch.object(storedobjects, "delete_old_files_to_enforce_storage_limits")
     def test_storage_limits(self, limit):
+        limit.return_value = []
         workflow = Workflow.create_and_init()
         step = workflow.tabs.first().steps.create(order=0, slug="step-1")
 
@@ -110,6 +165,28 @@ class SaveTests(DbTestCase):
             )
         limit.assert_called_with(step=step)
 
+    @patch.object(rabbitmq, "send_update_to_workflow_clients", async_noop)
+    @patch.object(storedobjects, "delete_old_files_to_enforce_storage_limits")
+    @patch.object(storedobjects, "delete_unreferenced_files")
+    def test_storage_limits_delete_error_is_logged(self, delete, limit):
+        limit.return_value = ["wf-1/wfm-2/old.dat"]
+        delete.side_effect = RuntimeError("S3 is down")
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=0, slug="step-1")
+
+        with parquet_file({"A": [1], "B": ["x"]}) as parquet_path:
+            with self.assertLogs("fetcher.save", level=logging.ERROR):
+                self.run_with_async_db(
+                    save.create_result(
+                        workflow.id,
+                        step,
+                        FetchResult(parquet_path),
+                        datetime.datetime.now(),
+                    )
+                )
+        delete.assert_called_with(["wf-1/wfm-2/old.dat"])
+        self.assertEqual(step.stored_objects.count(), 1)  # the fetch was saved
+
     def test_race_deleted_workflow(self):
         workflow = Workflow.create_and_init()
         step = workflow.tabs.first().steps.create(order=0, slug="step-1")
@@ -8,7 +8,13 @@ from unittest.mock import patch
 from cjwmodule.spec.paramfield import ParamField
 
 from cjwstate import oauth
-from fetcher.secrets import prepare_secret
+import fetcher.secrets
+from fetcher.secrets import (
+    OAUTH2_ACCESS_TOKEN_EXPIRY_MARGIN,
+    OAuth2AccessTokenCache,
+    oauth2_access_token_cache,
+    prepare_secret,
+)
 
 
 FakeTwitter = oauth.OAuth1a(
@@ -170,6 +176,8 @@ class PrepareSecretOauth2(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         super().setUp()
 
+        oauth2_access_token_cache.clear()
+
         # Tests will set `self.mock_http_response` to dictate what the server answers.
         self.mock_http_response = None
         self.last_request = None
@@ -380,3 +388,160 @@ class PrepareSecretOauth2(unittest.IsolatedAsyncioTestCase):
                         },
                     },
                 )
+
+    async def test_refresh_token_cached_until_expiry(self):
+        self.mock_http_response = iter(
+            [
+                MockHttpResponse(
+                    200,
+                    [("Content-Type", "application/json")],
+                    b'{"token_type":"Bearer","access_token":"token-1","expires_in":3600}',
+                ),
+                MockHttpResponse(
+                    200,
+                    [("Content-Type", "application/json")],
+                    b'{"token_type":"Bearer","access_token":"token-2","expires_in":3600}',
+                ),
+            ]
+        )
+        user_secret = {
+            "name": "a@example.com",
+            "secret": {"refresh_token": "a-refresh-token"},
+        }
+        with self.fake_google():
+            with self.assertLogs("httpx._client", level="DEBUG"):
+                result1 = await prepare_secret(self.GoogleLogic, user_secret)
+            result2 = await prepare_secret(self.GoogleLogic, user_secret)
+        self.assertEqual(result1["secret"]["access_token"], "token-1")
+        self.assertEqual(result2["secret"]["access_token"], "token-1")
+
+    async def test_refresh_token_share_concurrent_refresh(self):
+        self.mock_http_response = iter(
+            [
+                MockHttpResponse(
+                    200,
+                    [("Content-Type", "application/json")],
+                    b'{"token_type":"Bearer","access_token":"token-1","expires_in":3600}',
+                ),
+                MockHttpResponse(
+                    200,
+                    [("Content-Type", "application/json")],
+                    b'{"token_type":"Bearer","access_token":"token-2","expires_in":3600}',
+                ),
+            ]
+        )
+        user_secret = {
+            "name": "a@example.com",
+            "secret": {"refresh_token": "a-refresh-token"},
+        }
+        with self.fake_google():
+            with self.assertLogs("httpx._client", level="DEBUG"):
+                result1, result2 = await asyncio.gather(
+                    prepare_secret(self.GoogleLogic, user_secret),
+                    prepare_secret(self.GoogleLogic, user_secret),
+                )
+        self.assertEqual(result1["secret"]["access_token"], "token-1")
+        self.assertEqual(result2["secret"]["access_token"], "token-1")
+
+    async def test_refresh_token_no_cache_without_expires_in(self):
+        self.mock_http_response = iter(
+            [
+                MockHttpResponse(
+                    200,
+                    [("Content-Type", "application/json")],
+                    b'{"token_type":"Bearer","access_token":"token-1"}',
+                ),
+                MockHttpResponse(
+                    200,
+                    [("Content-Type", "application/json")],
+                    b'{"token_type":"Bearer","access_token":"token-2"}',
+                ),
+            ]
+        )
+        user_secret = {
+            "name": "a@example.com",
+            "secret": {"refresh_token": "a-refresh-token"},
+        }
+        with self.fake_google():
+            with self.assertLogs("httpx._client", level="DEBUG"):
+                await prepare_secret(self.GoogleLogic, user_secret)
+                result = await prepare_secret(self.GoogleLogic, user_secret)
+        self.assertEqual(result["secret"]["access_token"], "token-2")
+
+    async def test_refresh_token_no_cache_when_expiring_soon(self):
+        self.mock_http_response = iter(
+            [
+                MockHttpResponse(
+                    200,
+                    [("Content-Type", "application/json")],
+                    b'{"token_type":"Bearer","access_token":"token-1","expires_in":60}',
+                ),
+                MockHttpResponse(
+                    200,
+                    [("Content-Type", "application/json")],
+                    b'{"token_type":"Bearer","access_token":"token-2","expires_in":60}',
+                ),
+            ]
+        )
+        user_secret = {
+            "name": "a@example.com",
+            "secret": {"refresh_token": "a-refresh-token"},
+        }
+        with self.fake_google():
+            with self.assertLogs("httpx._client", level="DEBUG"):
+                await prepare_secret(self.GoogleLogic, user_secret)
+                result = await prepare_secret(self.GoogleLogic, user_secret)
+        self.assertEqual(result["secret"]["access_token"], "token-2")
+
+
+class OAuth2AccessTokenCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def test_refresh_after_expiry(self):
+        now = 1000.0
+        cache = OAuth2AccessTokenCache(clock=lambda: now)
+        tokens = iter(
+            [
+                {"access_token": "token-1", "expires_in": 3600},
+                {"access_token": "token-2", "expires_in": 3600},
+            ]
+        )
+
+        async def refresh(service, refresh_token):
+            return next(tokens)
+
+        with patch.object(fetcher.secrets, "_refresh_oauth2_token", refresh):
+            token = await cache.get(FakeIntercom, "a-refresh-token")
+            self.assertEqual(token["access_token"], "token-1")
+            now += 3600 - OAUTH2_ACCESS_TOKEN_EXPIRY_MARGIN - 1
+            token = await cache.get(FakeIntercom, "a-refresh-token")
+            self.assertEqual(token["access_token"], "token-1")
+            now += 1
+            token = await cache.get(FakeIntercom, "a-refresh-token")
+            self.assertEqual(token["access_token"], "token-2")
+
+    async def test_key_by_refresh_token(self):
+        cache = OAuth2AccessTokenCache()
+
+        async def refresh(service, refresh_token):
+            return {"access_token": "for-" + refresh_token, "expires_in": 3600}
+
+        with patch.object(fetcher.secrets, "_refresh_oauth2_token", refresh):
+            token1 = await cache.get(FakeIntercom, "r1")
+            token2 = await cache.get(FakeIntercom, "r2")
+        self.assertEqual(token1["access_token"], "for-r1")
+        self.assertEqual(token2["access_token"], "for-r2")
+
+    async def test_do_not_cache_errors(self):
+        cache = OAuth2AccessTokenCache()
+        results = iter([RuntimeError("boom"), {"access_token": "ok"}])
+
+        async def refresh(service, refresh_token):
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with patch.object(fetcher.secrets, "_refresh_oauth2_token", refresh):
+            with self.assertRaises(RuntimeError):
+                await cache.get(FakeIntercom, "r")
+            token = await cache.get(FakeIntercom, "r")
+        self.assertEqual(token["access_token"], "ok")
@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+
+from cjwkernel.types import ConditionalFetchResult, FetchResult, FetchValidators
+from cjwkernel.util import tempfile_context
+from fetcher.sharing import SharedFetches
+
+
+class SharedFetchesTests(unittest.IsolatedAsyncioTestCase):
+    async def test_leader_has_no_result(self):
+        shared_fetches = SharedFetches(60)
+        async with shared_fetches.join("a") as shared_fetch:
+            self.assertIsNone(shared_fetch.result)
+
+    async def test_share_result_with_waiting_fetch(self):
+        shared_fetches = SharedFetches(60)
+        leader_joined = asyncio.Event()
+
+        async def lead():
+            async with shared_fetches.join("a") as shared_fetch:
+                leader_joined.set()
+                with tempfile_context() as path:
+                    path.write_bytes(b"data")
+                    await shared_fetch.publish(
+                        ConditionalFetchResult(FetchResult(path, [])), "hash"
+                    )
+
+        async def follow():
+            await leader_joined.wait()
+            async with shared_fetches.join("a") as shared_fetch:
+                result = shared_fetch.result
+                self.assertEqual(result.result_hash, "hash")
+                # The leader's file is gone; we read a copy
+                return result.result.result.path.read_bytes()
+
+        _, data = await asyncio.gather(lead(), follow())
+        self.assertEqual(data, b"data")
+
+    async def test_share_not_modified(self):
+        shared_fetches = SharedFetches(60)
+        async with shared_fetches.join("a") as shared_fetch:
+            await shared_fetch.publish(
+                ConditionalFetchResult(None, FetchValidators(etag='"x"')), None
+            )
+        async with shared_fetches.join("a") as shared_fetch:
+            self.assertEqual(
+                shared_fetch.result.result,
+                ConditionalFetchResult(None, FetchValidators(etag='"x"')),
+            )
+
+    async def test_keys_do_not_share(self):
+        shared_fetches = SharedFetches(60)
+        async with shared_fetches.join("a") as shared_fetch:
+            await shared_fetch.publish(ConditionalFetchResult(None), None)
+        async with shared_fetches.join("b") as shared_fetch:
+            self.assertIsNone(shared_fetch.result)
+
+    async def test_expire_and_delete_file(self):
+        shared_fetches = SharedFetches(0)
+        with tempfile_context() as path:
+            path.write_bytes(b"data")
+            async with shared_fetches.join("a") as shared_fetch:
+                await shared_fetch.publish(
+                    ConditionalFetchResult(FetchResult(path, [])), "hash"
+                )
+            async with shared_fetches.join("a") as shared_fetch:
+                shared_path = shared_fetch.result.result.result.path
+            await asyncio.sleep(0.01)  # run the expiry timer
+            self.assertFalse(shared_path.exists())
+            async with shared_fetches.join("a") as shared_fetch:
+                self.assertIsNone(shared_fetch.result)
+
+    async def test_keep_file_while_in_use(self):
+        shared_fetches = SharedFetches(0)
+        with tempfile_context() as path:
+            path.write_bytes(b"data")
+            async with shared_fetches.join("a") as shared_fetch:
+                await shared_fetch.publish(
+                    ConditionalFetchResult(FetchResult(path, [])), "hash"
+                )
+            async with shared_fetches.join("a") as shared_fetch:
+                await asyncio.sleep(0.01)  # run the expiry timer
+                shared_path = shared_fetch.result.result.result.path
+                self.assertEqual(shared_path.read_bytes(), b"data")
+            self.assertFalse(shared_path.exists())
+
+    async def test_waiting_fetch_gets_no_result_when_leader_fails(self):
+        shared_fetches = SharedFetches(60)
+        leader_joined = asyncio.Event()
+
+        async def lead():
+            async with shared_fetches.join("a"):
+                leader_joined.set()
+                await asyncio.sleep(0)
+                raise RuntimeError
+
+        async def follow():
+            await leader_joined.wait()
+            async with shared_fetches.join("a") as shared_fetch:
+                return shared_fetch.result
+
+        lead_result, follow_result = await asyncio.gather(
+            lead(), follow(), return_exceptions=True
+        )
+        self.assertIsInstance(lead_result, RuntimeError)
+        self.assertIsNone(follow_result)
+        # The next fetch leads
+        async with shared_fetches.join("a") as shared_fetch:
+            self.assertIsNone(shared_fetch.result)
@@ -88,3 +88,51 @@ class DiffTest(unittest.TestCase):
                 FetchResult(self.old_path), FetchResult(self.new_path)
             )
         )
+
+    def test_hashes_same(self):
+        # Equal hashes mean equal files; we needn't read them
+        self.assertTrue(
+            are_fetch_results_equal(
+                FetchResult(self.old_path),
+                FetchResult(self.new_path),
+                new_hash="a" * 64,
+                old_hash="a" * 64,
+            )
+        )
+
+    def test_hashes_different(self):
+        self.old_path.write_bytes(b"12304987kljnmfe092394hkljdfs")
+        self.new_path.write_bytes(b"12304987kljnmfe092394hkljdfs")
+        self.assertFalse(
+            are_fetch_results_equal(
+                FetchResult(self.old_path),
+                FetchResult(self.new_path),
+                new_hash="a" * 64,
+                old_hash="b" * 64,
+            )
+        )
+
+    def test_hashes_different_parquet_same(self):
+        # Different bytes may encode the same table
+        cjwparquet.write(self.old_path, make_table(make_column("A", [1])))
+        cjwparquet.write(self.new_path, make_table(make_column("A", [1])))
+        self.assertTrue(
+            are_fetch_results_equal(
+                FetchResult(self.old_path),
+                FetchResult(self.new_path),
+                new_hash="a" * 64,
+                old_hash="b" * 64,
+            )
+        )
+
+    def test_legacy_unhashed_compare_bytes(self):
+        self.old_path.write_bytes(b"12304987kljnmfe092394hkljdfs")
+        self.new_path.write_bytes(b"12304987kljnmfe092394hkljdfs")
+        self.assertTrue(
+            are_fetch_results_equal(
+                FetchResult(self.old_path),
+                FetchResult(self.new_path),
+                new_hash="a" * 64,
+                old_hash="unhashed",
+            )
+        )
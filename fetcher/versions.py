@@ -1,4 +1,6 @@
 from pathlib import Path
+import re
+from typing import Optional
 import cjwparquet
 from cjwkernel.types import FetchResult
 
@@ -9,6 +11,10 @@ _BUFFER_SIZE = 1024 * 1024
 _is_parquet_path = cjwparquet.file_has_parquet_magic_number
 
 
+is_sha256 = re.compile("[0-9a-f]{64}").fullmatch
+"""True for `storedobjects.hash_file()` output; False for legacy "unhashed"."""
+
+
 def _are_file_contents_equal(path1: Path, path2: Path) -> bool:
     """
     Return whether both paths are byte-for-byte equal.
@@ -30,7 +36,13 @@ def _are_file_contents_equal(path1: Path, path2: Path) -> bool:
                     return True
 
 
-def are_fetch_results_equal(new_result: FetchResult, old_result: FetchResult) -> bool:
+def are_fetch_results_equal(
+    new_result: FetchResult,
+    old_result: FetchResult,
+    *,
+    new_hash: Optional[str] = None,
+    old_hash: Optional[str] = None,
+) -> bool:
     """
     Determine whether `new_result` is worth saving in the database.
 
@@ -62,16 +74,33 @@ def are_fetch_results_equal(new_result: FetchResult, old_result: FetchResult) ->
     Heuristics:
 
         1. If errors are different, the results are different.
-        2. If the render result is a Parquet file (legacy fetch retval),
+        2. If we know both files' SHA-256 hashes and they're equal, the
+           results are equal.
+        3. If the render result is a Parquet file (legacy fetch retval),
            compare schemas and values in the two Parquet files; return the
-           result.
-        3. Otherwise, compare file contents of the two files on disk; return
+           result. (Different bytes may hold the same table.)
+        4. If we know both hashes (and they differ), the results are different.
+        5. Otherwise, compare file contents of the two files on disk; return
            the result.
+
+    Pass `new_hash` and `old_hash` (from `storedobjects.hash_file()` and
+    `StoredObject.hash`) to skip reading the files in most cases.
     """
     if new_result.errors != old_result.errors:
         return False
 
-    if _is_parquet_path(old_result.path) and _is_parquet_path(new_result.path):
+    know_hashes = (
+        new_hash is not None
+        and old_hash is not None
+        and is_sha256(new_hash)
+        and is_sha256(old_hash)
+    )
+    if know_hashes and new_hash == old_hash:
+        return True
+
+    if _is_parquet_path(new_result.path) and _is_parquet_path(old_result.path):
         return cjwparquet.are_files_equal(old_result.path, new_result.path)
+    elif know_hashes:
+        return False
     else:
         return _are_file_contents_equal(old_result.path, new_result.path)
@@ -0,0 +1 @@
+ALTER TABLE stored_object ALTER COLUMN hash TYPE VARCHAR(64);
@@ -0,0 +1,3 @@
+ALTER TABLE stored_object
+  ADD COLUMN etag TEXT,
+  ADD COLUMN last_modified TEXT;
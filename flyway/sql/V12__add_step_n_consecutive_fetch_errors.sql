@@ -0,0 +1,2 @@
+ALTER TABLE step
+  ADD COLUMN n_consecutive_fetch_errors INTEGER NOT NULL DEFAULT 0;
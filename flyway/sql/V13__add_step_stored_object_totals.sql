@@ -0,0 +1,12 @@
+ALTER TABLE step
+  ADD COLUMN n_stored_objects INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN stored_objects_size BIGINT NOT NULL DEFAULT 0;
+
+UPDATE step
+SET n_stored_objects = totals.n, stored_objects_size = totals.size
+FROM (
+  SELECT step_id, COUNT(*) AS n, SUM(size) AS size
+  FROM stored_object
+  GROUP BY step_id
+) totals
+WHERE step.id = totals.step_id;
@@ -0,0 +1,7 @@
+-- S3 keys of stored_object files that no row may reference any more. We
+-- delete the rows and record their keys in one transaction, then delete the
+-- files. If that fails, cron retries.
+CREATE TABLE pending_stored_object_deletion (
+  key VARCHAR(255) NOT NULL PRIMARY KEY,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
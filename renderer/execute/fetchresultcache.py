@@ -0,0 +1,115 @@
+"""Local cache of Parquet fetch results, converted to Arrow.
+
+pandas_v0 modules read their fetch results as DataFrames. Decoding Parquet
+is slow, and most renders re-read the same fetch result with new params. So
+we convert each Parquet StoredObject to an Arrow file once and keep it on
+local disk. Modules mmap the Arrow file.
+
+The cache lives inside the chroot's overlay filesystem, next to each
+render's basedir, so we can hard-link cached files into the basedir instead
+of copying them. (A hard link can't cross filesystems; a cache anywhere else
+would mean a full copy per render.) The cache directory itself is readable
+only by us: modules see the hard-linked file for their own render, and
+nothing else. It's in the chroot's caller cache dir, which the chroot keeps
+when it wipes module edits between renders.
+
+A StoredObject key always points to the same bytes (new keys are content
+hashes), so a cached file never goes stale. When the cache grows past
+`settings.FETCH_RESULT_ARROW_CACHE_MAX_BYTES`, we delete the
+least-recently-used files.
+"""
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import cjwparquet
+from django.conf import settings
+
+from cjwkernel.chroot import ChrootContext
+from cjwkernel.util import tempfile_context
+
+
+logger = logging.getLogger(__name__)
+
+
+def chroot_cache_dir(chroot_context: ChrootContext) -> Path:
+    """Return the cache directory for renders in `chroot_context`.
+
+    It's on the same filesystem as `chroot_context.tempdir_context()`, and it
+    outlives `chroot_context`.
+    """
+    return chroot_context.cache_dir / "fetch-result-arrow"
+
+
+def _ensure_cache_dir(cache_dir: Path) -> None:
+    # 0o700: modules must not read other workflows' fetch results
+    cache_dir.parent.mkdir(mode=0o700, exist_ok=True)
+    cache_dir.mkdir(mode=0o700, exist_ok=True)
+
+
+def _evict_least_recently_used(cache_dir: Path, keep: Path) -> None:
+    entries = []
+    for path in cache_dir.glob("*.arrow"):
+        if path == keep:
+            continue
+        try:
+            entries.append((path, path.stat()))
+        except FileNotFoundError:
+            pass  # another renderer evicted it
+
+    n_bytes = keep.stat().st_size + sum(stat.st_size for _, stat in entries)
+    for path, stat in sorted(entries, key=lambda entry: entry[1].st_mtime):
+        if n_bytes <= settings.FETCH_RESULT_ARROW_CACHE_MAX_BYTES:
+            break
+        logger.info("Evicting %s from fetch-result Arrow cache", path.name)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass  # another renderer evicted it
+        n_bytes -= stat.st_size
+
+
+def _ensure_cached(cache_dir: Path, stored_object_key: str, parquet_path: Path) -> Path:
+    """Return the cached Arrow file for `stored_object_key`; create if needed.
+
+    Raise `pyarrow.ArrowIOError` if `parquet_path` is not valid Parquet.
+    """
+    _ensure_cache_dir(cache_dir)
+    cache_path = cache_dir / (stored_object_key.replace("/", "_") + ".arrow")
+    try:
+        os.utime(cache_path)  # mark as recently used
+        return cache_path
+    except FileNotFoundError:
+        pass
+
+    with tempfile_context(prefix="converting-", suffix=".tmp", dir=cache_dir) as tf:
+        cjwparquet.convert_parquet_file_to_arrow_file(parquet_path, tf)
+        tf.chmod(0o644)  # modules read hard links to this file
+        # Atomic, so other readers never see a half-written file
+        os.replace(tf, cache_path)
+    _evict_least_recently_used(cache_dir, keep=cache_path)
+    return cache_path
+
+
+def write_arrow_fetch_result(
+    cache_dir: Path, stored_object_key: str, parquet_path: Path, arrow_path: Path
+) -> None:
+    """Write an Arrow copy of `parquet_path` to `arrow_path`, via `cache_dir`.
+
+    `parquet_path` must be the file stored at `stored_object_key`.
+
+    Hard-link the cached file if `cache_dir` and `arrow_path` are on the same
+    filesystem; otherwise, fall back to a (full, slow) copy. Either way, the
+    cache stays correct if the caller deletes `arrow_path`.
+
+    Raise `pyarrow.ArrowIOError` if `parquet_path` is not valid Parquet.
+    """
+    cache_path = _ensure_cached(cache_dir, stored_object_key, parquet_path)
+    try:
+        arrow_path.unlink()
+        os.link(cache_path, arrow_path)
+    except OSError:
+        # EXDEV: the caller gave a cache_dir on another filesystem
+        logger.warning("Could not hard-link %s; copying instead", cache_path.name)
+        shutil.copyfile(cache_path, arrow_path)
@@ -6,7 +6,7 @@ import time
 from collections import namedtuple
 from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import cjwparquet
 import pyarrow as pa
@@ -14,10 +14,16 @@ from django.db import connection
 
 from cjworkbench.sync import database_sync_to_async
 from cjwkernel.chroot import ChrootContext
-from cjwkernel.errors import ModuleError, ModuleExitedError, format_for_user_debugging
+from cjwkernel.errors import (
+    ModuleError,
+    ModuleExitedError,
+    ModuleResourceLimitError,
+    format_for_user_debugging,
+)
 from cjwkernel.i18n import trans
 from cjwkernel.types import (
     Column,
+    FetchError,
     FetchResult,
     LoadedRenderResult,
     RenderError,
@@ -26,7 +32,7 @@ from cjwkernel.types import (
 )
 from cjwkernel.validate import ValidateError, load_untrusted_arrow_file_with_columns
 from cjwkernel.util import tempfile_context
-from cjwstate import clientside, s3, rabbitmq, rendercache
+from cjwstate import clientside, rabbitmq, rendercache, storedobjects
 from cjwstate.errors import PromptingError
 from cjwstate.models import StoredObject, Step, Workflow
 import cjwstate.modules
@@ -39,7 +45,7 @@ from .types import (
     TabOutputUnreachableError,
     UnneededExecution,
 )
-from . import renderprep
+from . import fetchresultcache, renderprep
 from .types import StepResult
 
 
@@ -81,26 +87,38 @@ def locked_step(workflow, step):
     return retval
 
 
-def _load_fetch_result(
-    step: Step, basedir: Path, exit_stack: contextlib.ExitStack
-) -> Optional[FetchResult]:
+def _find_fetch_stored_object(step: Step) -> Optional[StoredObject]:
+    """Return the user-selected StoredObject, if there is one."""
+    try:
+        return step.stored_objects.get(stored_at=step.stored_data_version)
+    except StoredObject.DoesNotExist:
+        return None
+
+
+async def _load_fetch_result(
+    stored_object: Optional[StoredObject],
+    fetch_errors: List[FetchError],
+    basedir: Path,
+    exit_stack: contextlib.ExitStack,
+) -> Tuple[Optional[FetchResult], Optional[str]]:
     """Download user-selected StoredObject to `basedir`, so render() can read it.
 
+    Return `(fetch_result, stored_object_key)`.
+
+    This downloads with `aios3`, outside of any database thread: don't call it
+    while holding a workflow lock.
+
     Edge cases:
 
-    Create no file (and return `None`) if the user did not select a
+    Create no file (and return `(None, None)`) if the user did not select a
     StoredObject, or if the selected StoredObject does not point to a file
     on s3.
 
     The caller should ensure "leave `path` alone" means "return an empty
     FetchResult". The FetchResult may still have an error.
     """
-    try:
-        stored_object = step.stored_objects.get(stored_at=step.stored_data_version)
-    except StoredObject.DoesNotExist:
-        return None
-    if not stored_object.key:
-        return None
+    if stored_object is None or not stored_object.key:
+        return None, None
 
     with contextlib.ExitStack() as inner_stack:
         path = inner_stack.enter_context(
@@ -108,7 +126,7 @@ def _load_fetch_result(
         )
 
         try:
-            s3.download(s3.StoredObjectsBucket, stored_object.key, path)
+            await storedobjects.download_async(stored_object, path)
             # Download succeeded, so we no longer want to delete `path`
             # right _now_ ("now" means, "in inner_stack.close()"). Instead,
             # transfer ownership of `path` to exit_stack.
@@ -122,13 +140,81 @@ def _load_fetch_result(
             #
             # Other than that, if the file doesn't exist it's a race: either
             # the fetch result is too _new_ (it's in the database but its file
-            # hasn't been written yet) or the fetch result is half-deleted (its
-            # file was deleted and it's still in the database). In either case,
-            # pretend the fetch result does not exist in the database -- i.e.,
-            # return `None`.
-            return None
+            # hasn't been written yet) or the fetch result is deleted (since we
+            # released the workflow lock). In either case, pretend the fetch
+            # result does not exist in the database -- i.e., return `None`.
+            return None, None
+
+    return FetchResult(path, fetch_errors), stored_object.key
+
+
+def _module_renders_with_pandas_v0(module_zipfile: ModuleZipfile) -> bool:
+    """Guess whether the kernel will call `module_zipfile`'s render() via pandas_v0.
+
+    This mirrors `cjwkernel.pandas.module.render_thrift()`, but it reads the
+    compiled code instead of executing it: a module uses pandas_v0 unless it
+    defines `render_arrow_v1()` or `render_arrow_v2()`, or its `render()`'s
+    first argument is `arrow_table`.
+    """
+    try:
+        code_object = module_zipfile.compile_code_without_executing().code_object
+    except (KeyError, UnicodeDecodeError, SyntaxError):
+        return False  # invoke_render() will report the error
+
+    if {"render_arrow_v1", "render_arrow_v2"} & set(code_object.co_names):
+        return False
+
+    render_code = None
+    for const in code_object.co_consts:
+        if getattr(const, "co_name", None) == "render":
+            render_code = const  # the last definition wins, as in exec()
+    if render_code is None or render_code.co_argcount == 0:
+        return True  # the default render() is pandas_v0
+    return render_code.co_varnames[0] != "arrow_table"
+
+
+def _prepare_fetch_result_arrow_file(
+    *,
+    chroot_context: ChrootContext,
+    basedir: Path,
+    exit_stack: contextlib.ExitStack,
+    module_zipfile: ModuleZipfile,
+    fetch_result: Optional[FetchResult],
+    stored_object_key: Optional[str],
+) -> Optional[str]:
+    """Write an Arrow copy of a Parquet fetch result to `basedir`.
+
+    Return its filename, or `None` if the fetch result isn't Parquet or the
+    module doesn't render with pandas_v0 (the only framework that reads it).
+
+    pandas_v0 modules read this file instead of decoding Parquet. The copy
+    comes from a local cache, so we only decode each StoredObject once.
+
+    This can be slow on cache miss. Consider calling it from an executor.
+    """
+    if fetch_result is None or not cjwparquet.file_has_parquet_magic_number(
+        fetch_result.path
+    ):
+        return None
 
-    return FetchResult(path, step.fetch_errors)
+    if not _module_renders_with_pandas_v0(module_zipfile):
+        return None
+
+    arrow_path = exit_stack.enter_context(
+        tempfile_context(prefix="fetch-result-", suffix=".arrow", dir=basedir)
+    )
+    try:
+        fetchresultcache.write_arrow_fetch_result(
+            fetchresultcache.chroot_cache_dir(chroot_context),
+            stored_object_key,
+            fetch_result.path,
+            arrow_path,
+        )
+    except pa.ArrowIOError:
+        # The module will see the invalid Parquet file and handle it
+        logger.exception("Could not convert fetch result to Arrow")
+        return None
+    return arrow_path.name
 
 
 def invoke_render(
@@ -143,6 +229,7 @@ def invoke_render(
     tab_outputs: Dict[str, TabOutput],
     uploaded_files: Dict[str, UploadedFile],
     output_filename: str,
+    fetch_result_arrow_filename: Optional[str] = None,
 ) -> LoadedRenderResult:
     """Use kernel to process `table` with module `render` function.
 
@@ -177,6 +264,7 @@ def invoke_render(
             tab_outputs=tab_outputs,
             uploaded_files=uploaded_files,
             output_filename=output_filename,
+            fetch_result_arrow_filename=fetch_result_arrow_filename,
         )
 
         output_path = basedir / output_filename
@@ -184,14 +272,15 @@ def invoke_render(
         if st_size == 0:
             table = pa.table({})
             columns = []
-            status = "(no output)"
+            status = "(no output; %s)" % (result.resource_usage,)
         else:
             try:
                 table, columns = load_untrusted_arrow_file_with_columns(output_path)
-                status = "(%drows, %dcols, %0.1fMB)" % (
+                status = "(%drows, %dcols, %0.1fMB; %s)" % (
                     table.num_rows,
                     table.num_columns,
                     st_size / 1024 / 1024,
+                    result.resource_usage,
                 )
             except ValidateError as err:
                 raise ModuleExitedError(
@@ -222,7 +311,8 @@ def invoke_render(
 
 
 class ExecuteStepPreResult(NamedTuple):
-    fetch_result: Optional[FetchResult]
+    stored_object: Optional[StoredObject]
+    fetch_errors: List[FetchError]
     params: Dict[str, Any]
     tab_outputs: List[TabOutput]
     uploaded_files: Dict[str, UploadedFile]
@@ -263,7 +353,7 @@ def _execute_step_pre(
     """
     # raises UnneededExecution
     with locked_step(workflow, step) as safe_step:
-        fetch_result = _load_fetch_result(safe_step, basedir, exit_stack)
+        stored_object = _find_fetch_stored_object(safe_step)
 
         module_spec = module_zipfile.get_spec()
         if not module_spec.loads_data and not input_table_columns:
@@ -280,7 +370,13 @@ def _execute_step_pre(
             exit_stack=exit_stack,
         )
 
-        return ExecuteStepPreResult(fetch_result, params, tab_outputs, uploaded_files)
+        return ExecuteStepPreResult(
+            stored_object,
+            safe_step.fetch_errors,
+            params,
+            tab_outputs,
+            uploaded_files,
+        )
 
 
 @database_sync_to_async
@@ -417,7 +513,13 @@ async def _render_step(
         try:
             # raise UnneededExecution, TabCycleError, TabOutputUnreachableError,
             # NoLoadedDataError, PromptingError
-            fetch_result, params, tab_outputs, uploaded_files = await _execute_step_pre(
+            (
+                stored_object,
+                fetch_errors,
+                params,
+                tab_outputs,
+                uploaded_files,
+            ) = await _execute_step_pre(
                 basedir=basedir,
                 exit_stack=exit_stack,
                 workflow=workflow,
@@ -469,10 +571,29 @@ async def _render_step(
                 output_path, errors=err.as_render_errors()
             )
 
+        # Download outside of _execute_step_pre(), so we don't hold a database
+        # thread (and the workflow lock) while bytes move.
+        fetch_result, stored_object_key = await _load_fetch_result(
+            stored_object, fetch_errors, basedir, exit_stack
+        )
+
         # Render may take a while. run_in_executor to push that slowdown to a
         # thread and keep our event loop responsive.
         loop = asyncio.get_event_loop()
 
+        fetch_result_arrow_filename = await loop.run_in_executor(
+            None,
+            partial(
+                _prepare_fetch_result_arrow_file,
+                chroot_context=chroot_context,
+                basedir=basedir,
+                exit_stack=exit_stack,
+                module_zipfile=module_zipfile,
+                fetch_result=fetch_result,
+                stored_object_key=stored_object_key,
+            ),
+        )
+
         try:
             return await loop.run_in_executor(
                 None,
@@ -487,9 +608,27 @@ async def _render_step(
                     tab_outputs=tab_outputs,
                     uploaded_files=uploaded_files,
                     fetch_result=fetch_result,
+                    fetch_result_arrow_filename=fetch_result_arrow_filename,
                     output_filename=output_path.name,
                 ),
             )
+        except ModuleResourceLimitError as err:
+            output_path.write_bytes(b"")  # SECURITY
+            if err.resource == "memory":
+                message = trans(
+                    "py.renderer.execute.step.ModuleResourceLimitError.memory",
+                    default="This step ran out of memory. Try giving it less data: for instance, "
+                    "filter rows or remove columns in an earlier step.",
+                )
+            else:
+                message = trans(
+                    "py.renderer.execute.step.ModuleResourceLimitError.cpu",
+                    default="This step ran out of processing time. Try giving it less data: "
+                    "for instance, filter rows or remove columns in an earlier step.",
+                )
+            return LoadedRenderResult.from_errors(
+                output_path, errors=[RenderError(message)]
+            )
         except ModuleError as err:
             output_path.write_bytes(b"")  # SECURITY
             return LoadedRenderResult.from_errors(
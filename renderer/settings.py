@@ -1,4 +1,6 @@
 from cjworkbench.settings.database import *
+from cjworkbench.settings.fetchresultcache import *
+from cjworkbench.settings.kernellimits import *
 from cjworkbench.settings.logging import *
 from cjworkbench.settings.rabbitmq import *
 from cjworkbench.settings.smtp import *
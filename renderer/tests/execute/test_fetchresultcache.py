@@ -0,0 +1,96 @@
+import contextlib
+import unittest
+from unittest.mock import patch
+
+import cjwparquet
+import pyarrow as pa
+from cjwmodule.arrow.testing import assert_arrow_table_equals, make_column, make_table
+from django.test.utils import override_settings
+
+from cjwkernel.tests.util import parquet_file
+from cjwkernel.util import tempdir_context, tempfile_context
+from cjwkernel.validate import load_trusted_arrow_file
+from renderer.execute.fetchresultcache import write_arrow_fetch_result
+
+
+class WriteArrowFetchResultTests(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ctx = contextlib.ExitStack()
+        tempdir = self.ctx.enter_context(tempdir_context())
+        self.cache_dir = tempdir / "cache"
+        self.arrow_path = self.ctx.enter_context(
+            tempfile_context(suffix=".arrow", dir=tempdir)
+        )
+
+    def tearDown(self):
+        self.ctx.close()
+        super().tearDown()
+
+    def test_convert_parquet(self):
+        with parquet_file({"A": [1, 2]}) as parquet_path:
+            write_arrow_fetch_result(
+                self.cache_dir, "1/2/abc.dat", parquet_path, self.arrow_path
+            )
+        assert_arrow_table_equals(
+            load_trusted_arrow_file(self.arrow_path),
+            make_table(make_column("A", [1, 2])),
+        )
+        self.assertEqual(
+            [p.name for p in self.cache_dir.iterdir()], ["1_2_abc.dat.arrow"]
+        )
+
+    def test_hard_link_cached_file(self):
+        with parquet_file({"A": [1, 2]}) as parquet_path:
+            write_arrow_fetch_result(
+                self.cache_dir, "1/2/abc.dat", parquet_path, self.arrow_path
+            )
+        cache_path = self.cache_dir / "1_2_abc.dat.arrow"
+        self.assertTrue(self.arrow_path.samefile(cache_path))
+        self.assertEqual(self.cache_dir.stat().st_mode & 0o777, 0o700)
+
+    def test_cache_hit_skips_conversion(self):
+        with parquet_file({"A": [1, 2]}) as parquet_path:
+            write_arrow_fetch_result(
+                self.cache_dir, "1/2/abc.dat", parquet_path, self.arrow_path
+            )
+            self.arrow_path.unlink()  # deleting a copy doesn't affect the cache
+            with tempfile_context(suffix=".arrow") as arrow_path2:
+                with patch.object(
+                    cjwparquet, "convert_parquet_file_to_arrow_file"
+                ) as convert:
+                    write_arrow_fetch_result(
+                        self.cache_dir, "1/2/abc.dat", parquet_path, arrow_path2
+                    )
+                convert.assert_not_called()
+                assert_arrow_table_equals(
+                    load_trusted_arrow_file(arrow_path2),
+                    make_table(make_column("A", [1, 2])),
+                )
+
+    def test_invalid_parquet(self):
+        with tempfile_context() as parquet_path:
+            parquet_path.write_bytes(b"PAR1 not really PAR1")
+            with self.assertRaises(pa.ArrowIOError):
+                write_arrow_fetch_result(
+                    self.cache_dir, "1/2/abc.dat", parquet_path, self.arrow_path
+                )
+        self.assertEqual(list(self.cache_dir.iterdir()), [])
+
+    def test_evict_least_recently_used(self):
+        with override_settings(FETCH_RESULT_ARROW_CACHE_MAX_BYTES=1):
+            with parquet_file({"A": [1, 2]}) as parquet_path:
+                write_arrow_fetch_result(
+                    self.cache_dir, "1/2/abc.dat", parquet_path, self.arrow_path
+                )
+                write_arrow_fetch_result(
+                    self.cache_dir, "1/2/def.dat", parquet_path, self.arrow_path
+                )
+        # The newest file stays, even though it's bigger than the limit
+        self.assertEqual(
+            [p.name for p in self.cache_dir.iterdir()], ["1_2_def.dat.arrow"]
+        )
+        assert_arrow_table_equals(
+            load_trusted_arrow_file(self.arrow_path),
+            make_table(make_column("A", [1, 2])),
+        )
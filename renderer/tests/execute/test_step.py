@@ -1,6 +1,7 @@
 import contextlib
 import datetime
 import logging
+import shutil
 import textwrap
 from unittest.mock import patch
 
@@ -9,7 +10,7 @@ from cjwmodule.arrow.testing import make_column, make_table
 from django.contrib.auth.models import User
 
 from cjwkernel.chroot import EDITABLE_CHROOT
-from cjwkernel.types import I18nMessage, RenderError
+from cjwkernel.types import Column, ColumnType, I18nMessage, RenderError
 from cjwkernel.tests.util import parquet_file
 from cjwstate import s3, rabbitmq, rendercache
 from cjwstate.rendercache.testing import write_to_rendercache
@@ -18,6 +19,7 @@ from cjwstate.models.workflow import Workflow
 from cjwstate.tests.utils import DbTestCaseWithModuleRegistry, create_module_zipfile
 from cjworkbench.models.userprofile import UserProfile
 from renderer import notifications
+from renderer.execute import fetchresultcache
 from renderer.execute.step import execute_step
 
 
@@ -466,6 +468,99 @@ class StepTests(DbTestCaseWithModuleRegistry):
                 )
             )
 
+    @patch.object(rabbitmq, "send_update_to_workflow_clients", noop)
+    def test_fetch_result_parquet_as_dataframe(self):
+        workflow = Workflow.create_and_init()
+        tab = workflow.tabs.first()
+        step = tab.steps.create(
+            order=0,
+            slug="step-1",
+            module_id_name="x",
+            last_relevant_delta_id=workflow.last_delta_id,
+        )
+        with parquet_file({"A": [1]}) as path:
+            so = create_stored_object(workflow.id, step.id, path)
+        step.stored_data_version = so.stored_at
+        step.save(update_fields=["stored_data_version"])
+
+        module_zipfile = create_module_zipfile(
+            "x",
+            spec_kwargs={"loads_data": True},
+            python_code=textwrap.dedent(
+                """
+                def render(table, params, *, fetch_result, **kwargs):
+                    return fetch_result.dataframe
+                """
+            ),
+        )
+
+        cache_dir = fetchresultcache.chroot_cache_dir(self.chroot_context)
+        shutil.rmtree(cache_dir, ignore_errors=True)  # it outlives other tests
+        with self.assertLogs(level=logging.INFO):
+            result = self.run_with_async_db(
+                execute_step(
+                    chroot_context=self.chroot_context,
+                    workflow=workflow,
+                    step=step,
+                    module_zipfile=module_zipfile,
+                    params={},
+                    tab_name=tab.name,
+                    input_path=self.empty_table_path,
+                    input_table_columns=[],
+                    tab_results={},
+                    output_path=self.output_path,
+                )
+            )
+        self.assertEqual(result.columns, [Column("A", ColumnType.Number())])
+        # The Arrow copy stays cached for the next render
+        self.assertEqual(len(list(cache_dir.iterdir())), 1)
+
+    @patch.object(rabbitmq, "send_update_to_workflow_clients", noop)
+    def test_fetch_result_parquet_no_arrow_copy_for_arrow_module(self):
+        workflow = Workflow.create_and_init()
+        tab = workflow.tabs.first()
+        step = tab.steps.create(
+            order=0,
+            slug="step-1",
+            module_id_name="x",
+            last_relevant_delta_id=workflow.last_delta_id,
+        )
+        with parquet_file({"A": [1]}) as path:
+            so = create_stored_object(workflow.id, step.id, path)
+        step.stored_data_version = so.stored_at
+        step.save(update_fields=["stored_data_version"])
+
+        module_zipfile = create_module_zipfile(
+            "x",
+            spec_kwargs={"loads_data": True},
+            python_code=textwrap.dedent(
+                """
+                def render(arrow_table, params, output_path, **kwargs):
+                    return "no output"
+                """
+            ),
+        )
+
+        cache_dir = fetchresultcache.chroot_cache_dir(self.chroot_context)
+        shutil.rmtree(cache_dir, ignore_errors=True)  # it outlives other tests
+        with self.assertLogs(level=logging.INFO):
+            self.run_with_async_db(
+                execute_step(
+                    chroot_context=self.chroot_context,
+                    workflow=workflow,
+                    step=step,
+                    module_zipfile=module_zipfile,
+                    params={},
+                    tab_name=tab.name,
+                    input_path=self.empty_table_path,
+                    input_table_columns=[],
+                    tab_results={},
+                    output_path=self.output_path,
+                )
+            )
+        # arrow_v0 reads Parquet itself; don't decode it for nothing
+        self.assertFalse(cache_dir.exists())
+
     @patch.object(rabbitmq, "send_update_to_workflow_clients", noop)
     def test_fetch_result_deleted_file_means_none(self):
         workflow = Workflow.create_and_init()
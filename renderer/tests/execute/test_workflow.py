@@ -6,20 +6,25 @@ import unittest
 from collections import namedtuple
 from unittest.mock import patch
 
+import cjwparquet
 import pyarrow as pa
 from cjwmodule.arrow.testing import assert_arrow_table_equals, make_column, make_table
 from django.contrib.auth.models import User
 
+from cjwkernel.chroot import EDITABLE_CHROOT
 from cjwkernel.kernel import Kernel
 from cjwkernel.i18n import TODO_i18n
 from cjwkernel.types import RenderError, RenderResult
-from cjwkernel.tests.util import arrow_table_context
+from cjwkernel.tests.util import arrow_table_context, parquet_file
 from cjwstate import clientside, rabbitmq
 from cjwstate.models.workflow import Workflow
 from cjwstate.rendercache import open_cached_render_result
+from cjwstate.rendercache.io import clear_cached_render_result_for_step
 from cjwstate.rendercache.testing import write_to_rendercache
+from cjwstate.storedobjects import create_stored_object
 from cjwstate.tests.utils import DbTestCaseWithModuleRegistry, create_module_zipfile
 from cjworkbench.models.userprofile import UserProfile
+from renderer.execute import fetchresultcache
 from renderer.execute.types import UnneededExecution
 from renderer.execute.workflow import execute_workflow, partition_ready_and_dependent
 
@@ -232,6 +237,52 @@ class WorkflowTests(DbTestCaseWithModuleRegistry):
         )
 
     @patch.object(rabbitmq, "send_update_to_workflow_clients", fake_send)
+    @patch.object(rabbitmq, "send_update_to_workflow_clients", fake_send)
+    def test_execute_reuses_fetch_result_arrow_cache(self):
+        # Each execute_workflow() acquires and releases the chroot. The Arrow
+        # cache must survive that, or every render would re-convert Parquet.
+        with EDITABLE_CHROOT.acquire_context() as chroot_context:
+            shutil.rmtree(
+                fetchresultcache.chroot_cache_dir(chroot_context), ignore_errors=True
+            )
+        workflow = Workflow.create_and_init()
+        tab = workflow.tabs.first()
+        create_module_zipfile(
+            "mod",
+            spec_kwargs={"loads_data": True},
+            python_code=textwrap.dedent(
+                """
+                def render(table, params, *, fetch_result, **kwargs):
+                    return fetch_result.dataframe
+                """
+            ),
+        )
+        step = tab.steps.create(
+            order=0,
+            slug="step-1",
+            last_relevant_delta_id=workflow.last_delta_id,
+            module_id_name="mod",
+        )
+        with parquet_file({"A": [1]}) as path:
+            so = create_stored_object(workflow.id, step.id, path)
+        step.stored_data_version = so.stored_at
+        step.save(update_fields=["stored_data_version"])
+
+        with patch.object(
+            cjwparquet,
+            "convert_parquet_file_to_arrow_file",
+            wraps=cjwparquet.convert_parquet_file_to_arrow_file,
+        ) as convert:
+            self._execute(workflow)
+            step.refresh_from_db()
+            clear_cached_render_result_for_step(step)  # force a re-render
+            self._execute(workflow)
+
+            convert.assert_called_once()  # the second render was a cache hit
+        step.refresh_from_db()
+        with open_cached_render_result(step.cached_render_result) as result:
+            assert_arrow_table_equals(result.table, make_table(make_column("A", [1])))
+
     def test_execute_cache_hit(self):
         workflow = Workflow.objects.create()
         create_module_zipfile("mod")
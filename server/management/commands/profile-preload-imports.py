@@ -0,0 +1,129 @@
+import logging
+from pathlib import Path
+
+import pyarrow as pa
+from django.core.management.base import BaseCommand
+
+from cjwkernel.chroot import EDITABLE_CHROOT, ChrootContext
+from cjwkernel.errors import ModuleError
+from cjwkernel.importtrace import suggest_preload_imports
+from cjwkernel.kernel import Kernel
+from cjwstate.models.module_registry import MODULE_REGISTRY
+from cjwstate.modules.types import ModuleZipfile
+
+
+logger = logging.getLogger(__name__)
+
+
+def _profile_module(
+    kernel: Kernel,
+    chroot_context: ChrootContext,
+    basedir: Path,
+    module_zipfile: ModuleZipfile,
+    *,
+    fetch: bool,
+) -> None:
+    """Run `module_zipfile`'s migrate_params, render (and maybe fetch).
+
+    Use default params and an empty input table. We don't care about results,
+    and we expect errors: we only want to see what the module imports.
+    """
+    compiled_module = module_zipfile.compile_code_without_executing()
+    params = module_zipfile.get_spec().param_schema.default
+
+    try:
+        kernel.migrate_params(compiled_module, params)
+    except ModuleError as err:
+        logger.info("%s:migrate_params() failed: %s", module_zipfile.path.name, err)
+
+    with chroot_context.tempfile_context(
+        prefix="input-", suffix=".arrow", dir=basedir
+    ) as input_path, chroot_context.tempfile_context(
+        prefix="output-", suffix=".arrow", dir=basedir
+    ) as output_path:
+        with pa.ipc.RecordBatchFileWriter(input_path, pa.schema([])):
+            pass
+        try:
+            kernel.render(
+                compiled_module,
+                chroot_context,
+                basedir=basedir,
+                input_filename=input_path.name,
+                params=params,
+                tab_name="Tab 1",
+                fetch_result=None,
+                tab_outputs={},
+                uploaded_files={},
+                output_filename=output_path.name,
+            )
+        except ModuleError as err:
+            logger.info("%s:render() failed: %s", module_zipfile.path.name, err)
+
+    if fetch:
+        with chroot_context.tempfile_context(
+            prefix="fetch-result-", dir=basedir
+        ) as output_path:
+            try:
+                kernel.fetch(
+                    compiled_module,
+                    chroot_context,
+                    basedir=basedir,
+                    params=params,
+                    secrets={},
+                    last_fetch_result=None,
+                    input_parquet_filename=None,
+                    output_filename=output_path.name,
+                )
+            except (ModuleError, ValueError) as err:
+                logger.info("%s:fetch() failed: %s", module_zipfile.path.name, err)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run modules in the sandbox with import tracing, and suggest additions "
+        "to cjwkernel.kernel.PRELOAD_IMPORTS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "slugs", nargs="*", type=str, help="Modules to profile (default all)"
+        )
+        parser.add_argument(
+            "--fetch",
+            action="store_true",
+            help="Call fetch(), too (modules may make HTTP requests)",
+        )
+
+    def handle(self, *args, slugs, fetch, **kwargs):
+        module_zipfiles = MODULE_REGISTRY.all_latest()
+        if slugs:
+            module_zipfiles = {slug: module_zipfiles[slug] for slug in slugs}
+
+        kernel = Kernel(trace_imports=True)
+        with EDITABLE_CHROOT.acquire_context() as chroot_context:
+            with chroot_context.tempdir_context(prefix="profile-") as basedir:
+                for slug, module_zipfile in sorted(module_zipfiles.items()):
+                    self.stderr.write("Profiling %s..." % slug)
+                    _profile_module(
+                        kernel, chroot_context, basedir, module_zipfile, fetch=fetch
+                    )
+
+        suggestions = suggest_preload_imports(kernel.import_traces)
+        self.stdout.write(
+            "# Traced %d children. Suggested PRELOAD_IMPORTS additions:"
+            % len(kernel.import_traces)
+        )
+        for suggestion in suggestions:
+            self.stdout.write(
+                '    "%s",  # %dms in %d children (%s)'
+                % (
+                    suggestion.name,
+                    suggestion.total_seconds * 1000,
+                    suggestion.n_children,
+                    ", ".join(suggestion.module_slugs),
+                )
+            )
+        self.stdout.write(
+            "# Preloading all these would save %dms across these children"
+            % (sum(s.total_seconds for s in suggestions) * 1000)
+        )
@@ -652,6 +652,7 @@ def jsonize_clientside_step(
         ("notes", step.notes),
         ("auto_update_data", step.is_auto_fetch),
         ("update_interval", step.fetch_interval),
+        ("n_consecutive_fetch_errors", step.n_consecutive_fetch_errors),
         ("notifications", step.is_notify_on_change),
     ):
         _maybe_set(d, k, v)
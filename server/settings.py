@@ -5,9 +5,13 @@ from dotenv import load_dotenv
 
 from cjworkbench.i18n import default_locale, supported_locales
 
+from cjworkbench.settings.autoupdate import *
 from cjworkbench.settings.database import *
 from cjworkbench.settings.debug import DEBUG, I_AM_TESTING
+from cjworkbench.settings.fetchconcurrency import *
+from cjworkbench.settings.fetchresultcache import *
 from cjworkbench.settings.hardlimits import *
+from cjworkbench.settings.kernellimits import *
 from cjworkbench.settings.logging import *
 from cjworkbench.settings.oauth import OAUTH_SERVICES
 from cjworkbench.settings.rabbitmq import *  # incl. RABBITMQ_HOST
@@ -5,6 +5,7 @@ from cjworkbench.settings.debug import DEBUG
 from cjworkbench.settings.logging import *
 from cjworkbench.settings.userlimits import *
 from cjworkbench.settings.hardlimits import *
+from cjworkbench.settings.kernellimits import *
 
 SECRET_KEY = "internal-only-so-no-secret-key"
 
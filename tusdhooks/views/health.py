@@ -5,7 +5,7 @@ from django.http import HttpResponse
 
 import cjwstate.rabbitmq.connection
 from cjworkbench.sync import database_sync_to_async
-from cjwstate import s3
+from cjwstate import aios3, s3
 
 
 @database_sync_to_async
@@ -18,7 +18,7 @@ def _assert_database_ok():
 async def _assert_s3_ok():
     """Crash if S3 is not available."""
     # The file doesn't need to be there; the request need only complete
-    s3.exists(s3.UserFilesBucket, "healthz")
+    await aios3.exists(s3.UserFilesBucket, "healthz")
 
 
 async def _assert_carehare_ok():